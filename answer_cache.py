@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from generation import PROMPT_VERSION
+from query_cache import normalize_query
+
+
+class AnswerCache:
+    """
+    Cache of generated RAG answers.
+
+    An exact hit needs the same (normalized query, ordered retrieved chunk ids,
+    prompt version, model name). Failing that, a cached answer is reused when it
+    was built from the same chunks and its query embedding has a cosine similarity
+    of at least `similarity_threshold` with the new one. Entries expire after
+    `ttl_seconds` and the least recently used are evicted beyond `maxsize`.
+    """
+
+    def __init__(self, maxsize=512, ttl_seconds=24 * 3600, similarity_threshold=0.95):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # exact key -> (expires_at, query_embedding, answer)
+        self._by_context = {}          # context key -> set of exact keys built from it
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(query, chunk_ids, model_name):
+        context_key = (tuple(chunk_ids), PROMPT_VERSION, model_name)
+        return (normalize_query(query),) + context_key, context_key
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        siblings = self._by_context.get(key[1:])
+        if siblings is not None:
+            siblings.discard(key)
+            if not siblings:
+                del self._by_context[key[1:]]
+
+    def _purge_expired(self, now):
+        expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._drop(key)
+
+    def get(self, query, query_embedding, chunk_ids, model_name):
+        """Returns a cached answer, or None on a miss."""
+        key, context_key = self._keys(query, chunk_ids, model_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.exact_hits += 1
+                    return entry[2]
+                self._drop(key)
+
+            # Similarity fallback: only answers built from exactly the same chunks qualify
+            best_key, best_score = None, self.similarity_threshold
+            query_embedding = np.asarray(query_embedding, dtype='float32').ravel()
+            for candidate in self._by_context.get(context_key, ()):
+                expires_at, candidate_embedding, _ = self._entries[candidate]
+                if expires_at <= now:
+                    continue
+                score = float(np.dot(query_embedding, candidate_embedding))
+                if score >= best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.similar_hits += 1
+            return self._entries[best_key][2]
+
+    def put(self, query, query_embedding, chunk_ids, model_name, answer):
+        """Stores an answer. query_embedding must be unit-length (cosine = dot product)."""
+        key, context_key = self._keys(query, chunk_ids, model_name)
+        now = time.monotonic()
+        embedding = np.asarray(query_embedding, dtype='float32').ravel()
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, embedding, answer)
+            self._entries.move_to_end(key)
+            self._by_context.setdefault(context_key, set()).add(key)
+
+            if len(self._entries) > self.maxsize:
+                self._purge_expired(now)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self):
+        """Hit/miss counters and current size, for display or logging."""
+        with self._lock:
+            total = self.exact_hits + self.similar_hits + self.misses
+            hits = self.exact_hits + self.similar_hits
+            return {
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -1,52 +1,87 @@
 import streamlit as st
-import json
-import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-import google.generativeai as genai # New import for Gemini
-import time # Just for a simple "typing" effect
+import os
+import time
+from background_loader import BackgroundLoader
+from encoders import load_encoder, encoder_model_key
+from query_cache import QueryEmbeddingCache
+from answer_cache import AnswerCache
+from generation import stream_cached_response, StubGenerativeModel, prompt_stats
+from reranker import load_reranker, RERANK_MODEL_NAME
+from retrieval import search_lexical, select_results, candidate_count, RETRIEVAL_MODES, SCORE_LABELS
+import service_client
 
 # --- Configuration ---
-EMBEDDINGS_FILE = "osho_master_embeddings.json" # Use your latest v4 file
+STORE_PREFIX = os.environ.get("OSHO_STORE", "osho_master_store")  # Binary store written by combine_embeddings.py
 MODEL_NAME = "all-MiniLM-L6-v2"
 TOP_K = 3  # Number of best matching results to retrieve
+QUERY_CACHE_SIZE = 2048  # Query embeddings kept in memory per worker
+QUERY_CACHE_DB = "osho_query_cache.sqlite"  # Shared across workers and restarts (None to disable)
+BATCH_MAX_SIZE = 16  # Concurrent sessions' queries encoded and searched together
+BATCH_MAX_WAIT_MS = 5  # How long a query waits for others to join its batch
+MIN_SCORE = 0.25  # Cosine similarity below which a passage counts as irrelevant (Gemini is not called)
+RETRIEVAL_MODE = os.environ.get("OSHO_RETRIEVAL_MODE", "hybrid")  # Default of the sidebar switch (see retrieval.py)
+# Cross-encoder re-ranking of the first-stage results (see reranker.py); off with OSHO_RERANK=0
+RERANK_ENABLED = os.environ.get("OSHO_RERANK", "1") == "1"
+RERANK_CANDIDATES = 30  # N: passages fetched from the index and scored, of which the best TOP_K are kept
+RERANK_TIME_BUDGET_MS = 300  # Scoring stops after this; the rest keep their retrieval order
+ENCODER_BACKEND = os.environ.get("OSHO_ENCODER_BACKEND", "torch")  # Or an exported "torchscript"/"onnx"/"onnx-int8" model (encoders.py)
+ENCODER_THREADS = int(os.environ.get("OSHO_ENCODER_THREADS", 0)) or None  # Intra-op threads (None: one per core)
+# Search the store's shards (sharded_index.py) in parallel instead of its single index
+SHARDED_INDEX = os.environ.get("OSHO_SHARDED_INDEX") == "1"
+# Render the page at once and load the AI core in a background thread (0 waits for it before rendering)
+LAZY_STARTUP = os.environ.get("OSHO_LAZY_STARTUP", "1") == "1"
+GENERATIVE_MODEL_NAME = "models/gemini-pro-latest"
+USE_STUB_GENERATOR = os.environ.get("OSHO_STUB_LLM") == "1"  # Local fake LLM, no API key needed
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 24 * 3600  # Seconds
+ANSWER_SIMILARITY_THRESHOLD = 0.95  # Reuse an answer for a near-identical question on the same passages
+# When set (e.g. "http://127.0.0.1:8000"), the UI is a thin client of rag_service.py and loads no models
+RAG_SERVICE_URL = os.environ.get("OSHO_RAG_SERVICE_URL")
 
 # --- AI Core Loading (with Caching) ---
 
 # This function loads your retrieval (search) model
-@st.cache_resource
-def load_retrieval_core(embeddings_file, model_name):
-    """Loads data, builds the FAISS index, and loads the sentence model."""
+def load_retrieval_core(store_prefix, model_name):
+    """Loads the prebuilt FAISS index and its metadata, the BM25 index if built, and the (cached) sentence model."""
+    # Imported here, in the loader thread, so faiss is not loaded before the page renders
+    from faiss_index import load_index_artifact
+    from sharded_index import load_sharded_index
+    from lexical_index import load_lexical_index
     print("--- (AI CORE) Loading Retrieval (Search) Core... ---")
     
-    with open(embeddings_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    embeddings = [item['embedding'] for item in data]
-    texts = [item['text'] for item in data]
-    embedding_array = np.array(embeddings).astype('float32')
-    
-    d = embedding_array.shape[1] 
-    index = faiss.IndexFlatL2(d)
-    index.add(embedding_array)
+    index, meta = (load_sharded_index if SHARDED_INDEX else load_index_artifact)(store_prefix)
+    data = meta['chunks']  # Chunk text is read from the corpus only for the hits
+    try:
+        lexical_index = load_lexical_index(store_prefix, meta)
+    except FileNotFoundError:
+        print("--- (AI CORE) No BM25 index found, only dense retrieval is available. ---")
+        lexical_index = None
     
-    model = SentenceTransformer(model_name)
+    # Repeated questions (and Streamlit reruns) are served from the cache, not re-encoded
+    model = QueryEmbeddingCache(load_encoder(model_name, ENCODER_BACKEND, threads=ENCODER_THREADS),
+                                encoder_model_key(model_name, ENCODER_BACKEND),
+                                maxsize=QUERY_CACHE_SIZE, db_path=QUERY_CACHE_DB)
     
     print("--- (AI CORE) Retrieval Core Loaded. ---")
-    return index, model, texts, data
+    return index, model, data, lexical_index
 
 # This NEW function loads your generative (answer) model
 @st.cache_resource
 def load_generative_model():
     """Loads the Google Gemini model using the API key from secrets."""
     print("--- (AI CORE) Loading Generative (Answer) Core... ---")
+    if USE_STUB_GENERATOR:
+        print("--- (AI CORE) Using the local stub generator. ---")
+        return StubGenerativeModel()
     try:
+        import google.generativeai as genai  # A slow import, deferred until an answer is needed
+
         # Load API key from Streamlit's secrets
         api_key = st.secrets["GEMINI_API_KEY"]
         genai.configure(api_key=api_key)
         
         # Using Gemini 1.5 Flash - it's fast and powerful
-        model = genai.GenerativeModel('models/gemini-pro-latest')
+        model = genai.GenerativeModel(GENERATIVE_MODEL_NAME)
         print("--- (AI CORE) Generative Core Loaded. ---")
         return model
     except FileNotFoundError:
@@ -59,54 +94,44 @@ def load_generative_model():
         st.error(f"An error occurred loading the generative model: {e}")
         return None
 
-# --- Semantic Search Function (Retrieval) ---
+# --- Semantic Search (Retrieval) ---
 
-def semantic_search(query, index, model, texts, data, top_k):
-    """Runs the query, finds the top K matches, and returns the results as a list."""
-    query_embedding = model.encode([query], convert_to_numpy=True).astype('float32')
-    D, I = index.search(query_embedding, top_k)
-    
-    results = []
-    for i in range(top_k):
-        chunk_index = I[0][i]
-        if chunk_index < len(texts):
-            results.append({
-                "score": 1 / (1 + D[0][i]),
-                "text": texts[chunk_index],
-                "source_id": data[chunk_index]['id'],
-                "book": data[chunk_index]['source']
-            })
-    return results
-
-# --- RAG Response Generation Function ---
-
-def generate_response(model, query, context_chunks):
-    """Builds a prompt and asks the LLM to generate an answer."""
-    
-    # Combine the text from all context chunks
-    context = "\n\n".join([chunk['text'] for chunk in context_chunks])
-    
-    # Build the prompt
-    prompt = f"""
-    You are an AI assistant who answers questions by drawing insights from Osho's teachings.
-    Based *only* on the context provided below, answer the user's question.
-    If the context is not sufficient to answer the question, clearly state that.
-
-    **Context from Osho's Discourses:**
-    {context}
+# This function loads everything the local search path needs
+def load_search_core(store_prefix, model_name):
+    """
+    Returns (search_batcher, lexical_index, reranker): the retrieval core behind a
+    MicroBatcher, so concurrent queries are encoded and searched together, and the
+    re-ranking cross-encoder (None when disabled). Runs in the loader thread, so no st.* calls.
+    """
+    from micro_batcher import MicroBatcher
+    index, model, data, lexical_index = load_retrieval_core(store_prefix, model_name)
+    search_batcher = MicroBatcher(model, index, data, max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+    reranker = None
+    if RERANK_ENABLED:
+        print("--- (AI CORE) Loading Re-ranking Cross-Encoder... ---")
+        reranker = load_reranker(RERANK_MODEL_NAME, candidates=RERANK_CANDIDATES, time_budget_ms=RERANK_TIME_BUDGET_MS)
+    return search_batcher, lexical_index, reranker
 
-    **User's Question:**
-    {query}
+# This function starts loading the search core once per worker, shared by all its sessions
+@st.cache_resource
+def start_search_core(store_prefix, model_name):
+    """Loads the search core in a background thread; the page renders (and reports progress) meanwhile."""
+    return BackgroundLoader(lambda: load_search_core(store_prefix, model_name), name="search-core-loader")
 
-    **Your Answer:**
-    """
-    
+def wait_for_search_core(search_core):
+    """Returns the loaded search core. A failed load is dropped from the cache, so the next rerun starts it again."""
     try:
-        # Generate the response
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"An error occurred during generation: {e}"
+        return search_core.result()
+    except Exception:
+        start_search_core.clear()
+        raise
+
+# This function creates the per-worker answer cache
+@st.cache_resource
+def load_answer_cache():
+    """Creates the RAG answer cache, shared by every session in this worker."""
+    return AnswerCache(maxsize=ANSWER_CACHE_SIZE, ttl_seconds=ANSWER_CACHE_TTL,
+                       similarity_threshold=ANSWER_SIMILARITY_THRESHOLD)
 
 # --- Streamlit App UI ---
 
@@ -117,39 +142,93 @@ st.set_page_config(page_title="Osho AI (RAG)", layout="wide")
 st.title("🧠 Osho AI (RAG Edition)")
 st.write("Ask a question, and the AI will answer based on Osho's passages.")
 
-# Load both AI models
+# Load both AI models (unless the service does the work). With LAZY_STARTUP the
+# search core loads in the background and Gemini on the first question instead.
 try:
-    retrieval_index, retrieval_model, ai_texts, ai_data = load_retrieval_core(EMBEDDINGS_FILE, MODEL_NAME)
-    generative_model = load_generative_model()
+    if RAG_SERVICE_URL:
+        backend_ready = True
+    else:
+        search_core = start_search_core(STORE_PREFIX, MODEL_NAME)
+        if not LAZY_STARTUP:
+            wait_for_search_core(search_core)
+        generative_model = None if LAZY_STARTUP else load_generative_model()
+        answer_cache = load_answer_cache()
+        backend_ready = LAZY_STARTUP or generative_model is not None
 
     # Only show the app if both models loaded successfully
-    if retrieval_index is not None and generative_model is not None:
+    if backend_ready:
         
+        if RAG_SERVICE_URL:
+            retrieval_mode = "dense"  # The service retrieves by embedding only
+        elif not search_core.ready():
+            if search_core.state == "failed":
+                wait_for_search_core(search_core)  # Raises the load error, reported below
+            st.sidebar.info(f"Loading the search index and models... ({search_core.elapsed():.0f}s)")
+            retrieval_mode, selected_books = RETRIEVAL_MODE, []  # Until the core is ready (and the options known)
+        else:
+            search_batcher, lexical_index, reranker = search_core.result()
+            modes = RETRIEVAL_MODES if lexical_index is not None else ("dense",)
+            retrieval_mode = st.sidebar.radio("Retrieval mode", modes,
+                                              index=modes.index(RETRIEVAL_MODE) if RETRIEVAL_MODE in modes else 0,
+                                              help="Lexical (BM25) finds exact names and Sanskrit terms; "
+                                                   "hybrid fuses it with the dense ranking.")
+            # Only the chunks of the selected books are searched (none selected searches everything)
+            selected_books = st.sidebar.multiselect("Search only in", search_batcher.data.titles())
+
         user_query = st.text_input("Your Question:", placeholder="e.g., What is the problem with suppressed sex?")
 
         if st.button("Ask Osho AI"):
             if user_query.strip():
                 
                 # --- Step 1: RETRIEVE (R) ---
-                search_results = semantic_search(user_query, retrieval_index, retrieval_model, ai_texts, ai_data, TOP_K)
+                if RAG_SERVICE_URL:
+                    # One request: the service sends the passages first, then streams the answer
+                    search_results, answer_stream = service_client.stream_answer(RAG_SERVICE_URL, user_query,
+                                                                                 TOP_K, MIN_SCORE)
+                else:
+                    if not search_core.ready():
+                        with st.spinner("Loading the search index and models..."):
+                            search_batcher, lexical_index, reranker = wait_for_search_core(search_core)
+                        if lexical_index is None:
+                            retrieval_mode = "dense"
+                    if generative_model is None:
+                        generative_model = load_generative_model()
+                        if generative_model is None:
+                            st.stop()  # load_generative_model has shown the error
+                    retrieve_start = time.perf_counter()
+                    first_stage_k = reranker.candidates if reranker else TOP_K
+                    candidates = candidate_count(retrieval_mode, first_stage_k)
+                    query_embedding, dense_results = search_batcher.search(user_query, candidates, MIN_SCORE,
+                                                                           selected_books)
+                    lexical_results = ([] if retrieval_mode == "dense" else
+                                       search_lexical(user_query, lexical_index, search_batcher.data, candidates,
+                                                      selected_books))
+                    search_results = select_results(retrieval_mode, dense_results, lexical_results, first_stage_k)
+                    retrieve_ms = (time.perf_counter() - retrieve_start) * 1000
+                    if reranker:
+                        search_results, rerank_timings = reranker.rerank(user_query, search_results, TOP_K)
+                    answer_stream = None
                 
                 if not search_results:
+                    # Nothing cleared MIN_SCORE, so skip the (slow, paid) Gemini call entirely
                     st.warning("I could not find any relevant passages to answer this question.")
                 else:
                     
                     # --- Step 2 & 3: AUGMENT (A) & GENERATE (G) ---
                     st.subheader("Osho's Answer (Generated):")
                     
-                    # Use a spinner to show "thinking"
+                    # Use a spinner to show "thinking" until the stream has finished
                     with st.spinner("Thinking..."):
-                        generated_answer = generate_response(generative_model, user_query, search_results)
+                        if answer_stream is None:
+                            # Cached by query embedding + retrieved chunks; only misses reach Gemini
+                            answer_stream = stream_cached_response(answer_cache, generative_model, GENERATIVE_MODEL_NAME,
+                                                                   user_query, query_embedding, search_results)
                         
-                        # Simple "typing" effect
+                        # Render tokens as the backend delivers them
                         answer_placeholder = st.empty()
                         full_response = ""
-                        for chunk in generated_answer.split():
-                            full_response += chunk + " "
-                            time.sleep(0.05)
+                        for chunk in answer_stream:
+                            full_response += chunk
                             answer_placeholder.markdown(full_response + "▌")
                         answer_placeholder.markdown(full_response)
 
@@ -158,14 +237,44 @@ try:
                     # --- Step 4: Display the Sources Used ---
                     st.subheader("Passages Used as Context:")
                     for i, result in enumerate(search_results):
-                        with st.expander(f"Source {i+1} (Score: {result['score']:.4f}) | {result['book']}"):
+                        rerank_score = (f", cross-encoder: {result['rerank_score']:.2f}"
+                                        if 'rerank_score' in result else "")
+                        with st.expander(f"Source {i+1} ({SCORE_LABELS[retrieval_mode]}: {result['score']:.4f}"
+                                         f"{rerank_score}) | {result['book']}"):
                             st.markdown(f"> {result['text']}")
                             st.caption(f"ID: {result['source_id']}")
 
+                    if not RAG_SERVICE_URL:
+                        cache_stats = search_batcher.encoder.stats()
+                        st.sidebar.caption(f"Query cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                                           f"({cache_stats['hit_rate']:.0%})")
+                        answer_stats = answer_cache.stats()
+                        st.sidebar.caption(f"Answer cache: {answer_stats['exact_hits']} exact + "
+                                           f"{answer_stats['similar_hits']} similar hits / {answer_stats['misses']} misses")
+                        prompt_sizes = prompt_stats.stats()
+                        st.sidebar.caption(f"Prompt: {prompt_sizes['last_prompt_tokens']} tokens "
+                                           f"(mean {prompt_sizes['mean_prompt_tokens']:.0f}, "
+                                           f"{prompt_sizes['dropped_chunks']} chunks over budget so far)")
+                        batch_stats = search_batcher.stats()
+                        st.sidebar.caption(f"Search batches: {batch_stats['mean_batch_size']:.1f} queries avg, "
+                                           f"queueing p99 {batch_stats['queue_delay_p99_ms']:.1f} ms")
+                        if reranker:
+                            rerank_stats = reranker.stats()
+                            st.sidebar.caption(f"Latency: retrieve {retrieve_ms:.1f} ms, "
+                                               f"dedup {rerank_timings['dedup_ms']:.1f} ms, "
+                                               f"rerank {rerank_timings['rerank_ms']:.1f} ms "
+                                               f"({rerank_timings['scored']} scored, "
+                                               f"{rerank_timings['unscored']} over budget, "
+                                               f"{rerank_timings['duplicates']} duplicates dropped)")
+                            st.sidebar.caption(f"Re-rank cache: {rerank_stats['hits']} hits / "
+                                               f"{rerank_stats['misses']} misses ({rerank_stats['hit_rate']:.0%})")
+                        else:
+                            st.sidebar.caption(f"Latency: retrieve {retrieve_ms:.1f} ms")
+
             else:
                 st.warning("Please enter a question.")
 
 except FileNotFoundError:
-    st.error(f"Error: The data file '{EMBEDDINGS_FILE}' was not found. Please run the full data pipeline first.")
+    st.error(f"Error: The vector store or index for '{STORE_PREFIX}' was not found. Please run the full data pipeline (including faiss_index.py) first.")
 except Exception as e:
     st.error(f"An unexpected error occurred during setup: {e}")
\ No newline at end of file
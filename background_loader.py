@@ -0,0 +1,46 @@
+import threading
+import time
+
+
+class BackgroundLoader:
+    """
+    Runs a slow loading function (models, indexes) in a daemon thread from the
+    moment it is created, so a UI can render and take input meanwhile.
+    state is "loading", "ready" or "failed"; result() waits for the outcome.
+    """
+
+    def __init__(self, load, name="background-loader"):
+        self.state = "loading"
+        self.error = None
+        self.started = time.perf_counter()
+        self.finished = None
+        self._result = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(load,), name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self, load):
+        try:
+            self._result = load()
+            self.state = "ready"
+        except BaseException as e:  # Reported to whoever waits for the result
+            self.error = e
+            self.state = "failed"
+        finally:
+            self.finished = time.perf_counter()
+            self._done.set()
+
+    def ready(self):
+        return self.state == "ready"
+
+    def elapsed(self):
+        """Seconds spent loading so far (or in total, once finished)."""
+        return (self.finished or time.perf_counter()) - self.started
+
+    def result(self, timeout=None):
+        """Waits for the load and returns its result, or raises the error it failed with."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Still loading after {self.elapsed():.1f}s.")
+        if self.error is not None:
+            raise self.error
+        return self._result
@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from encoders import load_encoder, ENCODER_BACKENDS
+from faiss_index import load_index_artifact
+from retrieval import search_embeddings
+from generation import generate_text, load_gemini_model, StubGenerativeModel, prompt_stats
+
+# --- Configuration ---
+STORE_PREFIX = "osho_master_store"
+MODEL_NAME = "all-MiniLM-L6-v2"
+GENERATIVE_MODEL_NAME = "models/gemini-pro-latest"
+TOP_K = 3
+MIN_SCORE = 0.25
+ENCODE_BATCH_SIZE = 64
+MAX_WORKERS = 4           # Concurrent generation requests
+REQUESTS_PER_SECOND = 1.0  # Generation rate limit across all workers
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2.0       # Seconds, doubled after each failed attempt
+
+
+def read_queries(path):
+    """
+    Reads queries from a .jsonl file (one object per line with a 'query' or 'question'
+    field) or a .csv file (a 'query' or 'question' column). An 'id' field is kept if present.
+    An empty file is rejected, as there would be nothing to answer.
+    """
+    if path.endswith(".csv"):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    queries = []
+    for i, row in enumerate(rows):
+        text = row.get('query') or row.get('question')
+        if not text or not text.strip():
+            raise ValueError(f"Row {i + 1} of '{path}' has no 'query' or 'question'.")
+        queries.append({"id": row.get('id') or str(i + 1), "query": text.strip()})
+    if not queries:
+        raise ValueError(f"'{path}' contains no queries.")
+    return queries
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+def generate_with_retries(model, query, context_chunks, limiter, max_retries, backoff):
+    """Generates one answer under the rate limit, retrying failures with exponential backoff."""
+    attempt = 0
+    while True:
+        limiter.wait()
+        try:
+            return generate_text(model, query, context_chunks), attempt + 1, None
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries:
+                return None, attempt, str(e)
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+
+def run_batch(queries, index, encoder, data, generative_model, args):
+    """Encodes, searches and (optionally) generates for every query; returns records and stage timings."""
+    start = time.perf_counter()
+    query_embeddings = encoder.encode([q['query'] for q in queries], batch_size=args.encode_batch_size,
+                                      convert_to_numpy=True, normalize_embeddings=True).astype('float32')
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    all_results = search_embeddings(query_embeddings, index, data, args.top_k, args.min_score)
+    search_seconds = time.perf_counter() - start
+
+    records = [{
+        "id": q['id'],
+        "query": q['query'],
+        "results": results,
+        "timings": {
+            # Batch stages are shared, so each query is charged its average share
+            "encode_s": encode_seconds / len(queries),
+            "search_s": search_seconds / len(queries),
+        },
+    } for q, results in zip(queries, all_results)]
+
+    generate_seconds = 0.0
+    if generative_model is not None:
+        limiter = RateLimiter(args.rate)
+
+        def answer(record):
+            if not record['results']:
+                record['answer'] = None  # Nothing relevant retrieved, do not spend an LLM call
+                record['timings']['generate_s'] = 0.0
+                return
+            started = time.perf_counter()
+            text, attempts, error = generate_with_retries(generative_model, record['query'], record['results'],
+                                                          limiter, args.max_retries, RETRY_BACKOFF)
+            record['answer'] = text
+            record['attempts'] = attempts
+            if error:
+                record['error'] = error
+            record['timings']['generate_s'] = time.perf_counter() - started
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(answer, records))
+        generate_seconds = time.perf_counter() - start
+
+    return records, {"encode_s": encode_seconds, "search_s": search_seconds, "generate_s": generate_seconds}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer a file of questions in batch (JSONL or CSV in, JSONL out).")
+    parser.add_argument("input", help="Queries file (.jsonl or .csv)")
+    parser.add_argument("output", help="Results file (.jsonl)")
+    parser.add_argument("--store", default=STORE_PREFIX)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE)
+    parser.add_argument("--encode-batch-size", type=int, default=ENCODE_BATCH_SIZE)
+    parser.add_argument("--encoder-backend", choices=ENCODER_BACKENDS, default="torch",
+                        help="Exported backends must be exported first (encoders.py)")
+    parser.add_argument("--encoder-threads", type=int, default=None, help="Intra-op threads of the encoder")
+    parser.add_argument("--generate", action="store_true", help="Also generate answers with the LLM")
+    parser.add_argument("--stub-llm", action="store_true", help="Use the local stub generator instead of Gemini")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="LLM requests per second")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES)
+    return parser.parse_args()
+
+
+# --- Run Batch ---
+if __name__ == "__main__":
+    args = parse_args()
+
+    queries = read_queries(args.input)
+    print(f"Loaded {len(queries)} queries from '{args.input}'.")
+
+    index, meta = load_index_artifact(args.store)
+    encoder = load_encoder(MODEL_NAME, args.encoder_backend, threads=args.encoder_threads)
+
+    generative_model = None
+    if args.generate:
+        generative_model = StubGenerativeModel() if args.stub_llm else load_gemini_model(GENERATIVE_MODEL_NAME)
+
+    records, timings = run_batch(queries, index, encoder, meta['chunks'], generative_model, args)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(f"Encode: {timings['encode_s']:.2f}s | Search: {timings['search_s']:.3f}s | "
+          f"Generate: {timings['generate_s']:.2f}s")
+    if generative_model is not None:
+        prompt_sizes = prompt_stats.stats()
+        print(f"Prompts: {prompt_sizes['mean_prompt_tokens']:.0f} tokens avg, {prompt_sizes['max_prompt_tokens']} max "
+              f"({prompt_sizes['dropped_chunks']} of {prompt_sizes['chunks']} chunks over the context budget)")
+    print(f"Results for {len(records)} queries saved to '{args.output}'.")
@@ -0,0 +1,113 @@
+import re
+import sys
+import time
+from bisect import bisect_right
+from chunk_osho_text import chunk_spans, char_lengths, token_lengths, load_tokenizer, sentence_spans
+
+# --- Configuration ---
+CLEANED_TEXT = "cleaned_book_2.txt"  # The 3.6 MB book
+MODEL_NAME = "all-MiniLM-L6-v2"
+CHAR_BUDGET = (500, 50)
+TOKEN_BUDGET = (254, 32)
+REPEATS = 3
+
+
+def chunk_text_concat(text, max_chunk_size=500, overlap_size=50):
+    """The previous chunker (string concatenation, character sizes). Kept as the reference."""
+    chunks = []
+    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+    for para in paragraphs:
+        if len(para) <= max_chunk_size:
+            chunks.append(para)
+        else:
+            sentences = re.split(r'(?<=[.!?])\s+', para)
+            current_chunk = ""
+            for sentence in sentences:
+                if len(current_chunk) + len(sentence) + 1 <= max_chunk_size:
+                    current_chunk += (sentence + " ").strip()
+                else:
+                    if current_chunk:
+                        chunks.append(current_chunk)
+                        overlap_start_index = max(0, len(current_chunk) - overlap_size)
+                        current_chunk = current_chunk[overlap_start_index:].strip() + " " + sentence + " "
+                        current_chunk = current_chunk.strip()
+                    else:
+                        chunks.append(sentence[:max_chunk_size])
+                        current_chunk = sentence[max_chunk_size:].strip() + " "
+            if current_chunk:
+                chunks.append(current_chunk)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+def best_time(fn):
+    best, result = float('inf'), None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def check_spans(text, spans, max_size, length_fn):
+    """Spans are ordered and in bounds, respect the budget and together cover every sentence."""
+    problems = []
+    if any(not 0 <= start < end <= len(text) for start, end in spans):
+        problems.append("span out of bounds")
+    if any(b[0] < a[0] for a, b in zip(spans, spans[1:])):
+        problems.append("spans out of order")
+    sizes = length_fn([text[start:end] for start, end in spans])
+    oversized = sum(size > max_size and len(text[start:end].split()) > 1
+                    for size, (start, end) in zip(sizes, spans))
+    if oversized:
+        problems.append(f"{oversized} chunks over budget")
+    sentences, _ = sentence_spans(text)
+    starts = [start for start, _ in spans]
+
+    def inside(start, end):
+        i = bisect_right(starts, start) - 1
+        return i >= 0 and spans[i][1] >= end
+
+    # A sentence longer than the budget is covered by several pieces, word by word
+    uncovered = sum(not inside(start, end) and
+                    not all(inside(start + m.start(), start + m.end()) for m in re.finditer(r'\S+', text[start:end]))
+                    for start, end in sentences)
+    if uncovered:
+        problems.append(f"{uncovered} sentences not covered")
+    return problems, sizes
+
+
+def report(name, text, chunks, seconds, sizes, unit):
+    size_mb = len(text.encode('utf-8')) / 1e6
+    print(f"{name:<24} {seconds:>8.3f} {size_mb / seconds:>8.1f} {len(chunks):>8} "
+          f"{sum(sizes) / len(sizes):>10.1f} {max(sizes):>6} {unit:>7}")
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    with open(CLEANED_TEXT, 'r', encoding='utf-8') as f:
+        text = f.read()
+    print(f"Chunking '{CLEANED_TEXT}' ({len(text) / 1e6:.1f}M characters)")
+    print(f"{'chunker':<24} {'seconds':>8} {'MB/s':>8} {'chunks':>8} {'mean size':>10} {'max':>6} {'unit':>7}")
+
+    old_chunks, old_s = best_time(lambda: chunk_text_concat(text, *CHAR_BUDGET))
+    report("string concatenation", text, old_chunks, old_s, char_lengths(old_chunks), "chars")
+    altered = sum(chunk not in text for chunk in old_chunks)
+
+    failed = False
+    runs = [("offsets, chars", CHAR_BUDGET, char_lengths, "chars")]
+    try:
+        runs.append(("offsets, tokens", TOKEN_BUDGET, token_lengths(load_tokenizer(MODEL_NAME)), "tokens"))
+    except (ImportError, OSError) as e:
+        print(f"(Skipping token budgets, no tokenizer available: {e})")
+    for name, (max_size, overlap), length_fn, unit in runs:
+        spans, seconds = best_time(lambda: chunk_spans(text, max_size, overlap, length_fn))
+        problems, sizes = check_spans(text, spans, max_size, length_fn)
+        report(name, text, spans, seconds, sizes, unit)
+        for problem in problems:
+            print(f"  PROBLEM: {problem}")
+        failed = failed or bool(problems)
+
+    print(f"\nChunks that are not verbatim text of the book: string concatenation {altered} "
+          f"of {len(old_chunks)} (sentences glued together), offsets 0 by construction.")
+    if failed:
+        sys.exit("Chunk checks FAILED.")
@@ -0,0 +1,80 @@
+import json
+import os
+import re
+import time
+import tracemalloc
+from clean_osho_text import clean_osho_text, clean_text
+
+# --- Configuration ---
+BOOKS_MANIFEST = "books.json"  # The outputs are checked against golden files by test_clean_osho_text.py
+OUTPUT_FILE = "benchmark_cleaned.tmp.txt"
+REPEATS = 3
+
+
+def clean_text_multipass(raw_text, book_title=None, strip_headers=True):
+    """The previous cleaner: one full-string regex pass per rule. Kept as the reference."""
+    cleaned_text = raw_text
+    if strip_headers:
+        cleaned_text = re.sub(r'^\s*\d+\s+OSHO\b', '', cleaned_text, flags=re.MULTILINE)
+        if book_title:
+            book_title_pattern = r'^\s*' + re.escape(book_title) + r'\s*$'
+            cleaned_text = re.sub(book_title_pattern, '', cleaned_text, flags=re.MULTILINE | re.IGNORECASE)
+    cleaned_text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', cleaned_text)
+    cleaned_text = re.sub(r'\n{2,}', '---PARAGRAPH_BREAK---', cleaned_text)
+    cleaned_text = cleaned_text.replace('\n', ' ')
+    cleaned_text = cleaned_text.replace('---PARAGRAPH_BREAK---', '\n\n')
+    cleaned_text = re.sub(r' {2,}', ' ', cleaned_text)
+    cleaned_text = re.sub(r'([.,;!?"])([a-zA-Z])', r'\1 \2', cleaned_text)
+    cleaned_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', cleaned_text)
+    cleaned_text = re.sub(r'([.,;!?"])([a-z])', r'\1 \2', cleaned_text)
+    cleaned_text = cleaned_text.strip()
+    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
+    return cleaned_text
+
+
+def measure(fn):
+    """Returns (result, best seconds over REPEATS, peak traced MB of one run)."""
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, best, peak_mb
+
+
+def read_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def benchmark_book(book):
+    """Times the multi-pass cleaner and the engine (on a string and streamed) on one book."""
+    profile = book["cleaning_profile"]
+    strip_headers = profile == "osho_standard"
+
+    legacy, legacy_s, legacy_mb = measure(
+        lambda: clean_text_multipass(read_file(book["extracted"]), book["title"], strip_headers))
+    _, engine_s, engine_mb = measure(lambda: clean_text(read_file(book["extracted"]), book["title"], profile))
+    _, stream_s, stream_mb = measure(
+        lambda: clean_osho_text(book["extracted"], OUTPUT_FILE, book["title"], profile))
+
+    size_mb = len(legacy.encode('utf-8')) / 1e6
+    print(f"\n=== {book['id']} ({profile}), {size_mb:.1f} MB cleaned ===")
+    print(f"{'cleaner':<18} {'seconds':>8} {'MB/s':>8} {'peak MB':>8}")
+    for name, seconds, peak_mb in [("multi-pass regex", legacy_s, legacy_mb),
+                                   ("engine (string)", engine_s, engine_mb),
+                                   ("engine (stream)", stream_s, stream_mb)]:
+        print(f"{name:<18} {seconds:>8.3f} {size_mb / seconds:>8.1f} {peak_mb:>8.1f}")
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    with open(BOOKS_MANIFEST, 'r', encoding='utf-8') as f:
+        books = json.load(f)
+    for book in books:
+        benchmark_book(book)
+    os.remove(OUTPUT_FILE)
@@ -0,0 +1,38 @@
+import time
+import numpy as np
+from embedding_store import load_embedding_store
+from lexical_index import load_lexical_index
+from retrieval import search_lexical
+from context_packer import pack_context, estimate_tokens, CONTEXT_TOKEN_BUDGET
+
+# --- Configuration ---
+STORE_PREFIX = "osho_store_v4"
+TOP_KS = [3, 10, 20, 50]
+QUERIES = [
+    "What is the problem with suppressed sex?", "What is love?", "tantra meditation techniques",
+    "the mind is not poison", "why do saints condemn sex", "how does energy transform",
+]
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    _, meta = load_embedding_store(STORE_PREFIX)
+    data = meta['chunks']
+    lexical_index = load_lexical_index(STORE_PREFIX, meta)  # Lexical retrieval: no embedding model needed
+
+    print(f"Context of {len(QUERIES)} queries, budget {CONTEXT_TOKEN_BUDGET} tokens")
+    print(f"{'top_k':>6} {'concatenated':>13} {'packed':>8} {'merged':>7} {'dropped':>8} {'pack ms':>8}")
+    for top_k in TOP_KS:
+        concatenated, packed_tokens, merged, dropped_chunks, times = [], [], 0, 0, []
+        for query in QUERIES:
+            results = search_lexical(query, lexical_index, data, top_k)
+            start = time.perf_counter()
+            passages, dropped = pack_context(results)
+            times.append((time.perf_counter() - start) * 1000)
+
+            concatenated.append(estimate_tokens("\n\n".join(result['text'] for result in results)))
+            packed_tokens.append(sum(passage['tokens'] for passage in passages))
+            merged += sum(len(passage['source_ids']) - 1 for passage in passages)
+            dropped_chunks += len(dropped)
+        print(f"{top_k:>6} {np.mean(concatenated):>13.0f} {np.mean(packed_tokens):>8.0f} {merged:>7} "
+              f"{dropped_chunks:>8} {np.median(times):>8.2f}")
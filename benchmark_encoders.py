@@ -0,0 +1,78 @@
+import os
+import time
+import numpy as np
+from embedding_store import load_embedding_store
+from encoders import load_encoder, encoder_artifact_dir, MODEL_FILES
+
+# --- Configuration ---
+MODEL_NAME = "all-MiniLM-L6-v2"
+STORE_PREFIX = "osho_store_v4"  # Its chunks are the corpus sample
+BACKENDS = ["torch", "torchscript", "onnx", "onnx-int8"]  # Backends without an export (encoders.py) are skipped
+THREADS = [1, None]             # Intra-op threads; None is the runtime's default (one per core)
+N_CHUNKS = 256
+QUERIES = [
+    "What is the problem with suppressed sex?", "What is love?", "Vigyan Bhairav Tantra",
+    "how does meditation transform sexual energy", "why do saints condemn sex", "Shiva",
+    "the mind is not poison", "what is superconsciousness",
+]
+QUERY_REPEATS = 5               # Batch-1 latency samples per query
+CORPUS_BATCH_SIZE = 64
+TOP_K = 10
+
+
+def query_latency_ms(encoder):
+    """Batch 1, as a search request encodes its query: p50 and p95 milliseconds."""
+    encoder.encode(QUERIES[:1], convert_to_numpy=True, normalize_embeddings=True)  # Warm-up
+    times = []
+    for _ in range(QUERY_REPEATS):
+        for query in QUERIES:
+            start = time.perf_counter()
+            encoder.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+            times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def corpus_throughput(encoder, texts):
+    """Batch 64, as generate_embeddings encodes a corpus: texts per second and the embeddings."""
+    encoder.encode(texts[:CORPUS_BATCH_SIZE], batch_size=CORPUS_BATCH_SIZE, convert_to_numpy=True,
+                   normalize_embeddings=True)  # Warm-up
+    start = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size=CORPUS_BATCH_SIZE, convert_to_numpy=True,
+                                normalize_embeddings=True)
+    return len(texts) / (time.perf_counter() - start), np.asarray(embeddings, dtype='float32')
+
+
+def top_k_rows(query_embeddings, chunk_embeddings):
+    return np.argsort(-(query_embeddings @ chunk_embeddings.T), axis=1)[:, :TOP_K]
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    _, meta = load_embedding_store(STORE_PREFIX)
+    texts = [chunk['text'] for chunk in meta['chunks'][:N_CHUNKS]]
+    backends = [backend for backend in BACKENDS if backend == "torch" or
+                os.path.exists(os.path.join(encoder_artifact_dir(MODEL_NAME, backend), MODEL_FILES[backend]))]
+    print(f"'{MODEL_NAME}' on {', '.join(backends)} ({len(texts)} chunks of '{STORE_PREFIX}', "
+          f"{len(QUERIES)} queries, {os.cpu_count()} CPUs)")
+
+    reference = None
+    print(f"\n{'backend':<12} {'threads':>7} {'query p50 ms':>13} {'query p95 ms':>13} {'corpus texts/s':>15} "
+          f"{'min cosine':>11} {'top-10 overlap':>15}")
+    for backend in backends:
+        for threads in THREADS:
+            encoder = load_encoder(MODEL_NAME, backend, threads=threads)
+            p50, p95 = query_latency_ms(encoder)
+            throughput, chunk_embeddings = corpus_throughput(encoder, texts)
+            query_embeddings = np.asarray(encoder.encode(QUERIES, convert_to_numpy=True, normalize_embeddings=True),
+                                          dtype='float32')
+            if reference is None:
+                reference = (chunk_embeddings, query_embeddings, top_k_rows(query_embeddings, chunk_embeddings))
+
+            # Drift from the PyTorch embeddings, for reference (test_encoders.py asserts the bounds)
+            min_cosine = min(np.min(np.sum(chunk_embeddings * reference[0], axis=1)),
+                             np.min(np.sum(query_embeddings * reference[1], axis=1)))
+            found = top_k_rows(query_embeddings, chunk_embeddings)
+            overlap = np.mean([np.isin(f, r).mean() for f, r in zip(found, reference[2])])
+            print(f"{backend:<12} {threads or 'default':>7} {p50:>13.2f} {p95:>13.2f} {throughput:>15.1f} "
+                  f"{min_cosine:>11.5f} {overlap:>15.3f}")
+            del encoder
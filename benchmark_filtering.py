@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from embedding_store import save_embedding_store, normalize_rows
+from faiss_index import build_index_artifact, load_index_artifact
+
+# --- Configuration ---
+N_BOOKS = 200
+CHUNKS_PER_BOOK = 1500  # 300k chunks, a few hundred MB of float32 vectors
+DIM = 384
+TOP_K = 10
+N_QUERIES = 20
+SUBSET_BOOKS = [1, 10, 50, 100, N_BOOKS]
+INDEX_TYPES = ["flat", "ivf"]
+
+
+def make_store(prefix, n_books=N_BOOKS, chunks_per_book=CHUNKS_PER_BOOK, n_queries=N_QUERIES):
+    """A synthetic store of n_books books with clustered random vectors (books differ in topic), and queries."""
+    rng = np.random.default_rng(0)
+    topics = rng.standard_normal((n_books, DIM)).astype('float32')
+    vectors = np.repeat(topics, chunks_per_book, axis=0)
+    vectors += 2 * rng.standard_normal(vectors.shape).astype('float32')
+    chunks = [{"id": f"book_{b:03d}_{i:04d}", "text": f"chunk {i}", "source": f"Book {b:03d}"}
+              for b in range(n_books) for i in range(chunks_per_book)]
+    save_embedding_store(prefix, normalize_rows(vectors), chunks, "synthetic", normalized=True)
+    return normalize_rows(rng.standard_normal((n_queries, DIM)) + topics[rng.integers(0, n_books, n_queries)])
+
+
+def latency_ms(fn):
+    times = []
+    for q in range(N_QUERIES):
+        start = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def overfetch_search(index, queries, q, rows):
+    """The unfiltered alternative: fetch k * N / subset hits and drop those outside the subset."""
+    fetch = min(index.ntotal, TOP_K * index.ntotal // rows.size)
+    _, found = index.search(queries[q:q + 1], fetch)
+    return found[0][np.isin(found[0], rows)][:TOP_K]
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, "store")
+        queries = make_store(prefix)
+        vectors = np.load(f"{prefix}_vectors.npy", mmap_mode="r")
+        for index_type in INDEX_TYPES:
+            build_index_artifact(prefix, index_type)
+            index, meta = load_index_artifact(prefix)
+            data = meta['chunks']
+
+            # The recall of an unfiltered search is the floor: a filter must never make results worse
+            _, found = index.search(queries, TOP_K)
+            exact = np.argsort(-(queries @ np.asarray(vectors).T), axis=1)[:, :TOP_K]
+            unfiltered_recall = np.mean([np.isin(e, f).mean() for e, f in zip(exact, found)])
+
+            print(f"\n=== {index_type}, {meta['count']} chunks in {N_BOOKS} books, "
+                  f"unfiltered recall@10 {unfiltered_recall:.3f} ===")
+            print(f"{'books':>6} {'rows':>8} {'filtered ms':>12} {'over-fetch ms':>14} {'recall@10':>10}")
+            for n_books in SUBSET_BOOKS:
+                rows = data.book_rows(data.titles()[:n_books])
+                filtered = latency_ms(lambda q: index.search(queries[q:q + 1], TOP_K, rows=rows))
+                overfetch = latency_ms(lambda q: overfetch_search(index, queries, q, rows))
+
+                _, found = index.search(queries, TOP_K, rows=rows)
+                exact = rows[np.argsort(-(queries @ np.asarray(vectors[rows]).T), axis=1)[:, :TOP_K]]
+                recall = np.mean([np.isin(e, f).mean() for e, f in zip(exact, found)])
+                outside = np.count_nonzero(~np.isin(found[found >= 0], rows))
+                print(f"{n_books:>6} {rows.size:>8} {filtered:>12.2f} {overfetch:>14.2f} {recall:>10.3f}")
+                if outside or recall < unfiltered_recall or (index_type == "flat" and recall < 1.0):
+                    print(f"  PROBLEM: {outside} hits outside the selected books, recall {recall:.3f} "
+                          f"(unfiltered {unfiltered_recall:.3f})")
+                    failed = True
+            del index, data, meta  # Release the mapped files before the directory is removed
+
+    if failed:
+        sys.exit("Filtered search checks FAILED.")
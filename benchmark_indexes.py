@@ -0,0 +1,103 @@
+import time
+import faiss
+import numpy as np
+from embedding_store import load_embedding_store
+from faiss_index import INDEX_TYPES, QUANTIZED_INDEX_TYPES, build_index, pack_sign_bits, RescoringIndex
+
+# --- Configuration ---
+STORE_PREFIX = "osho_store_v4"         # The shipped corpus
+SYNTHETIC_SIZES = [100_000, 1_000_000] # Scaled-up corpora (random clustered vectors)
+SYNTHETIC_CLUSTERS = 1000              # Topic clusters in the synthetic corpora
+NUM_QUERIES = 500
+TOP_K = 10
+QUERY_NOISE = 0.05                     # Queries are perturbed corpus vectors
+SEED = 42
+
+
+def synthetic_corpus(n_vectors, d, n_clusters, rng):
+    """Clustered, unit-normalized vectors. Uniform noise would make every ANN index look bad."""
+    centers = rng.standard_normal((n_clusters, d)).astype('float32')
+    assignments = rng.integers(0, n_clusters, n_vectors)
+    vectors = centers[assignments] + 0.5 * rng.standard_normal((n_vectors, d)).astype('float32')
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors, n_queries, noise, rng):
+    """Samples corpus vectors and perturbs them, so no query is an exact copy of a stored vector."""
+    picks = rng.integers(0, vectors.shape[0], n_queries)
+    queries = np.array(vectors[picks], dtype='float32')
+    queries += noise * rng.standard_normal(queries.shape).astype('float32')
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found, truth):
+    """Fraction of the exact top-k neighbours that the approximate index also returned."""
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def time_single_queries(index, queries, top_k):
+    """Runs one query per search call, as the app does, and returns per-query latencies in ms."""
+    latencies = []
+    for i in range(queries.shape[0]):
+        start = time.perf_counter()
+        index.search(queries[i:i + 1], top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def benchmark_corpus(name, vectors, queries, top_k):
+    """
+    Builds every backend over one corpus and prints recall, latency, build time and
+    memory (also scaled to a million chunks). Quantized backends are searched with
+    float rescoring against the vectors, as the app does; 'raw' is their recall without it.
+    """
+    n_vectors, d = vectors.shape
+    k = min(top_k, n_vectors)
+    print(f"\n=== {name}: {n_vectors} x {d} vectors, {queries.shape[0]} queries, recall@{k} vs float32 ===")
+    print(f"{'backend':<8} {'build s':>9} {'memory MB':>10} {'MB / 1M':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'recall':>8} {'raw':>8}")
+
+    truth = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index, params = build_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+
+        if isinstance(index, faiss.IndexBinary):
+            memory_mb = faiss.serialize_index_binary(index).nbytes / 1e6
+            _, raw_found = index.search(pack_sign_bits(queries), k)
+        else:
+            memory_mb = faiss.serialize_index(index).nbytes / 1e6
+            _, raw_found = index.search(queries, k)
+        if index_type in QUANTIZED_INDEX_TYPES:
+            index = RescoringIndex(index, vectors, index_type, params["rescore"])
+
+        latencies = time_single_queries(index, queries, k)
+        _, found = index.search(queries, k)
+        if truth is None:
+            truth = found  # INDEX_TYPES starts with the exact "flat" backend
+        recall = recall_at_k(found, truth)
+        raw_recall = recall_at_k(raw_found, truth)
+
+        print(f"{index_type:<8} {build_seconds:>9.2f} {memory_mb:>10.1f} {memory_mb / n_vectors * 1e6:>9.0f} "
+              f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f} "
+              f"{recall:>8.3f} {raw_recall:>8.3f}")
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    rng = np.random.default_rng(SEED)
+    faiss.omp_set_num_threads(1)  # Per-query latency as one Streamlit worker sees it
+
+    shipped_vectors, meta = load_embedding_store(STORE_PREFIX)
+    shipped_vectors = np.ascontiguousarray(shipped_vectors, dtype='float32')
+    benchmark_corpus(f"Shipped corpus '{STORE_PREFIX}'", shipped_vectors,
+                     make_queries(shipped_vectors, NUM_QUERIES, QUERY_NOISE, rng), TOP_K)
+
+    for n_vectors in SYNTHETIC_SIZES:
+        vectors = synthetic_corpus(n_vectors, meta['dim'], SYNTHETIC_CLUSTERS, rng)
+        benchmark_corpus("Synthetic corpus", vectors,
+                         make_queries(vectors, NUM_QUERIES, QUERY_NOISE, rng), TOP_K)
@@ -0,0 +1,88 @@
+import math
+import sys
+import time
+from collections import Counter
+import numpy as np
+from chunk_osho_text import chunk_spans
+from lexical_index import build_postings, tokenize, BM25Index, BM25_PARAMS
+
+# --- Configuration ---
+BOOK_TEXTS = ["cleaned_osho_text_v4.txt", "cleaned_book_2.txt"]
+# Roughly the full catalogue: ~650 books at ~1,500 chunks each. The real chunks
+# are repeated to this size, so posting lists grow as they would with more books.
+CATALOGUE_CHUNKS = 1_000_000
+TOP_K = 50  # The candidates a hybrid search asks for
+QUERIES = [
+    "Vigyan Bhairav", "Shiva", "kundalini", "tantra meditation techniques",
+    "What is the problem with suppressed sex?", "the love of god is the love of the whole",
+]
+REPEATS = 20
+
+
+def load_chunks():
+    chunks = []
+    for path in BOOK_TEXTS:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        chunks.extend(text[start:end] for start, end in chunk_spans(text, 500, 50))
+    return chunks
+
+
+def bm25_reference(texts, query, top_k, k1, b):
+    """Textbook BM25, one chunk at a time. Slow; the check for BM25Index."""
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(lengths)
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in docs)
+            if term in doc:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * doc[term] * (k1 + 1) / (doc[term] + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return sorted((score for score in scores if score > 0), reverse=True)[:top_k]
+
+
+def make_index(texts):
+    vocabulary, offsets, rows, weights = build_postings(texts)
+    return BM25Index(rows, weights, offsets, vocabulary, int(rows.max()) + 1)
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    chunks = load_chunks()
+
+    # Correctness on the real corpus against the textbook formula
+    index = make_index(chunks)
+    failed = False
+    for query in QUERIES[:4]:
+        scores, _ = index.search(query, 10)
+        expected = bm25_reference(chunks, query, 10, **BM25_PARAMS)
+        if not np.allclose(scores, expected, rtol=1e-4):
+            print(f"PROBLEM: BM25 scores for '{query}' differ from the reference: {scores} vs {expected}")
+            failed = True
+    print(f"BM25 scores match the reference formula on {len(chunks)} real chunks: {not failed}")
+
+    # Latency at catalogue size
+    print(f"\nBuilding the BM25 index over {CATALOGUE_CHUNKS} chunks...")
+    start = time.perf_counter()
+    index = make_index(chunks[i % len(chunks)] for i in range(CATALOGUE_CHUNKS))
+    build_s = time.perf_counter() - start
+    print(f"Built in {build_s:.1f}s: {len(index.term_ids)} terms, {index.rows.size / 1e6:.1f}M postings, "
+          f"{(index.rows.nbytes + index.weights.nbytes + index.offsets.nbytes) / 1e6:.0f} MB")
+
+    print(f"\n{'query':<44} {'postings':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for query in QUERIES:
+        terms = {index.term_ids[t] for t in tokenize(query) if t in index.term_ids}
+        scanned = sum(int(index.offsets[t + 1] - index.offsets[t]) for t in terms)
+        times = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            index.search(query, TOP_K)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{query[:44]:<44} {scanned:>9} {np.percentile(times, 50):>8.2f} {np.percentile(times, 95):>8.2f}")
+
+    if failed:
+        sys.exit("BM25 check FAILED.")
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import time
+import numpy as np
+from benchmark_filtering import make_store
+from faiss_index import build_index_artifact, load_index_artifact
+from sharded_index import build_sharded_index, load_sharded_index
+
+# --- Configuration ---
+N_BOOKS = 64
+CHUNKS_PER_BOOK = 1500  # 96k chunks
+TOP_K = 10
+N_QUERIES = 50
+BATCH_SIZE = 32         # As MicroBatcher searches concurrent queries together
+SHARD_COUNTS = [1, 2, 4, 8]  # Results equal the unsharded index (test_sharded_index.py)
+STRATEGIES = ["book", "hash"]
+SUBSET_BOOKS = 4        # A search within a few books (only "book" shards holding them are searched)
+
+
+def latency_ms(index, queries, rows=None):
+    """Batch 1: p50 and p95 milliseconds per query."""
+    index.search(queries[:1], TOP_K, rows=rows)  # Warm-up
+    times = []
+    for q in range(N_QUERIES):
+        start = time.perf_counter()
+        index.search(queries[q:q + 1], TOP_K, rows=rows)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def batch_ms_per_query(index, queries):
+    start = time.perf_counter()
+    for begin in range(0, N_QUERIES, BATCH_SIZE):
+        index.search(queries[begin:begin + BATCH_SIZE], TOP_K)
+    return (time.perf_counter() - start) * 1000 / N_QUERIES
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, "store")
+        queries = np.ascontiguousarray(make_store(prefix, N_BOOKS, CHUNKS_PER_BOOK, N_QUERIES), dtype='float32')
+        build_index_artifact(prefix, "flat")
+        reference, meta = load_index_artifact(prefix)
+        subset = meta['chunks'].book_rows(meta['chunks'].titles()[:SUBSET_BOOKS])
+
+        print(f"\n=== flat, {meta['count']} chunks in {N_BOOKS} books, {os.cpu_count()} CPUs ===")
+        print(f"{'shards':>11} {'load ms':>8} {'1st query ms':>13} {'p50 ms':>7} {'p95 ms':>7} "
+              f"{f'batch-{BATCH_SIZE} ms/q':>15} {f'{SUBSET_BOOKS} books p50':>14} {'shards hit':>11}")
+        p50, p95 = latency_ms(reference, queries)
+        subset_p50, _ = latency_ms(reference, queries, subset)
+        print(f"{'unsharded':>11} {'-':>8} {'-':>13} {p50:>7.2f} {p95:>7.2f} "
+              f"{batch_ms_per_query(reference, queries):>15.3f} {subset_p50:>14.2f} {'-':>11}")
+
+        for strategy in STRATEGIES:
+            for n_shards in SHARD_COUNTS:
+                build_sharded_index(prefix, n_shards, strategy)
+                start = time.perf_counter()
+                index, _ = load_sharded_index(prefix)
+                load_ms = (time.perf_counter() - start) * 1000
+                start = time.perf_counter()
+                index.search(queries[:1], TOP_K)
+                first_ms = (time.perf_counter() - start) * 1000
+
+                p50, p95 = latency_ms(index, queries)
+                per_query = batch_ms_per_query(index, queries)
+                index.close()
+                index, _ = load_sharded_index(prefix)  # Fresh, to count the shards a book search loads
+                subset_p50, _ = latency_ms(index, queries, subset)
+                shards_hit = index.loaded_shards()
+                label = f"{strategy} {n_shards}"
+                print(f"{label:>11} {load_ms:>8.1f} {first_ms:>13.2f} {p50:>7.2f} {p95:>7.2f} "
+                      f"{per_query:>15.3f} {subset_p50:>14.2f} {shards_hit:>11}")
+                index.close()
+                del index
+        del reference, meta  # Release the mapped files before the directory is removed
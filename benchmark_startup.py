@@ -0,0 +1,127 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+# --- Configuration ---
+STORE_PREFIX = "osho_store_v4"
+BACKENDS = ["torch", "torchscript", "onnx"]  # Backends without an export (encoders.py) are skipped
+HEAVY_IMPORTS = ["numpy", "faiss", "tokenizers", "onnxruntime", "torch", "sentence_transformers",
+                 "google.generativeai", "streamlit"]
+SCRIPT_IMPORTS = ["osho_ai_search", "app"]  # Module-level imports only (app is read, not run)
+QUESTION = "What is the problem with suppressed sex?"
+REPEATS = 3  # Cold starts per configuration (median reported)
+
+
+def run_python(code, env=None):
+    """Runs code in a fresh interpreter (cold imports) and returns its last stdout line."""
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env={**os.environ, **(env or {})})
+    if result.returncode:
+        return None
+    return result.stdout.strip().splitlines()[-1]
+
+
+def import_seconds(module):
+    out = run_python(f"import time; start = time.perf_counter(); import {module}; "
+                     f"print(time.perf_counter() - start)")
+    return None if out is None else float(out)
+
+
+def script_import_seconds(script):
+    """Time to execute the import lines at the top of a script, without running the rest."""
+    with open(f"{script}.py", 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    header = [line for line in lines[:next(i for i, line in enumerate(lines) if line.startswith("#"))]
+              if line.startswith(("import ", "from "))]
+    out = run_python("import time; start = time.perf_counter()\n" + "\n".join(header) +
+                     "\nprint(time.perf_counter() - start)")
+    return None if out is None else float(out)
+
+
+def cli_startup(lazy, backend):
+    """
+    Starts osho_ai_search.py, asks one question and exits. Returns seconds until the
+    prompt appears (time to interactive) and until the first answer is printed.
+    """
+    env = {**os.environ, "OSHO_LAZY_STARTUP": "1" if lazy else "0", "OSHO_ENCODER_BACKEND": backend}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", "osho_ai_search.py"], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env)
+    interactive = answered = None
+    for line in process.stdout:
+        if interactive is None and "Type 'exit' to quit." in line:
+            interactive = time.perf_counter() - start
+            process.stdin.write(f"{QUESTION}\nexit\n")
+            process.stdin.flush()
+        if answered is None and line.startswith("Match 1"):
+            answered = time.perf_counter() - start
+    process.wait()
+    return interactive, answered
+
+
+def app_startup(lazy, backend):
+    """
+    Runs app.py in a fresh interpreter under Streamlit's AppTest: the first script run
+    is the time to interactive (the question box is rendered), then reruns until the
+    sidebar shows the retrieval options (core loaded), then asks one question.
+    """
+    code = f"""
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=600).run()
+interactive = time.perf_counter() - start
+while not at.sidebar.radio:
+    time.sleep(0.1)
+    at.run()
+ready = time.perf_counter() - start
+at.text_input[0].input({QUESTION!r})
+at.button[0].click().run()
+print(json.dumps([interactive, ready, time.perf_counter() - start]))
+"""
+    out = run_python(code, {"OSHO_LAZY_STARTUP": "1" if lazy else "0", "OSHO_ENCODER_BACKEND": backend,
+                            "OSHO_STORE": STORE_PREFIX, "OSHO_STUB_LLM": "1"})
+    return None if out is None else json.loads(out)
+
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return f"{np.median(values):.2f}" if values else "-"
+
+
+# --- Run Benchmark ---
+if __name__ == "__main__":
+    from encoders import encoder_artifact_dir, MODEL_FILES
+    from osho_ai_search import MODEL_NAME
+
+    print("Cold import times (fresh interpreter, seconds)")
+    for module in HEAVY_IMPORTS + [f"{script}.py imports" for script in SCRIPT_IMPORTS]:
+        if module.endswith(" imports"):
+            seconds = script_import_seconds(module.split(".")[0])
+        else:
+            seconds = import_seconds(module)
+        print(f"  {module:<28} {'unavailable' if seconds is None else f'{seconds:.2f}'}")
+
+    backends = [backend for backend in BACKENDS if backend == "torch" or
+                os.path.exists(os.path.join(encoder_artifact_dir(MODEL_NAME, backend), MODEL_FILES[backend]))]
+
+    print(f"\nosho_ai_search.py: seconds to the prompt / to the first answer (median of {REPEATS})")
+    for backend in backends:
+        for lazy in (False, True):
+            runs = [cli_startup(lazy, backend) for _ in range(REPEATS)]
+            label = f"{backend}, {'lazy' if lazy else 'eager'}"
+            print(f"  {label:<24} {median([r[0] for r in runs]):>7} / {median([r[1] for r in runs]):>7}")
+
+    if import_seconds("streamlit") is None:
+        print("\napp.py: streamlit is not installed, skipped.")
+    else:
+        print(f"\napp.py: seconds to the rendered page / to the loaded core / to the first answer "
+              f"(stub LLM, median of {REPEATS})")
+        for backend in backends:
+            for lazy in (False, True):
+                runs = [run or [None] * 3 for run in (app_startup(lazy, backend) for _ in range(REPEATS))]
+                label = f"{backend}, {'lazy' if lazy else 'eager'}"
+                print(f"  {label:<24} {' / '.join(median([r[i] for r in runs]) for i in range(3))}")
@@ -1,48 +1,161 @@
 import re
 import json # To save our chunks in a structured format
+from itertools import accumulate
 
-def chunk_text(text, max_chunk_size=500, overlap_size=50):
+SENTENCE_BREAK = re.compile(r'[.!?]\s+')  # ., !, ? followed by whitespace
+PARAGRAPH_BREAK = re.compile(r'\n\n')
+WORD = re.compile(r'\S+')
+TOKENIZE_BATCH = 1024  # Sentences tokenized per tokenizer call
+
+
+def char_lengths(texts):
+    return [len(text) for text in texts]
+
+
+def token_lengths(tokenizer):
+    """A batch length function counting word-pieces (without [CLS]/[SEP]) with a Hugging Face tokenizer."""
+    def lengths(texts):
+        sizes = []
+        for start in range(0, len(texts), TOKENIZE_BATCH):
+            encoded = tokenizer(texts[start:start + TOKENIZE_BATCH], add_special_tokens=False)
+            sizes.extend(len(ids) for ids in encoded["input_ids"])
+        return sizes
+    return lengths
+
+
+def load_tokenizer(model_name="all-MiniLM-L6-v2"):
+    """The word-piece tokenizer of a sentence-transformers model, for token budgets."""
+    from transformers import AutoTokenizer  # Installed with sentence-transformers
+    return AutoTokenizer.from_pretrained(f"sentence-transformers/{model_name}")
+
+
+def sentence_spans(text):
+    """
+    (start, end) offsets of every sentence, paragraph by paragraph, with surrounding
+    whitespace excluded. Returns (spans, paragraph_ends): paragraph_ends[p] is the
+    index one past the last sentence of paragraph p. One scan over the text.
+    """
+    spans, paragraph_ends = [], []
+    position = 0
+    for boundary in [match.start() for match in PARAGRAPH_BREAK.finditer(text)] + [len(text)]:
+        segment = text[position:boundary]
+        stripped = segment.strip()
+        if stripped:
+            start = position + len(segment) - len(segment.lstrip())
+            end = start + len(stripped)
+            for match in SENTENCE_BREAK.finditer(text, start, end):
+                spans.append((start, match.start() + 1))
+                start = match.end()
+            spans.append((start, end))
+            paragraph_ends.append(len(spans))
+        position = boundary + 2
+    return spans, paragraph_ends
+
+
+def size_bounds(text, spans, length_fn):
+    """
+    Arrays lo, hi with size(spans[i..j]) == hi[j] - lo[i]. In characters a run of
+    spans covers the text between them, separators included; in tokens the
+    whitespace between them costs nothing, so sizes simply add up.
+    """
+    if length_fn is char_lengths:
+        return [start for start, _ in spans], [end for _, end in spans]
+    cumulative = list(accumulate(length_fn([text[start:end] for start, end in spans]), initial=0))
+    return cumulative[:-1], cumulative[1:]
+
+
+def split_long_span(text, start, end, max_size, length_fn):
+    """Splits one sentence longer than max_size at word boundaries (a longer word is cut by characters)."""
+    words = [(match.start(), match.end()) for match in WORD.finditer(text, start, end)]
+    lo, hi = size_bounds(text, words, length_fn)
+    pieces = []
+    i = 0
+    while i < len(words):
+        j = i
+        while j + 1 < len(words) and hi[j + 1] - lo[i] <= max_size:
+            j += 1
+        piece_start, piece_end = words[i][0], words[j][1]
+        while length_fn is char_lengths and piece_end - piece_start > max_size:
+            pieces.append((piece_start, piece_start + max_size))
+            piece_start += max_size
+        pieces.append((piece_start, piece_end))
+        i = j + 1
+    return pieces
+
+
+def chunk_spans(text, max_size=500, overlap=50, length_fn=char_lengths):
+    """
+    Chunks a text into (start, end) character offsets of overlapping segments
+    suitable for embedding. Chunks never cross a paragraph; a paragraph that is
+    too large is packed sentence by sentence, and the next chunk repeats the
+    trailing sentences of the previous one that fit in overlap.
+
+    Sizes are characters by default; pass length_fn=token_lengths(tokenizer) to
+    budget in model tokens instead. Every sentence is measured once and chunk
+    boundaries move forward only, so the run is linear in the text.
+    """
+    spans, paragraph_ends = sentence_spans(text)
+    lo, hi = size_bounds(text, spans, length_fn)
+
+    chunks = []
+    first = 0
+    for last in paragraph_ends:
+        i = first
+        while i < last:
+            if hi[i] - lo[i] > max_size:
+                chunks.extend(split_long_span(text, spans[i][0], spans[i][1], max_size, length_fn))
+                i += 1
+                continue
+            j = i
+            while j + 1 < last and hi[j + 1] - lo[i] <= max_size:
+                j += 1
+            chunks.append((spans[i][0], spans[j][1]))
+            if j + 1 == last:
+                break
+            # Next chunk: the trailing sentences that fit in the overlap, then as many new ones as fit
+            k = j + 1
+            while k > i + 1 and hi[j] - lo[k - 1] <= overlap and hi[j + 1] - lo[k - 1] <= max_size:
+                k -= 1
+            i = k
+        first = last
+    return chunks
+
+
+def chunk_text(text, max_chunk_size=500, overlap_size=50, length_fn=char_lengths):
     """
     Chunks a given text into smaller, overlapping segments suitable for embedding.
     Attempts to chunk by paragraph first, then by sentence if paragraphs are too large.
+    Returns the chunk strings; chunk_spans returns their offsets instead.
     """
-    chunks = []
-    
-    # 1. Split by Paragraphs first
-    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-    
-    for para in paragraphs:
-        if len(para) <= max_chunk_size:
-            # If paragraph is small enough, use it as a chunk
-            chunks.append(para)
-        else:
-            # If paragraph is too large, split by sentences (or fixed size if sentences are also huge)
-            # Using a simple sentence splitter for now. NLTK/spaCy can be used for more robustness.
-            sentences = re.split(r'(?<=[.!?])\s+', para) # Split by ., !, ? followed by space
-
-            current_chunk = ""
-            for sentence in sentences:
-                if len(current_chunk) + len(sentence) + 1 <= max_chunk_size: # +1 for a space
-                    current_chunk += (sentence + " ").strip()
-                else:
-                    if current_chunk: # Add the current_chunk if not empty
-                        chunks.append(current_chunk)
-                        
-                        # Apply overlap: start new chunk with some trailing part of the previous one
-                        # Find the last few sentences to include in the overlap
-                        overlap_start_index = max(0, len(current_chunk) - overlap_size)
-                        current_chunk = current_chunk[overlap_start_index:].strip() + " " + sentence + " "
-                        current_chunk = current_chunk.strip() # Start new chunk with overlap
-                    else: # If a single sentence is larger than max_chunk_size
-                          # This is a fallback for extremely long sentences, just take a slice
-                        chunks.append(sentence[:max_chunk_size])
-                        current_chunk = sentence[max_chunk_size:].strip() + " " # Continue with rest
-
-            if current_chunk: # Add any remaining text
-                chunks.append(current_chunk)
-                
-    # Final pass to ensure no empty chunks and remove leading/trailing spaces
-    return [chunk.strip() for chunk in chunks if chunk.strip()]
+    return [text[start:end] for start, end in chunk_spans(text, max_chunk_size, overlap_size, length_fn)]
+
+
+def structure_chunks(text_chunks, book_title, id_prefix=None, spans=None):
+    """
+    Adds metadata (unique id, source book, position, length) to each text chunk.
+    With spans, each chunk also records its (start, end) offsets in the cleaned text.
+    """
+    id_prefix = id_prefix or book_title
+    structured_chunks = []
+    for i, chunk in enumerate(text_chunks):
+        record = {
+            "id": f"{id_prefix}_{i:04d}", # Unique ID for the chunk
+            "text": chunk,
+            "source": book_title,
+            "chunk_number": i + 1,
+            "length": len(chunk)
+        }
+        if spans is not None:
+            record["start"], record["end"] = spans[i]
+        structured_chunks.append(record)
+    return structured_chunks
+
+
+def chunk_length_fn(unit, model_name="all-MiniLM-L6-v2"):
+    """The length function for a chunk size unit: "chars" or "tokens" (of the embedding model)."""
+    if unit == "tokens":
+        return token_lengths(load_tokenizer(model_name))
+    return char_lengths
 
 
 def process_cleaned_file_for_chunking(input_filepath, output_json_filepath, book_title):
@@ -53,19 +166,13 @@ def process_cleaned_file_for_chunking(input_filepath, output_json_filepath, book
     with open(input_filepath, 'r', encoding='utf-8') as f:
         cleaned_text = f.read()
 
-    print(f"Chunking text with max_chunk_size={MAX_CHUNK_SIZE}, overlap_size={OVERLAP_SIZE}...")
-    text_chunks = chunk_text(cleaned_text, max_chunk_size=MAX_CHUNK_SIZE, overlap_size=OVERLAP_SIZE)
+    max_size, overlap = CHUNK_BUDGETS[CHUNK_UNIT]
+    print(f"Chunking text with max_chunk_size={max_size}, overlap_size={overlap} ({CHUNK_UNIT})...")
+    spans = chunk_spans(cleaned_text, max_size, overlap, chunk_length_fn(CHUNK_UNIT))
 
     # Add metadata to each chunk
-    structured_chunks = []
-    for i, chunk in enumerate(text_chunks):
-        structured_chunks.append({
-            "id": f"{book_title}_{i:04d}", # Unique ID for the chunk
-            "text": chunk,
-            "source": book_title,
-            "chunk_number": i + 1,
-            "length": len(chunk)
-        })
+    structured_chunks = structure_chunks([cleaned_text[start:end] for start, end in spans], book_title,
+                                         spans=spans)
 
     print(f"Generated {len(structured_chunks)} chunks.")
     print(f"Saving structured chunks to '{output_json_filepath}'...")
@@ -78,6 +185,12 @@ def process_cleaned_file_for_chunking(input_filepath, output_json_filepath, book
 # --- Configuration ---
 MAX_CHUNK_SIZE = 500  # Max characters per chunk. ~3-5 sentences.
 OVERLAP_SIZE = 50     # How many characters overlap between consecutive chunks. Helps maintain context.
+# all-MiniLM-L6-v2 truncates at 256 word-pieces ([CLS] and [SEP] included), so in
+# "tokens" mode a chunk is never silently cut off by the model
+MAX_CHUNK_TOKENS = 254
+OVERLAP_TOKENS = 32
+CHUNK_BUDGETS = {"chars": (MAX_CHUNK_SIZE, OVERLAP_SIZE), "tokens": (MAX_CHUNK_TOKENS, OVERLAP_TOKENS)}
+CHUNK_UNIT = "chars"  # "tokens" needs the model's tokenizer (transformers)
 
 input_cleaned_file = "cleaned_osho_text_v4.txt"  # <--- V4 FILENAME
 output_chunks_json = "osho_chunks_v4.json"      # <--- V4 FILENAME
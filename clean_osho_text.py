@@ -1,46 +1,275 @@
 import re
+from collections import deque
 
-def clean_osho_text(input_filepath, output_filepath):
+# --- Cleaning Rules ---
+# Spacing fixes run, in order, on each reflowed paragraph.
+SPACING_FIXES = [
+    (r' {2,}', ' '),                      # Remove extra whitespace
+    (r'([.,;!?"])([a-zA-Z])', r'\1 \2'),  # Fix "word.Word" -> "word. Word" (and "word.word")
+    (r'([a-z])([A-Z])', r'\1 \2'),        # Fix "wordWord" -> "word Word"
+]
+
+# --- Cleaning Profiles ---
+# How each book's raw text is cleaned (referenced by name from books.json).
+# "osho_standard" strips page headers/footers and title lines before reflowing;
+# "reflow_only" was needed for 'Vigyan Bhairav Tantra', which has no such lines.
+CLEANING_PROFILES = {
+    "osho_standard": {
+        "header_patterns": [r'\s*\d+\s+OSHO\b'],  # Removed where they start a line: "123 OSHO"
+        "strip_title": True,                       # Lines holding only the book title
+        "dehyphenate": True,
+        "spacing_fixes": SPACING_FIXES,
+    },
+    "reflow_only": {
+        "header_patterns": [],
+        "strip_title": False,
+        "dehyphenate": True,
+        "spacing_fixes": SPACING_FIXES,
+    },
+}
+
+PARAGRAPH_BREAK = None    # Marker between paragraphs in the reflowed stream
+FLUSH_CHARS = 1 << 16     # Paragraphs longer than this are fixed and written in pieces
+MATCH_WINDOW_LINES = 3    # Text lines a header pattern match may span
+HYPHEN_AT_END = re.compile(r'\w-\s*\Z')
+FIRST_WORD = re.compile(r'\s*(\w+)')
+
+
+def is_blank(line):
+    return not line or line.isspace()
+
+
+def strip_line_prefixes(lines, pattern):
+    """
+    Removes the pattern where it matches at the start of a line, like a
+    MULTILINE '^' + pattern substitution: the match may run on over newlines (a
+    leading '\\s*' swallows the blank lines before it) into the next few text lines.
+    """
+    lines = iter(lines)
+    window = deque()  # Upcoming lines, holding MATCH_WINDOW_LINES text lines when available
+    text_lines = 0
+    exhausted = False
+    while True:
+        while text_lines < MATCH_WINDOW_LINES and not exhausted:
+            line = next(lines, None)
+            if line is None:
+                exhausted = True
+            else:
+                window.append(line)
+                text_lines += not is_blank(line)
+        if not window:
+            return
+
+        joined = window[0] if len(window) == 1 else "\n".join(window)
+        match = pattern.match(joined)
+        if match and match.end():
+            end = match.end()
+            line_start = joined.rfind("\n", 0, end) + 1
+            for _ in range(joined.count("\n", 0, end)):
+                text_lines -= not is_blank(window.popleft())
+            text_lines -= not is_blank(window[0])
+            window[0] = window[0][end - line_start:]
+            text_lines += not is_blank(window[0])
+            if end == line_start:
+                continue  # The match ended at a line start, which may match again
+        line = window.popleft()
+        text_lines -= not is_blank(line)
+        yield line
+
+
+def strip_title_lines(lines, title_pattern):
+    """
+    Replaces each line holding only the title by an empty line, swallowing the
+    blank lines around it (as '^\\s*title\\s*$' would). Titles separated only by
+    blank lines, the last of them empty, collapse into one empty line.
+    """
+    blanks = []
+    in_title = False       # A title was seen, its empty line is not written yet
+    last_swallowed = None  # The last blank line swallowed after that title
+    for line in lines:
+        if is_blank(line):
+            if in_title:
+                last_swallowed = line
+            else:
+                blanks.append(line)
+            continue
+        if title_pattern.fullmatch(line):
+            if in_title and last_swallowed == "":
+                last_swallowed = None
+                continue
+            if in_title:
+                yield ""
+            blanks.clear()
+            in_title, last_swallowed = True, None
+            continue
+        if in_title:
+            yield ""
+            in_title = False
+        yield from blanks
+        blanks.clear()
+        yield line
+    if in_title:
+        yield ""
+    yield from blanks
+
+
+def dehyphenate_lines(lines):
+    """
+    Joins words hyphenated across a line break ("medi-" / "tation"), dropping the
+    hyphen, any blank lines in between and the next line's indentation.
+    """
+    held = None      # A line ending in "word-", waiting for the next text line
+    held_blanks = []
+
+    def hyphenated(line, resume=0):
+        # The word before the hyphen must not be the one the previous join consumed
+        match = HYPHEN_AT_END.search(line)
+        return match is not None and match.start() >= resume
+
+    for line in lines:
+        if held is None:
+            if hyphenated(line):
+                held = line
+            else:
+                yield line
+            continue
+        if is_blank(line):
+            held_blanks.append(line)
+            continue
+
+        word = FIRST_WORD.match(line)
+        if word:
+            prefix = held[:HYPHEN_AT_END.search(held).start() + 1]
+            joined = prefix + line[word.start(1):]
+            held_blanks.clear()
+            if hyphenated(joined, len(prefix) + len(word.group(1))):
+                held = joined
+            else:
+                held = None
+                yield joined
+            continue
+
+        yield held
+        yield from held_blanks
+        held, held_blanks = None, []
+        if hyphenated(line):
+            held = line
+        else:
+            yield line
+    if held is not None:
+        yield held
+        yield from held_blanks
+
+
+def reflow(lines):
+    """
+    Merges lines into paragraphs: a single newline becomes a space, a run of empty
+    lines one PARAGRAPH_BREAK. Long paragraphs are yielded in pieces, split only
+    before a joining space between two non-space characters, which no fix can cross.
+    """
+    parts, size, newlines = [], 0, 0
+    for i, line in enumerate(lines):
+        if i:
+            newlines += 1
+        if not line:
+            continue
+        if newlines >= 2:
+            yield "".join(parts)
+            yield PARAGRAPH_BREAK
+            parts, size = [], 0
+        elif newlines == 1:
+            if size > FLUSH_CHARS and not parts[-1][-1].isspace() and not line[0].isspace():
+                yield "".join(parts)
+                parts, size = [], 0
+            parts.append(" ")
+        newlines = 0
+        parts.append(line)
+        size += len(line) + 1
+    if newlines >= 2:
+        yield "".join(parts)
+        yield PARAGRAPH_BREAK
+        parts = []
+    elif newlines == 1:
+        parts.append(" ")
+    yield "".join(parts)
+
+
+class CleaningEngine:
+    """
+    A cleaning profile compiled for one book. The text streams through it line by
+    line: line rules, then reflow, then the spacing fixes on each paragraph, so
+    memory is bounded by one paragraph rather than the book.
+    """
+
+    def __init__(self, profile, book_title=None):
+        self.line_rules = [lambda lines, p=re.compile(pattern): strip_line_prefixes(lines, p)
+                           for pattern in profile["header_patterns"]]
+        if profile["strip_title"] and book_title:
+            title_pattern = re.compile(r'\s*' + re.escape(book_title) + r'\s*', re.IGNORECASE)
+            self.line_rules.append(lambda lines: strip_title_lines(lines, title_pattern))
+        if profile["dehyphenate"]:
+            self.line_rules.append(dehyphenate_lines)
+        self.spacing_fixes = [(re.compile(pattern), replacement)
+                              for pattern, replacement in profile["spacing_fixes"]]
+
+    def fix_spacing(self, text):
+        for pattern, replacement in self.spacing_fixes:
+            text = pattern.sub(replacement, text)
+        return text
+
+    def clean_lines(self, lines):
+        """
+        Cleans a stream of lines (without their newlines) and yields the cleaned
+        text in pieces. Outer whitespace is stripped and whitespace-only
+        paragraphs are dropped, so breaks never stack up.
+        """
+        for rule in self.line_rules:
+            lines = rule(lines)
+
+        started = False       # Some text was written (leading whitespace is dropped)
+        break_due = False     # A paragraph break goes before the next text
+        tail = ""             # Trailing whitespace, written only if more text follows
+        for piece in reflow(lines):
+            if piece is PARAGRAPH_BREAK:
+                break_due = started
+                continue
+            text = self.fix_spacing(piece)
+            if not started:
+                text = text.lstrip()
+            if not text or text.isspace():
+                continue
+            body = text.rstrip()
+            yield tail + ("\n\n" if break_due else "") + body
+            started, break_due, tail = True, False, text[len(body):]
+
+    def clean(self, raw_text):
+        return "".join(self.clean_lines(raw_text.split("\n")))
+
+
+def clean_text(raw_text, book_title=None, profile="osho_standard"):
+    """Cleans raw text extracted from an Osho PDF and returns it."""
+    return CleaningEngine(CLEANING_PROFILES[profile], book_title).clean(raw_text)
+
+
+def read_lines(f):
+    """Yields the lines of a text file without their newlines (a final newline yields a last empty line)."""
+    line = ""
+    for line in f:
+        yield line[:-1] if line.endswith("\n") else line
+    if line.endswith("\n") or not line:
+        yield ""
+
+
+def clean_osho_text(input_filepath, output_filepath, book_title="From Sex to Superconsciousness",
+                    profile="osho_standard"):
     """
     Reads raw text extracted from Osho PDFs, cleans it, and saves the cleaned text.
+    The file is streamed through the cleaning engine, never read whole.
     """
-    with open(input_filepath, 'r', encoding='utf-8') as f:
-        raw_text = f.read()
-
-    # --- Cleaning Steps ---
-    cleaned_text = raw_text
-
-    # 1. Remove Headers/Footers
-    cleaned_text = re.sub(r'^\s*\d+\s+OSHO\b', '', cleaned_text, flags=re.MULTILINE)
-    book_title_pattern = r'^\s*' + re.escape("From Sex to Superconsciousness") + r'\s*$'
-    cleaned_text = re.sub(book_title_pattern, '', cleaned_text, flags=re.MULTILINE | re.IGNORECASE)
-
-    # 2. De-hyphenation
-    cleaned_text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', cleaned_text)
-
-    # 3. Merge lines
-    cleaned_text = re.sub(r'\n{2,}', '---PARAGRAPH_BREAK---', cleaned_text)
-    cleaned_text = cleaned_text.replace('\n', ' ')
-    cleaned_text = cleaned_text.replace('---PARAGRAPH_BREAK---', '\n\n')
-
-    # 4. Remove extra whitespace
-    cleaned_text = re.sub(r' {2,}', ' ', cleaned_text)
-    
-    # 5. *** MOST POWERFUL FIXES ***
-    # Fix "word.Word" -> "word. Word"
-    cleaned_text = re.sub(r'([.,;!?"])([a-zA-Z])', r'\1 \2', cleaned_text)
-    # Fix "wordWord" -> "word Word"
-    cleaned_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', cleaned_text)
-    # Fix "word.word" -> "word. word"
-    cleaned_text = re.sub(r'([.,;!?"])([a-z])', r'\1 \2', cleaned_text)
-    
-    # 6. Final cleanup
-    cleaned_text = cleaned_text.strip()
-    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text) 
-
-    # --- Save Cleaned Text ---
-    with open(output_filepath, 'w', encoding='utf-8') as f:
-        f.write(cleaned_text)
+    engine = CleaningEngine(CLEANING_PROFILES[profile], book_title)
+    with open(input_filepath, 'r', encoding='utf-8') as f, open(output_filepath, 'w', encoding='utf-8') as out:
+        for piece in engine.clean_lines(read_lines(f)):
+            out.write(piece)
     print(f"Text cleaned and saved to '{output_filepath}'.")
 
 # --- Configuration ---
@@ -54,4 +283,4 @@ if __name__ == "__main__":
         clean_osho_text(input_file, output_file)
         print("Cleaning complete.")
     except FileNotFoundError:
-        print(f"ERROR: '{input_file}' not found. Please run 'extract_osho_text.py' first!")
\ No newline at end of file
+        print(f"ERROR: '{input_file}' not found. Please run 'extract_osho_text.py' first!")
@@ -1,30 +1,33 @@
-import json
+import numpy as np
+from embedding_store import load_embedding_store, save_embedding_store
 
 # --- Configuration ---
-file_book_1 = "osho_embeddings_v4.json"      # Your first book
-file_book_2 = "osho_embeddings_book_2.json"  # Your second book
+# Normally pipeline.py builds the combined store for every book in books.json;
+# this script combines stores that were embedded separately.
+stores_to_combine = ["osho_store_v4"]  # Add other separately embedded stores here
 
-master_output_file = "osho_master_embeddings.json" # The final combined file
+master_store_prefix = "osho_master_store" # The final combined store
 
 # --- Run Combining ---
 if __name__ == "__main__":
-    print(f"Loading Book 1: '{file_book_1}'...")
-    with open(file_book_1, 'r', encoding='utf-8') as f:
-        data_book_1 = json.load(f)
-    print(f"Loaded {len(data_book_1)} chunks from Book 1.")
+    all_vectors, all_chunks, metas = [], [], []
+    for store_prefix in stores_to_combine:
+        print(f"Loading store: '{store_prefix}'...")
+        vectors, meta = load_embedding_store(store_prefix)
+        print(f"Loaded {meta['count']} chunks.")
+        if metas and (meta['model'] != metas[0]['model'] or meta['dim'] != metas[0]['dim']):
+            raise ValueError("Cannot combine stores built with different embedding models.")
+        all_vectors.append(vectors)
+        all_chunks.extend(meta['chunks'])
+        metas.append(meta)
 
-    print(f"Loading Book 2: '{file_book_2}'...")
-    with open(file_book_2, 'r', encoding='utf-8') as f:
-        data_book_2 = json.load(f)
-    print(f"Loaded {len(data_book_2)} chunks from Book 2.")
+    # Combine the vectors and the metadata records
+    master_vectors = np.concatenate(all_vectors)
+    print(f"\nTotal chunks combined: {len(all_chunks)}")
 
-    # Combine the lists
-    master_data = data_book_1 + data_book_2
-    print(f"\nTotal chunks combined: {len(master_data)}")
+    # Save the master store
+    print(f"Saving master store to '{master_store_prefix}'...")
+    save_embedding_store(master_store_prefix, master_vectors, all_chunks, metas[0]['model'],
+                         dtype=metas[0]['dtype'], normalized=all(meta['normalized'] for meta in metas))
 
-    # Save the master file
-    print(f"Saving master embeddings file to '{master_output_file}'...")
-    with open(master_output_file, 'w', encoding='utf-8') as f:
-        json.dump(master_data, f, indent=2, ensure_ascii=False)
-
-    print("Combining complete. You are ready to update 'app.py'!")
\ No newline at end of file
+    print("Combining complete. Run faiss_index.py to build its index.")
@@ -0,0 +1,132 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+from corpus_store import split_chunk_id
+
+# --- Context Packing ---
+# Retrieved chunks are packed into the prompt as passages: neighbours from the
+# same book (consecutive chunk numbers) are merged into one passage with the
+# overlap the chunker repeats between them written once, and passages are taken
+# best score first until the token budget is spent.
+CONTEXT_TOKEN_BUDGET = 1000  # Tokens of context per prompt (~4,000 characters, about 8 chunks)
+CHARS_PER_TOKEN = 4          # Gemini's rule of thumb for English text
+MIN_OVERLAP_CHARS = 16       # Shorter common prefix/suffix is treated as chance, not chunk overlap
+
+
+def estimate_tokens(text):
+    """Approximate LLM token count of a text, without a tokenizer or an API call."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def overlap_length(previous, following, min_overlap=MIN_OVERLAP_CHARS):
+    """Length of the longest suffix of previous that is also a prefix of following (0 below min_overlap)."""
+    if len(previous) < min_overlap or len(following) < min_overlap:
+        return 0
+    probe = following[:min_overlap]
+    start = previous.find(probe, max(0, len(previous) - len(following)))
+    while start != -1:
+        # The first match leaves the longest suffix
+        if following.startswith(previous[start:]):
+            return len(previous) - start
+        start = previous.find(probe, start + 1)
+    return 0
+
+
+def merge_passages(chunks):
+    """
+    Groups chunks into passages: runs of consecutive chunk numbers of one book,
+    merged in text order with their overlap written once. A chunk contained in its
+    predecessor adds nothing. Each passage keeps the best score of its chunks.
+    Chunks whose id carries no chunk number stay passages of their own.
+    """
+    numbered, passages = [], []
+    for chunk in chunks:
+        try:
+            book_id, number = split_chunk_id(chunk['source_id'])
+        except ValueError:
+            passages.append({"book": chunk['book'], "source_ids": [chunk['source_id']],
+                             "score": chunk['score'], "text": chunk['text']})
+            continue
+        numbered.append((book_id, number, chunk))
+
+    numbered.sort(key=lambda item: item[:2])
+    last_book, last_number = None, None
+    for book_id, number, chunk in numbered:
+        if (book_id, number) == (last_book, last_number):
+            continue  # The same chunk retrieved twice (e.g. by both retrievers)
+        if book_id == last_book and number == last_number + 1:
+            passage = passages[-1]
+            text = chunk['text']
+            if text not in passage['text']:
+                overlap = overlap_length(passage['text'], text)
+                passage['text'] += text[overlap:] if overlap else " " + text
+            passage['source_ids'].append(chunk['source_id'])
+            passage['score'] = max(passage['score'], chunk['score'])
+        else:
+            passages.append({"book": chunk['book'], "source_ids": [chunk['source_id']],
+                             "score": chunk['score'], "text": chunk['text']})
+        last_book, last_number = book_id, number
+    return passages
+
+
+def truncate_to_budget(text, token_budget, count_tokens=estimate_tokens):
+    """The longest word-aligned prefix of text that fits in token_budget."""
+    while text and count_tokens(text) > token_budget:
+        cut = int(len(text) * token_budget / count_tokens(text))
+        cut = text.rfind(" ", 0, min(cut, len(text) - 1))
+        text = text[:cut].rstrip() if cut > 0 else ""
+    return text
+
+
+def pack_context(chunks, token_budget=CONTEXT_TOKEN_BUDGET, count_tokens=estimate_tokens):
+    """
+    Packs retrieved chunks into at most token_budget tokens of context.
+    Returns (passages, dropped source ids); passages are best score first, each
+    with its token count. A passage that does not fit is skipped for smaller ones,
+    except that the best passage is truncated rather than leaving no context.
+    """
+    packed, dropped = [], []
+    remaining = token_budget
+    for passage in sorted(merge_passages(chunks), key=lambda p: p['score'], reverse=True):
+        tokens = count_tokens(passage['text'])
+        if tokens > remaining and not packed:
+            passage['text'] = truncate_to_budget(passage['text'], remaining, count_tokens)
+            tokens = count_tokens(passage['text'])
+        if tokens > remaining or not passage['text']:
+            dropped.extend(passage['source_ids'])
+            continue
+        packed.append({**passage, "tokens": tokens})
+        remaining -= tokens
+    return packed, dropped
+
+
+class PromptStats:
+    """Prompt sizes of recent requests (tokens per prompt, chunks merged or cut by the packer)."""
+
+    def __init__(self, window=1024):
+        self.requests = 0
+        self.chunks = 0
+        self.dropped = 0
+        self._tokens = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens, n_chunks, n_dropped):
+        with self._lock:
+            self.requests += 1
+            self.chunks += n_chunks
+            self.dropped += n_dropped
+            self._tokens.append(prompt_tokens)
+
+    def stats(self):
+        with self._lock:
+            tokens = np.array(self._tokens) if self._tokens else np.zeros(1)
+            return {
+                "requests": self.requests,
+                "last_prompt_tokens": int(tokens[-1]),
+                "mean_prompt_tokens": float(tokens.mean()),
+                "p95_prompt_tokens": float(np.percentile(tokens, 95)),
+                "max_prompt_tokens": int(tokens.max()),
+                "chunks": self.chunks,
+                "dropped_chunks": self.dropped,
+            }
@@ -0,0 +1,219 @@
+import json
+import mmap
+import os
+import shutil
+import threading
+from array import array
+import numpy as np
+
+# --- Corpus Format ---
+# The chunk text of a store lives once, next to its vectors:
+#   <prefix>_corpus/book_NNN.txt -> UTF-8 text of one book (its cleaned text when available)
+#   <prefix>_chunks.npy          -> (n_chunks,) CHUNK_DTYPE records: book, chunk number, byte start/end
+# Book ids and titles are listed in the store metadata ('books'). A chunk's text
+# is sliced from its book file, memory-mapped, only when the chunk is accessed.
+CHUNK_DTYPE = np.dtype([("book", "<u2"), ("number", "<u4"), ("start", "<u8"), ("end", "<u8")])
+CHUNK_SEPARATOR = b"\n\n"  # Between chunk texts appended to a book file (chunks without offsets)
+
+
+def corpus_paths(prefix):
+    """Returns the (book files directory, chunk table) paths for a store prefix."""
+    return f"{prefix}_corpus", f"{prefix}_chunks.npy"
+
+
+def save_npy(path, array):
+    """
+    Writes an .npy file beside path and moves it into place, so a running process that
+    has the old file memory-mapped keeps its (unlinked) copy instead of crashing.
+    """
+    with open(path + ".tmp", 'wb') as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+def save_json(path, obj, **dump_args):
+    """
+    Writes a JSON file beside path and moves it into place, so a reader never sees a
+    half-written manifest and a crashed build leaves the previous one intact.
+    """
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(obj, f, **dump_args)
+    os.replace(path + ".tmp", path)
+
+
+def split_chunk_id(chunk_id):
+    """Splits a '<book id>_<number>' chunk id (see structure_chunks) into (book id, number)."""
+    book_id, _, number = chunk_id.rpartition("_")
+    if not book_id or not number.isdigit() or f"{book_id}_{int(number):04d}" != chunk_id:
+        raise ValueError(f"Chunk id '{chunk_id}' is not of the form '<book id>_<number>'.")
+    return book_id, int(number)
+
+
+class CorpusWriter:
+    """
+    Writes the corpus of a store chunk by chunk. A chunk whose start/end offsets
+    point at its own text in the book's cleaned file (book_files: book id -> path)
+    is stored as those offsets only; any other chunk's text is appended to its
+    book file once. close() moves the finished files into place.
+    """
+
+    def __init__(self, prefix, book_files=None):
+        self.prefix = prefix
+        self.book_files = book_files or {}
+        self.books = []  # {"id", "title", "file"} per book, in order of first chunk
+        self._book_index = {}
+        self._files = []
+        self._texts = []  # Cleaned text and its (char, byte) position cursor, per book
+        self._columns = {name: array(code) for name, code in
+                         [("book", "H"), ("number", "L"), ("start", "Q"), ("end", "Q")]}
+        corpus_dir, _ = corpus_paths(prefix)
+        self._tmp_dir = corpus_dir + ".tmp"
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        os.makedirs(self._tmp_dir)
+
+    def _book(self, book_id, title):
+        index = self._book_index.get(book_id)
+        if index is not None:
+            return index
+        index = len(self.books)
+        if index > np.iinfo(CHUNK_DTYPE["book"]).max:
+            raise ValueError(f"A store holds at most {index} books.")
+        self._book_index[book_id] = index
+        file_name = f"book_{index:03d}.txt"
+        self.books.append({"id": book_id, "title": title, "file": file_name})
+        f = open(os.path.join(self._tmp_dir, file_name), 'wb')
+        text = None
+        if book_id in self.book_files:
+            with open(self.book_files[book_id], 'r', encoding='utf-8') as source:
+                text = source.read()
+            f.write(text.encode('utf-8'))
+        self._files.append(f)
+        self._texts.append([text, 0, 0])
+        return index
+
+    def _byte_offset(self, book, char_offset):
+        # Chunk starts mostly move forward, so only the text since the last one is encoded
+        cursor = self._texts[book]
+        text, char_pos, byte_pos = cursor
+        if char_offset < char_pos:
+            char_pos = byte_pos = 0
+        byte_pos += len(text[char_pos:char_offset].encode('utf-8'))
+        cursor[1:] = [char_offset, byte_pos]
+        return byte_pos
+
+    def append(self, chunks):
+        for chunk in chunks:
+            book_id, number = split_chunk_id(chunk['id'])
+            book = self._book(book_id, chunk['source'])
+            text = self._texts[book][0]
+            start, end = chunk.get('start'), chunk.get('end')
+            if text is not None and start is not None and text[start:end] == chunk['text']:
+                byte_start = self._byte_offset(book, start)
+                byte_end = byte_start + len(chunk['text'].encode('utf-8'))
+            else:
+                f = self._files[book]
+                if f.tell():
+                    f.write(CHUNK_SEPARATOR)
+                byte_start = f.tell()
+                byte_end = byte_start + f.write(chunk['text'].encode('utf-8'))
+            for name, value in zip(("book", "number", "start", "end"), (book, number, byte_start, byte_end)):
+                self._columns[name].append(value)
+
+    def chunk_ids(self):
+        """The ids of the chunks appended so far, in order."""
+        return (f"{self.books[book]['id']}_{number:04d}"
+                for book, number in zip(self._columns["book"], self._columns["number"]))
+
+    def close(self):
+        """Finalizes the corpus and returns the book list for the store metadata."""
+        for f in self._files:
+            f.close()
+        table = np.empty(len(self._columns["book"]), dtype=CHUNK_DTYPE)
+        for name, column in self._columns.items():
+            table[name] = np.frombuffer(column, dtype=column.typecode)
+        corpus_dir, chunks_path = corpus_paths(self.prefix)
+        save_npy(chunks_path, table)
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+        os.replace(self._tmp_dir, corpus_dir)
+        return self.books
+
+    def abort(self):
+        for f in self._files:
+            f.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+class ChunkTable:
+    """
+    The chunk records of a store as a read-only sequence. Only the offset table
+    is loaded; each record (id, text, source, chunk_number, length) is built on
+    access, its text sliced from the memory-mapped book file.
+    """
+
+    def __init__(self, prefix, books, mmap_table=True):
+        corpus_dir, chunks_path = corpus_paths(prefix)
+        self.rows = np.load(chunks_path, mmap_mode="r" if mmap_table else None)
+        if self.rows.dtype != CHUNK_DTYPE:
+            raise ValueError(f"Unexpected chunk table dtype {self.rows.dtype} in '{chunks_path}'.")
+        self.books = books
+        self._paths = [os.path.join(corpus_dir, book["file"]) for book in books]
+        self._maps = [None] * len(books)  # Opened on first use
+        self._rows_by_book = None          # Rows grouped by book and the group offsets, built on first use
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.rows.shape[0]
+
+    def _book_bytes(self, book):
+        corpus = self._maps[book]
+        if corpus is None:
+            with self._lock:
+                corpus = self._maps[book]
+                if corpus is None:
+                    with open(self._paths[book], 'rb') as f:
+                        size = os.fstat(f.fileno()).st_size
+                        corpus = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""  # mmap refuses empty files
+                    self._maps[book] = corpus
+        return corpus
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        book, number, start, end = self.rows[row].tolist()
+        text = self._book_bytes(book)[start:end].decode('utf-8')
+        return {
+            "id": f"{self.books[book]['id']}_{number:04d}",
+            "text": text,
+            "source": self.books[book]["title"],
+            "chunk_number": number + 1,
+            "length": len(text),
+        }
+
+    def titles(self):
+        """The book titles of the store, in store order."""
+        return list(dict.fromkeys(book["title"] for book in self.books))
+
+    def book_rows(self, titles):
+        """The rows of every chunk of the given books (by title), ascending."""
+        if self._rows_by_book is None:
+            with self._lock:
+                if self._rows_by_book is None:
+                    books = np.asarray(self.rows["book"])
+                    offsets = np.zeros(len(self.books) + 1, dtype="int64")
+                    np.cumsum(np.bincount(books, minlength=len(self.books)), out=offsets[1:])
+                    self._rows_by_book = (np.argsort(books, kind="stable"), offsets)
+        rows_by_book, offsets = self._rows_by_book
+
+        titles = set(titles)
+        unknown = titles - set(self.titles())
+        if unknown:
+            raise ValueError(f"Unknown books {sorted(unknown)}. The store holds {self.titles()}.")
+        groups = [rows_by_book[offsets[i]:offsets[i + 1]] for i, book in enumerate(self.books)
+                  if book["title"] in titles]
+        if len(groups) == 1:
+            return groups[0]  # Already ascending (stable sort)
+        return np.sort(np.concatenate(groups)) if groups else np.zeros(0, dtype="int64")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
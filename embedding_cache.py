@@ -0,0 +1,78 @@
+import hashlib
+import sqlite3
+from contextlib import closing
+import numpy as np
+
+SQLITE_MAX_PARAMS = 900  # Stay under SQLite's bound-parameter limit in IN (...) lookups
+
+
+def embedding_key(text, model_name):
+    """Cache key of one chunk: the same text under the same model always has the same embedding."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent key -> embedding table in a local SQLite file, so re-running the
+    pipeline after changing one book only sends that book's new chunks to the model.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+                " key TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_many(self, keys):
+        """Returns {key: float32 embedding} for the keys that are cached."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+                batch = keys[start:start + SQLITE_MAX_PARAMS]
+                rows = conn.execute(
+                    f"SELECT key, embedding FROM chunk_embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update((key, np.frombuffer(blob, dtype='float32')) for key, blob in rows)
+        return found
+
+    def put_many(self, items):
+        """Stores (key, embedding) pairs."""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings (key, embedding) VALUES (?, ?)",
+                [(key, np.asarray(embedding, dtype='float32').tobytes()) for key, embedding in items],
+            )
+
+
+def embed_with_cache(texts, model_name, cache, encode_fn):
+    """
+    Embeds texts, reusing cached embeddings and calling encode_fn(list_of_texts)
+    only for texts the cache has not seen under this model.
+    Returns (embeddings, reused_count, encoded_count).
+    """
+    keys = [embedding_key(text, model_name) for text in texts]
+    found = cache.get_many(keys)
+
+    missing = {}  # key -> text, duplicates encoded once
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+
+    if missing:
+        new_embeddings = np.asarray(encode_fn(list(missing.values())), dtype='float32')
+        new_items = list(zip(missing.keys(), new_embeddings))
+        cache.put_many(new_items)
+        found.update(new_items)
+
+    encoded = sum(1 for key in keys if key in missing)
+    embeddings = np.stack([found[key] for key in keys]) if keys else np.zeros((0, 0), dtype='float32')
+    return embeddings, len(keys) - encoded, encoded
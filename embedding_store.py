@@ -0,0 +1,243 @@
+import json
+import hashlib
+import os
+import struct
+import numpy as np
+from corpus_store import CorpusWriter, ChunkTable, save_npy, save_json
+
+# --- Store Format ---
+# A store is a set of files sharing a prefix:
+#   <prefix>_vectors.npy  -> (n_chunks, dim) float32/float16 matrix, memory-mappable
+#   <prefix>_ids.npy      -> (n_chunks,) int64 FAISS ids, stable across rebuilds (see chunk_index_ids)
+#   <prefix>_meta.json    -> store header plus the list of books
+#   <prefix>_chunks.npy and <prefix>_corpus/ -> the chunk text, stored once (see corpus_store.py)
+STORE_VERSION = 3
+HASH_BLOCK_ROWS = 65536  # Rows hashed per step, keeps hashing memory flat on huge stores
+NPY_HEADER_BYTES = 128   # Fixed .npy header size reserved by EmbeddingStoreWriter, rewritten on close
+
+
+def store_paths(prefix):
+    """Returns the (vectors, metadata) file paths for a store prefix."""
+    return f"{prefix}_vectors.npy", f"{prefix}_meta.json"
+
+
+def ids_path(prefix):
+    return f"{prefix}_ids.npy"
+
+
+def chunk_index_ids(chunks):
+    """
+    Derives a FAISS id for every chunk from its id and text. The same chunk gets
+    the same id in every build, so an index can be updated with add_with_ids /
+    remove_ids instead of being rebuilt. 60 bits keeps the ids positive int64s.
+    """
+    ids = np.empty(len(chunks), dtype='int64')
+    for row, chunk in enumerate(chunks):
+        digest = hashlib.sha256(f"{chunk['id']}\0{chunk['text']}".encode('utf-8')).hexdigest()
+        ids[row] = int(digest[:15], 16)
+    return ids
+
+
+def compute_content_hash(vectors, chunk_ids):
+    """
+    Hashes the vector bytes and chunk ids together, so any change to either
+    produces a different hash. Used to detect stale downstream artifacts.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f"{vectors.shape}|{vectors.dtype.str}".encode('utf-8'))
+    for start in range(0, vectors.shape[0], HASH_BLOCK_ROWS):
+        block = np.ascontiguousarray(vectors[start:start + HASH_BLOCK_ROWS])
+        hasher.update(block.tobytes())
+    for chunk_id in chunk_ids:
+        hasher.update(chunk_id.encode('utf-8'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def normalize_rows(vectors):
+    """Returns a float32 copy of the vectors scaled to unit L2 norm (zero rows stay zero)."""
+    vectors = np.array(vectors, dtype='float32')
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def save_embedding_store(prefix, embeddings, chunks, model_name, dtype="float32", normalized=False,
+                         book_files=None):
+    """
+    Saves embeddings as a binary .npy matrix, the chunk text as a corpus and the
+    header as a separate JSON file. Of each chunk only its id, source and text are kept.
+    Pass normalized=True for unit-length vectors, which enables cosine search, and
+    book_files (book id -> cleaned text file) to store chunks as offsets into those texts.
+    """
+    vectors = np.ascontiguousarray(embeddings, dtype=dtype)
+    if vectors.ndim != 2 or vectors.shape[0] != len(chunks):
+        raise ValueError(f"Expected a ({len(chunks)}, dim) matrix, got shape {vectors.shape}.")
+
+    vectors_path, meta_path = store_paths(prefix)
+    corpus = CorpusWriter(prefix, book_files)
+    try:
+        corpus.append(chunks)
+    except Exception:
+        corpus.abort()
+        raise
+
+    meta = {
+        "version": STORE_VERSION,
+        "model": model_name,
+        "dim": int(vectors.shape[1]),
+        "count": int(vectors.shape[0]),
+        "dtype": vectors.dtype.name,
+        "normalized": bool(normalized),
+        "content_hash": compute_content_hash(vectors, corpus.chunk_ids()),
+        "books": corpus.close(),
+    }
+
+    save_npy(vectors_path, vectors)
+    save_npy(ids_path(prefix), chunk_index_ids(chunks))
+    save_json(meta_path, meta, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"Saved {meta['count']} x {meta['dim']} {meta['dtype']} vectors to '{vectors_path}' "
+          f"and metadata to '{meta_path}'.")
+    return meta
+
+
+def npy_header(shape, dtype):
+    """A version 1.0 .npy header padded to NPY_HEADER_BYTES, so it can be rewritten in place."""
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(int(n) for n in shape))
+    magic = np.lib.format.magic(1, 0)
+    body_bytes = NPY_HEADER_BYTES - len(magic) - 2
+    return magic + struct.pack('<H', body_bytes) + (header.ljust(body_bytes - 1) + '\n').encode('latin1')
+
+
+class EmbeddingStoreWriter:
+    """
+    Writes a store batch by batch, for corpora that should never be held in memory at once.
+    Vectors are appended to the .npy file and chunk text to the corpus; close()
+    fills in the header and hash and moves the finished files into place.
+    The result is identical to save_embedding_store.
+    """
+
+    def __init__(self, prefix, dim, model_name, dtype="float32", normalized=False, book_files=None):
+        self.prefix = prefix
+        self.dim = dim
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.normalized = normalized
+        self.count = 0
+        self._ids = []
+        vectors_path, _ = store_paths(prefix)
+        self._vectors_tmp = vectors_path + ".tmp"
+        self._vectors_file = open(self._vectors_tmp, 'wb')
+        self._vectors_file.write(npy_header((0, dim), self.dtype))
+        self._corpus = CorpusWriter(prefix, book_files)
+
+    def append(self, embeddings, chunks):
+        """Appends one batch of rows (see save_embedding_store for what is kept of the chunks)."""
+        vectors = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        if vectors.shape != (len(chunks), self.dim):
+            raise ValueError(f"Expected a ({len(chunks)}, {self.dim}) matrix, got shape {vectors.shape}.")
+        self._corpus.append(chunks)
+        self._vectors_file.write(vectors.tobytes())
+        self._ids.append(chunk_index_ids(chunks))
+        self.count += len(chunks)
+
+    def close(self):
+        """Finalizes the store and returns its header."""
+        vectors_path, meta_path = store_paths(self.prefix)
+        self._vectors_file.seek(0)
+        self._vectors_file.write(npy_header((self.count, self.dim), self.dtype))
+        self._vectors_file.close()
+
+        meta = {
+            "version": STORE_VERSION,
+            "model": self.model_name,
+            "dim": int(self.dim),
+            "count": int(self.count),
+            "dtype": self.dtype.name,
+            "normalized": bool(self.normalized),
+            "content_hash": compute_content_hash(np.load(self._vectors_tmp, mmap_mode="r"),
+                                                 self._corpus.chunk_ids()),
+            "books": self._corpus.close(),
+        }
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+
+        ids = np.concatenate(self._ids) if self._ids else np.zeros(0, dtype='int64')
+        save_npy(ids_path(self.prefix), ids)
+        os.replace(self._vectors_tmp, vectors_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        print(f"Saved {meta['count']} x {meta['dim']} {meta['dtype']} vectors to '{vectors_path}' "
+              f"and metadata to '{meta_path}'.")
+        return meta
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._vectors_file.close()
+            self._corpus.abort()
+
+
+def load_embedding_store(prefix, mmap=True):
+    """
+    Loads a store. With mmap=True the vectors are memory-mapped read-only,
+    so nothing is copied until rows are actually touched.
+    Returns (vectors, meta) where meta['chunks'] is a ChunkTable of the per-row
+    records (their text read on access) and meta['index_ids'] the per-row FAISS ids.
+    """
+    vectors_path, meta_path = store_paths(prefix)
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    if meta.get("version") != STORE_VERSION:
+        raise ValueError(f"Unsupported store version {meta.get('version')} in '{meta_path}'.")
+
+    vectors = np.load(vectors_path, mmap_mode="r" if mmap else None)
+    if vectors.shape != (meta["count"], meta["dim"]):
+        raise ValueError(f"Store '{prefix}' is inconsistent: vectors {vectors.shape}, "
+                         f"metadata says ({meta['count']}, {meta['dim']}).")
+    meta['index_ids'] = np.load(ids_path(prefix), mmap_mode="r" if mmap else None)
+    meta['chunks'] = ChunkTable(prefix, meta['books'], mmap)
+    if len(meta['chunks']) != meta["count"]:
+        raise ValueError(f"Store '{prefix}' is inconsistent: {len(meta['chunks'])} chunk records "
+                         f"for {meta['count']} vectors.")
+    return vectors, meta
+
+
+def convert_json_embeddings(json_filepath, prefix, model_name="all-MiniLM-L6-v2", dtype="float32"):
+    """
+    Converts a legacy '*_embeddings.json' file (chunks with inline embeddings) into a store.
+    Vectors are re-normalized so the store can be searched by cosine similarity.
+    """
+    print(f"Loading legacy embeddings from '{json_filepath}'...")
+    with open(json_filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    embeddings = normalize_rows([item['embedding'] for item in data])
+    return save_embedding_store(prefix, embeddings, data, model_name, dtype=dtype, normalized=True)
+
+
+# --- Configuration ---
+# Legacy JSON file -> store prefix
+files_to_convert = {
+    "osho_embeddings_v4.json": "osho_store_v4",
+    "osho_master_embeddings.json": "osho_master_store",
+}
+embedding_model_name = "all-MiniLM-L6-v2"
+store_dtype = "float32"  # "float16" halves the file size at a small precision cost
+
+# --- Run Conversion ---
+if __name__ == "__main__":
+    print("Converting legacy JSON embeddings to binary stores...")
+    for json_file, store_prefix in files_to_convert.items():
+        if not os.path.exists(json_file):
+            print(f"Skipping '{json_file}' (not found).")
+            continue
+        convert_json_embeddings(json_file, store_prefix, embedding_model_name, store_dtype)
+    print("Conversion finished.")
@@ -1,65 +1,150 @@
 import pdfplumber
+import json
 import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def extract_text_from_pdf(pdf_path, output_txt_path, num_pages=None):
+CHECKPOINT_VERSION = 1
+
+
+def extract_shard(pdf_path, first_page, last_page, shard_path):
+    """
+    Worker: extracts pages [first_page, last_page) into one shard file.
+    The file is written under a temporary name and renamed when complete, so a
+    crash never leaves a half-written shard behind. Returns per-page seconds.
+    """
+    page_texts = []
+    page_seconds = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in range(first_page, last_page):
+            start = time.perf_counter()
+            # *** Setting x_tolerance=1 ***
+            text = pdf.pages[i].extract_text(x_tolerance=1)
+            if not text:
+                text = f"\n[No text found on page {i+1}, potentially an image-only page]\n"
+            page_texts.append(text)
+            page_seconds.append(time.perf_counter() - start)
+            pdf.pages[i].flush_cache()  # Drop the parsed page objects, keeps worker memory flat
+
+    tmp_path = shard_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(page_texts))
+    os.replace(tmp_path, shard_path)
+    return first_page, page_seconds
+
+
+def shard_file(work_dir, first_page):
+    return os.path.join(work_dir, f"shard_{first_page:06d}.txt")
+
+
+def load_checkpoint(manifest_path, source):
+    """Returns the saved checkpoint if it belongs to the same PDF and settings, else a fresh one."""
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("version") == CHECKPOINT_VERSION and checkpoint.get("source") == source:
+            return checkpoint
+    return {"version": CHECKPOINT_VERSION, "source": source, "done": {}}
+
+
+def save_checkpoint(manifest_path, checkpoint):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def extract_text_from_pdf(pdf_path, output_txt_path, num_pages=None, workers=None, shard_pages=16,
+                          keep_shards=False):
     """
     Extracts text from a PDF file.
     Optionally extracts only a specified number of initial pages.
+    Page ranges are sharded across a process pool; finished shards are recorded in a
+    checkpoint manifest next to the output, so an interrupted run resumes where it stopped.
     """
     if not os.path.exists(pdf_path):
         print(f"Error: PDF file not found at '{pdf_path}'")
         return
 
-    full_text = []
     print(f"Opening PDF: '{pdf_path}'")
     with pdfplumber.open(pdf_path) as pdf:
         total_pages = len(pdf.pages)
-        
-        # Determine pages to process
-        pages_to_process = pdf.pages
-        if num_pages and num_pages > 0:
-            pages_to_process = pdf.pages[:num_pages]
-            total_pages_to_extract = min(num_pages, total_pages)
-        else:
-            total_pages_to_extract = total_pages
-        
-        print(f"Extracting text from {total_pages_to_extract} pages...")
-
-        for i, page in enumerate(pages_to_process):
-            print(f"Extracting text from page {i + 1}...")
-            
-            # *** Setting x_tolerance=1 ***
-            text = page.extract_text(x_tolerance=1) 
-            
-            if text:
-                full_text.append(text)
-            else:
-                full_text.append(f"\n[No text found on page {i+1}, potentially an image-only page]\n")
-    
-    extracted_raw_text = "\n".join(full_text)
-
-    # Save to file
-    with open(output_txt_path, 'w', encoding='utf-8') as f:
-        f.write(extracted_raw_text)
-    
-    print(f"Successfully extracted text from {total_pages_to_extract} pages of '{os.path.basename(pdf_path)}' to '{output_txt_path}'.")
+
+    # Determine pages to process
+    if num_pages and num_pages > 0:
+        total_pages_to_extract = min(num_pages, total_pages)
+    else:
+        total_pages_to_extract = total_pages
+    if total_pages_to_extract == 0:
+        print(f"Error: '{pdf_path}' has no pages.")
+        return
+
+    work_dir = output_txt_path + ".parts"
+    os.makedirs(work_dir, exist_ok=True)
+    manifest_path = os.path.join(work_dir, "checkpoint.json")
+    stat = os.stat(pdf_path)
+    source = {"pdf": os.path.abspath(pdf_path), "size": stat.st_size, "mtime": stat.st_mtime,
+              "pages": total_pages_to_extract, "shard_pages": shard_pages}
+    checkpoint = load_checkpoint(manifest_path, source)
+
+    shards = [(first, min(first + shard_pages, total_pages_to_extract))
+              for first in range(0, total_pages_to_extract, shard_pages)]
+    pending = [(first, last) for first, last in shards
+               if not (str(first) in checkpoint["done"] and os.path.exists(shard_file(work_dir, first)))]
+
+    print(f"Extracting text from {total_pages_to_extract} pages in {len(shards)} shards "
+          f"({len(shards) - len(pending)} already done)...")
+    start = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(extract_shard, pdf_path, first, last, shard_file(work_dir, first))
+                       for first, last in pending]
+            for future in as_completed(futures):
+                first, page_seconds = future.result()
+                checkpoint["done"][str(first)] = page_seconds
+                save_checkpoint(manifest_path, checkpoint)
+                done_pages = sum(len(seconds) for seconds in checkpoint["done"].values())
+                print(f"  {done_pages}/{total_pages_to_extract} pages extracted")
+    elapsed = time.perf_counter() - start
+
+    # Assemble in page order, one shard in memory at a time
+    with open(output_txt_path, 'w', encoding='utf-8') as out:
+        for i, (first, _) in enumerate(shards):
+            if i:
+                out.write("\n")
+            with open(shard_file(work_dir, first), 'r', encoding='utf-8') as f:
+                shutil.copyfileobj(f, out)
+
+    page_times = sorted(((seconds, int(first) + offset)
+                         for first, page_seconds in checkpoint["done"].items()
+                         for offset, seconds in enumerate(page_seconds)), reverse=True)
+    total_page_seconds = sum(seconds for seconds, _ in page_times)
+    print(f"Successfully extracted text from {total_pages_to_extract} pages of '{os.path.basename(pdf_path)}' "
+          f"to '{output_txt_path}' in {elapsed:.1f}s.")
+    print(f"Per-page extraction: mean {total_page_seconds / len(page_times) * 1000:.0f} ms, "
+          f"slowest page {page_times[0][1] + 1} ({page_times[0][0] * 1000:.0f} ms).")
+
+    if not keep_shards:
+        shutil.rmtree(work_dir)
 
     # Display preview
     print("\n--- BEGIN EXTRACTED CONTENT PREVIEW (first 500 characters) ---")
-    preview = extracted_raw_text[:500] if len(extracted_raw_text) > 500 else extracted_raw_text
-    print(preview)
+    with open(output_txt_path, 'r', encoding='utf-8') as f:
+        print(f.read(500))
     print("--- END PREVIEW ---")
     print(f"\nCheck the file '{output_txt_path}' for the full extracted text.")
 
 # --- Configuration ---
 pdf_file = "osho_book_2"
 pdf_path = f"{pdf_file}.pdf"
-output_text_file = "extracted_book_2.txt" 
+output_text_file = "extracted_book_2.txt"
 # Change NUM_PAGES_TO_EXTRACT to None to get the whole book
-NUM_PAGES_TO_EXTRACT = None 
+NUM_PAGES_TO_EXTRACT = None
+NUM_WORKERS = None   # None -> one process per CPU core
+SHARD_PAGES = 16     # Pages per shard (the unit of work and of resuming)
 
 if __name__ == "__main__":
     print("Starting PDF text extraction process...")
-    # *** THIS IS THE FIX (line 64) ***
-    extract_text_from_pdf(pdf_path, output_text_file, NUM_PAGES_TO_EXTRACT) # Fixed variable name
-    print("PDF text extraction process finished.")
\ No newline at end of file
+    extract_text_from_pdf(pdf_path, output_text_file, NUM_PAGES_TO_EXTRACT, NUM_WORKERS, SHARD_PAGES)
+    print("PDF text extraction process finished.")
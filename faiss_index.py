@@ -0,0 +1,447 @@
+import json
+import os
+import faiss
+import numpy as np
+from embedding_store import load_embedding_store, store_paths, save_json
+
+# --- Index Artifact Format ---
+# An index artifact is two files sharing the store prefix:
+#   <prefix>_index.faiss          -> the serialized FAISS index
+#   <prefix>_index_manifest.json  -> what the index was built from (model, dim, count, content hash)
+# The content hash must match the store metadata, otherwise the index is stale.
+# Vectors are added under the store's stable chunk ids (embedding_store.chunk_index_ids),
+# which lets the pipeline patch an index in place when only some chunks changed.
+MANIFEST_VERSION = 2
+INCREMENTAL_INDEX_TYPES = ("flat", "ivf", "ivfpq", "fp16", "sq8", "binary")  # Support remove_ids (HNSW does not)
+
+# --- Index Backends ---
+# "flat"  -> exact brute-force search, best recall, latency grows linearly with the corpus
+# "hnsw"  -> graph index, no training, very fast queries, more memory than flat
+# "ivf"   -> inverted lists over trained k-means centroids, only nprobe lists are scanned
+# "ivfpq" -> ivf with product-quantized codes, a fraction of the memory at some recall cost
+# "fp16"   -> flat scan over half-precision codes, 1/2 of the float32 memory
+# "sq8"    -> flat scan over int8 scalar-quantized codes, 1/4 of the float32 memory
+# "binary" -> Hamming scan over sign bits, 1/32 of the float32 memory
+# The last three are re-ranked by exact float similarity against the memory-mapped
+# store vectors: rescore * top_k candidates are read from disk per query (see RescoringIndex).
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "fp16", "sq8", "binary")
+QUANTIZED_INDEX_TYPES = ("fp16", "sq8", "binary")
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64},
+    "ivf": {"nlist": None, "nprobe": 8},               # nlist=None -> derived from the corpus size
+    "ivfpq": {"nlist": None, "nprobe": 8, "m": 48, "nbits": 8},
+    "fp16": {"rescore": 2},
+    "sq8": {"rescore": 4},
+    "binary": {"rescore": 16},
+}
+MIN_POINTS_PER_CENTROID = 39  # FAISS k-means warns below this many training points per centroid
+
+# --- Filtered Search ---
+# A search restricted to some store rows (e.g. the chunks of a few books) scans just
+# those rows of the memory-mapped store, exactly, so it costs time in proportion to the
+# subset. Only without the store vectors does a search go through the index, with a
+# FAISS ID selector: building the selector alone costs about as much as scanning its
+# rows, and the search must then go deeper by ntotal / subset to find k hits inside it
+# (on benchmark_filtering, IVF over 150k of 300k rows: 30.7 ms at recall 0.725, against
+# 13 ms at recall 1.0 for the scan).
+SUBSET_SCAN_BLOCK_ROWS = 65536  # Store rows read and scored per step of a subset scan
+
+# --- Metrics ---
+# "ip" -> inner product over unit vectors, i.e. cosine similarity (what MiniLM is trained for)
+# "l2" -> squared Euclidean distance
+METRICS = {"ip": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+
+
+def index_paths(prefix):
+    """Returns the (index, manifest) file paths for a store prefix."""
+    return f"{prefix}_index.faiss", f"{prefix}_index_manifest.json"
+
+
+def resolve_index_params(index_type, n_vectors, params=None):
+    """Fills in defaults for an index type and scales the trained parts to the corpus size."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Choose one of {INDEX_TYPES}.")
+    resolved = dict(DEFAULT_INDEX_PARAMS[index_type])
+    resolved.update(params or {})
+
+    if index_type in ("ivf", "ivfpq"):
+        max_nlist = max(1, n_vectors // MIN_POINTS_PER_CENTROID)
+        if resolved["nlist"] is None:
+            resolved["nlist"] = int(4 * np.sqrt(n_vectors))
+        resolved["nlist"] = max(1, min(resolved["nlist"], max_nlist))
+        resolved["nprobe"] = min(resolved["nprobe"], resolved["nlist"])
+    if index_type == "ivfpq":
+        # Each PQ sub-quantizer trains 2**nbits centroids, shrink them on small corpora
+        while resolved["nbits"] > 4 and n_vectors < MIN_POINTS_PER_CENTROID * 2 ** resolved["nbits"]:
+            resolved["nbits"] -= 1
+    return resolved
+
+
+def make_index(index_type, d, params, metric="ip"):
+    """Creates an empty (possibly untrained) index of the given type. params must be resolved."""
+    faiss_metric = METRICS[metric]
+    if index_type == "flat":
+        return faiss.IndexFlatIP(d) if metric == "ip" else faiss.IndexFlatL2(d)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, params["M"], faiss_metric)
+        index.hnsw.efConstruction = params["efConstruction"]
+        return index
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss_metric)
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+    if index_type == "binary":
+        if d % 8 != 0:
+            raise ValueError(f"Binary codes need a dimension divisible by 8, got {d}.")
+        return faiss.IndexBinaryFlat(d)
+
+    quantizer = faiss.IndexFlatIP(d) if metric == "ip" else faiss.IndexFlatL2(d)
+    if index_type == "ivf":
+        return faiss.IndexIVFFlat(quantizer, d, params["nlist"], faiss_metric)
+    if d % params["m"] != 0:
+        raise ValueError(f"IVFPQ sub-quantizer count m={params['m']} must divide the dimension {d}.")
+    return faiss.IndexIVFPQ(quantizer, d, params["nlist"], params["m"], params["nbits"], faiss_metric)
+
+
+def pack_sign_bits(vectors):
+    """One bit per dimension (1 where the component is positive), packed 8 to a byte."""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+def base_index(index):
+    """The index that actually holds the vectors, under any IndexIDMap wrapper."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def apply_search_params(index, index_type, params):
+    """Sets the query-time knobs (efSearch / nprobe), which are not all persisted by write_index."""
+    index = base_index(index)
+    if index_type == "hnsw":
+        index.hnsw.efSearch = params["efSearch"]
+    elif index_type in ("ivf", "ivfpq"):
+        index.nprobe = params["nprobe"]
+
+
+def build_index(vectors, index_type="flat", params=None, metric="ip", ids=None):
+    """
+    Builds an in-memory index over the given vectors, training it first if the
+    backend needs centroids (or value ranges). With ids, vectors are added under
+    those ids (IVF indexes store ids natively, the others get an IDMap2 wrapper).
+    Returns (index, resolved_params).
+    """
+    embedding_array = np.ascontiguousarray(vectors, dtype='float32')
+    n_vectors, d = embedding_array.shape
+    params = resolve_index_params(index_type, n_vectors, params)
+
+    index = make_index(index_type, d, params, metric)
+    codes = pack_sign_bits(embedding_array) if index_type == "binary" else embedding_array
+    if not index.is_trained:
+        index.train(codes)
+    if ids is None:
+        index.add(codes)
+    else:
+        if index_type == "binary":
+            index = faiss.IndexBinaryIDMap2(index)
+        elif index_type not in ("ivf", "ivfpq"):
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(codes, np.ascontiguousarray(ids, dtype='int64'))
+    apply_search_params(index, index_type, params)
+    return index, params
+
+
+def search_rows(vectors, x, k, rows, metric_type):
+    """
+    Exact search over the given (ascending) store rows only. Returns (D, I) like
+    a flat index with I holding store rows, padded with -1 when rows has fewer than k.
+    """
+    x = np.ascontiguousarray(x, dtype='float32')
+    rows = np.asarray(rows, dtype='int64')
+    ip = metric_type == faiss.METRIC_INNER_PRODUCT
+    worst = np.finfo('float32').max
+    D = np.full((x.shape[0], k), -worst if ip else worst, dtype='float32')
+    I = np.full((x.shape[0], k), -1, dtype='int64')
+    for start in range(0, rows.size, SUBSET_SCAN_BLOCK_ROWS):
+        block_rows = rows[start:start + SUBSET_SCAN_BLOCK_ROWS]
+        if block_rows[-1] - block_rows[0] + 1 == block_rows.size:
+            block = vectors[block_rows[0]:block_rows[-1] + 1]  # A contiguous run (one book) is a plain slice
+        else:
+            block = vectors[block_rows]
+        block = np.asarray(block, dtype='float32')
+        if ip:
+            scores = x @ block.T
+        else:
+            scores = (x ** 2).sum(axis=1, keepdims=True) - 2 * x @ block.T + (block ** 2).sum(axis=1)
+
+        all_D = np.concatenate([D, scores], axis=1)
+        all_I = np.concatenate([I, np.broadcast_to(block_rows, scores.shape)], axis=1)
+        key = -all_D if ip else all_D
+        best = np.argpartition(key, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(best, np.take_along_axis(key, best, axis=1).argsort(axis=1, kind='stable'), axis=1)
+        D, I = np.take_along_axis(all_D, best, axis=1), np.take_along_axis(all_I, best, axis=1)
+    return D, I
+
+
+class RowIndex:
+    """
+    Wraps an index whose vectors are stored under chunk ids, so that search()
+    returns store row numbers (and -1 for no hit) exactly like an index whose
+    vectors were added in store order. Callers keep indexing data[row].
+    With the store vectors, search() restricted to some rows scans just those (see search_rows).
+    """
+
+    def __init__(self, index, row_ids, vectors=None):
+        self.index = index
+        self.metric_type = getattr(index, "metric_type", None)  # Binary (Hamming) indexes have none
+        self.ntotal = index.ntotal
+        self.vectors = vectors
+        row_ids = np.asarray(row_ids, dtype='int64')
+        self._row_ids = row_ids
+        self._rows_by_id = np.argsort(row_ids)
+        self._sorted_ids = row_ids[self._rows_by_id]
+
+    def ids_to_rows(self, ids):
+        ids = np.asarray(ids, dtype='int64')
+        if self._sorted_ids.size == 0:
+            return np.full(ids.shape, -1, dtype='int64')
+        positions = np.clip(np.searchsorted(self._sorted_ids, ids), 0, self._sorted_ids.size - 1)
+        rows = self._rows_by_id[positions]
+        rows[(ids < 0) | (self._sorted_ids[positions] != ids)] = -1
+        return rows
+
+    def search(self, x, k, rows=None):
+        """Searches the whole index, or only the given store rows."""
+        if rows is not None:
+            rows = np.asarray(rows, dtype='int64')
+        if rows is None or rows.size == self.ntotal:
+            D, I = self.index.search(x, k)
+        elif self.vectors is not None:
+            return search_rows(self.vectors, x, k, rows, self.metric_type)
+        else:
+            # Only a fraction of every probed list / visited neighbourhood is in the subset,
+            # so the search goes deeper by the inverse of that fraction
+            selector = faiss.IDSelectorBatch(self._row_ids[rows])
+            depth = self.ntotal / rows.size
+            inner = base_index(self.index)
+            if isinstance(inner, faiss.IndexHNSW):
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=int(np.ceil(inner.hnsw.efSearch * depth)))
+            elif isinstance(inner, faiss.IndexIVF):
+                params = faiss.SearchParametersIVF(sel=selector,
+                                                   nprobe=min(inner.nlist, int(np.ceil(inner.nprobe * depth))))
+            else:
+                params = faiss.SearchParameters(sel=selector)
+            D, I = self.index.search(x, k, params=params)
+        return D, self.ids_to_rows(I)
+
+
+class RescoringIndex:
+    """
+    Searches a quantized index for rescore * k candidates and re-ranks them by
+    exact similarity to the float vectors of the store. The store is memory-mapped,
+    so only the candidate rows are ever read. The wrapped index must return store
+    rows (a RowIndex); results are float-metric distances, like a flat index.
+    """
+
+    def __init__(self, index, vectors, index_type, rescore, metric="ip"):
+        self.index = index
+        self.vectors = vectors
+        self.binary = index_type == "binary"
+        self.rescore = max(1, int(rescore))
+        self.metric_type = METRICS[metric]
+        self.ntotal = index.ntotal
+
+    def search(self, x, k, rows=None):
+        """Searches the whole index, or only the given store rows (an exact scan of the float vectors)."""
+        if rows is not None:
+            return search_rows(self.vectors, x, k, rows, self.metric_type)
+        x = np.ascontiguousarray(x, dtype='float32')
+        n_candidates = max(1, min(k * self.rescore, self.ntotal))
+        _, candidates = self.index.search(pack_sign_bits(x) if self.binary else x, n_candidates)
+
+        ip = self.metric_type == faiss.METRIC_INNER_PRODUCT
+        worst = np.finfo('float32').max
+        D = np.full((x.shape[0], k), -worst if ip else worst, dtype='float32')
+        I = np.full((x.shape[0], k), -1, dtype='int64')
+        for q, rows in enumerate(candidates):
+            rows = np.sort(rows[rows >= 0])  # Ascending rows read the mapped file in order
+            if rows.size == 0:
+                continue
+            candidate_vectors = np.asarray(self.vectors[rows], dtype='float32')
+            if ip:
+                scores = candidate_vectors @ x[q]
+                best = np.argsort(-scores, kind='stable')[:k]
+            else:
+                scores = ((candidate_vectors - x[q]) ** 2).sum(axis=1)
+                best = np.argsort(scores, kind='stable')[:k]
+            D[q, :best.size] = scores[best]
+            I[q, :best.size] = rows[best]
+        return D, I
+
+
+def write_index_file(index, index_path):
+    """Writes beside index_path and moves the file into place (running processes may have it mapped)."""
+    if isinstance(index, faiss.IndexBinary):
+        faiss.write_index_binary(index, index_path + ".tmp")
+    else:
+        faiss.write_index(index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+
+
+def write_manifest(store_prefix, meta, index_type, params, metric):
+    """Writes the manifest describing the index built from this store."""
+    _, manifest_path = index_paths(store_prefix)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "index_type": index_type,
+        "index_params": params,
+        "metric": metric,
+        "model": meta['model'],
+        "dim": meta['dim'],
+        "count": meta['count'],
+        "content_hash": meta['content_hash'],
+    }
+    save_json(manifest_path, manifest, indent=2)
+    return manifest
+
+
+def build_index_artifact(store_prefix, index_type="flat", params=None, metric="ip"):
+    """Builds the index for a store and writes it to disk together with its manifest."""
+    print(f"Loading vector store '{store_prefix}'...")
+    vectors, meta = load_embedding_store(store_prefix)
+    if metric == "ip" and not meta['normalized']:
+        raise ValueError(f"Store '{store_prefix}' is not normalized, inner product would not be cosine. "
+                         "Re-embed it or build with metric='l2'.")
+
+    print(f"Building '{index_type}' ({metric}) FAISS index over {meta['count']} x {meta['dim']} vectors...")
+    index, params = build_index(vectors, index_type, params, metric, ids=meta['index_ids'])
+
+    index_path, manifest_path = index_paths(store_prefix)
+    write_index_file(index, index_path)
+    manifest = write_manifest(store_prefix, meta, index_type, params, metric)
+
+    print(f"Index saved to '{index_path}' (manifest: '{manifest_path}').")
+    return manifest
+
+
+def update_index_artifact(store_prefix, previous_meta, index_type="flat", params=None, metric="ip"):
+    """
+    Brings the index in line with a re-written store by removing the ids of chunks
+    that disappeared and adding only the new ones. previous_meta is the store
+    metadata (with an in-memory copy of 'index_ids') from before the store was
+    re-written. Falls back to a full build when the old index cannot be patched.
+    """
+    index_path, manifest_path = index_paths(store_prefix)
+    manifest = None
+    if previous_meta is not None and os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    vectors, meta = load_embedding_store(store_prefix)
+    patchable = (
+        manifest is not None
+        and manifest.get("version") == MANIFEST_VERSION
+        and manifest["content_hash"] == previous_meta['content_hash']
+        and (manifest["index_type"], manifest["metric"], manifest["model"]) == (index_type, metric, meta['model'])
+        and index_type in INCREMENTAL_INDEX_TYPES
+    )
+    if not patchable:
+        return build_index_artifact(store_prefix, index_type, params, metric)
+
+    old_ids = np.asarray(previous_meta['index_ids'], dtype='int64')
+    new_ids = np.asarray(meta['index_ids'], dtype='int64')
+    removed = np.setdiff1d(old_ids, new_ids)
+    added_rows = np.flatnonzero(~np.isin(new_ids, old_ids))
+
+    index = read_index(index_path, mmap=False, binary=index_type == "binary")  # Writable, not a mapping
+    if removed.size:
+        index.remove_ids(removed)
+    if added_rows.size:
+        added = np.ascontiguousarray(vectors[added_rows], dtype='float32')
+        index.add_with_ids(pack_sign_bits(added) if index_type == "binary" else added, new_ids[added_rows])
+    write_index_file(index, index_path)
+    manifest = write_manifest(store_prefix, meta, index_type, manifest["index_params"], metric)
+
+    print(f"Index updated in place: {removed.size} vectors removed, {added_rows.size} added, "
+          f"{meta['count'] - added_rows.size} kept.")
+    return manifest
+
+
+def check_manifest(manifest, meta, manifest_path):
+    """Raises ValueError if an index manifest does not describe the given store metadata."""
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported index manifest version {manifest.get('version')} in '{manifest_path}'.")
+    for key in ("model", "dim", "count", "content_hash"):
+        if manifest.get(key) != meta.get(key):
+            raise ValueError(f"Stale index '{manifest_path}': '{key}' is {manifest.get(key)!r} "
+                             f"but the store has {meta.get(key)!r}. Re-run faiss_index.py.")
+
+
+def read_index(index_path, mmap=True, binary=False):
+    """Reads a FAISS index, memory-mapping it when this FAISS build supports that."""
+    reader = faiss.read_index_binary if binary else faiss.read_index
+    if mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            return reader(index_path, flags)
+        except RuntimeError:
+            pass  # This index type cannot be mapped, fall back to a normal read
+    return reader(index_path)
+
+
+def cosine_scores(index, distances):
+    """
+    Converts raw FAISS distances into cosine similarities for unit-length vectors.
+    Inner-product indexes already return cosines; for squared L2, |a-b|^2 = 2 - 2cos.
+    """
+    distances = np.asarray(distances, dtype='float32')
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    return 1.0 - distances / 2.0
+
+
+def load_index_artifact(store_prefix, mmap=True):
+    """
+    Loads the prebuilt index for a store and refuses it if it is stale.
+    Returns (index, meta) where meta is the store metadata (see embedding_store.py).
+    The index is wrapped in a RowIndex, so search results are store rows, and
+    quantized indexes in a RescoringIndex over the memory-mapped store vectors.
+    """
+    vectors, meta = load_embedding_store(store_prefix)
+    index_path, manifest_path = index_paths(store_prefix)
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    check_manifest(manifest, meta, manifest_path)
+
+    index_type = manifest["index_type"]
+    index = read_index(index_path, mmap=mmap, binary=index_type == "binary")
+    apply_search_params(index, index_type, manifest["index_params"])
+    if index.ntotal != meta['count']:
+        raise ValueError(f"Index '{index_path}' holds {index.ntotal} vectors, store has {meta['count']}.")
+
+    index = RowIndex(index, meta['index_ids'], vectors)
+    if index_type in QUANTIZED_INDEX_TYPES:
+        index = RescoringIndex(index, vectors, index_type, manifest["index_params"]["rescore"], manifest["metric"])
+    return index, meta
+
+
+# --- Configuration ---
+stores_to_index = ["osho_store_v4", "osho_master_store"]
+# Backend for this deployment: "flat" is exact and right for a few books,
+# switch to "hnsw", "ivf" or "ivfpq" for the full catalogue, or to "sq8" / "binary"
+# when the index must fit in little memory per worker (see benchmark_indexes.py)
+index_type = os.environ.get("OSHO_INDEX_TYPE", "flat")
+index_params = None  # None -> DEFAULT_INDEX_PARAMS for the chosen backend
+index_metric = "ip"  # Cosine similarity on the normalized store vectors
+
+# --- Run Index Build ---
+if __name__ == "__main__":
+    print("Starting FAISS index build stage...")
+    for store_prefix in stores_to_index:
+        if not os.path.exists(store_paths(store_prefix)[1]):
+            print(f"Skipping '{store_prefix}' (store not found).")
+            continue
+        build_index_artifact(store_prefix, index_type, index_params, index_metric)
+    print("Index build stage finished.")
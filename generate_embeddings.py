@@ -1,49 +1,199 @@
 import json
-from sentence_transformers import SentenceTransformer
-import torch # To check for GPU availability
+import time
+import numpy as np
+from embedding_store import save_embedding_store, EmbeddingStoreWriter
+from embedding_cache import EmbeddingCache, embed_with_cache
+from encoders import load_encoder, encoder_model_key
 
-def generate_embeddings_for_chunks(input_json_filepath, output_json_filepath, model_name="all-MiniLM-L6-v2"):
+JSON_READ_BYTES = 1 << 20  # Bytes read per step when streaming a chunks file
+
+
+def load_embedding_model(model_name="all-MiniLM-L6-v2", backend="torch", threads=None):
     """
-    Loads chunks from a JSON file, generates embeddings for each chunk,
-    and saves the chunks with their embeddings to a new JSON file.
+    Loads the Sentence Transformer model on the GPU if there is one, or an exported
+    CPU backend of it (see encoders.py) with the same encode interface.
     """
-    print(f"Loading chunks from '{input_json_filepath}'...")
-    with open(input_json_filepath, 'r', encoding='utf-8') as f:
-        chunks_data = json.load(f)
+    if backend != "torch":
+        print(f"Loading the {backend} export of '{model_name}'...")
+        model = load_encoder(model_name, backend, threads=threads)
+        print("Model loaded successfully.")
+        return model
 
+    import torch # To check for GPU availability
     # Check for GPU (CUDA) availability for faster processing
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Using device: {device} (GPU detected: {torch.cuda.is_available()})")
 
     print(f"Loading Sentence Transformer model: '{model_name}'...")
     # This will download the model the first time it's run
-    model = SentenceTransformer(model_name, device=device)
+    model = load_encoder(model_name, backend, threads=threads, device=device)
     print("Model loaded successfully.")
+    return model
 
-    texts_to_embed = [chunk['text'] for chunk in chunks_data]
 
-    print(f"Generating embeddings for {len(texts_to_embed)} chunks...")
-    # The encode method takes a list of strings and returns a list of embeddings
-    embeddings = model.encode(texts_to_embed, show_progress_bar=True)
+def embed_texts(texts, model_name="all-MiniLM-L6-v2", backend="torch", threads=None):
+    """Encodes texts with the Sentence Transformer model and returns unit-length embeddings."""
+    model = load_embedding_model(model_name, backend, threads)
+
+    print(f"Generating embeddings for {len(texts)} chunks...")
+    # The encode method takes a list of strings and returns a list of embeddings.
+    # Normalizing here, once, lets search use inner product as cosine similarity.
+    embeddings = model.encode(texts, show_progress_bar=True, normalize_embeddings=True)
     print("Embeddings generated.")
+    return embeddings
+
 
-    # Add embeddings back to the chunks data
-    for i, chunk in enumerate(chunks_data):
-        chunk['embedding'] = embeddings[i].tolist() # Convert numpy array to list for JSON serialization
+def generate_embeddings_for_chunks(input_json_filepath, output_store_prefix, model_name="all-MiniLM-L6-v2",
+                                   cache_db=None, book_files=None, backend="torch", threads=None):
+    """
+    Loads chunks from a JSON file, generates embeddings for each chunk,
+    and saves them as a binary vector store (see embedding_store.py).
+    With cache_db, only chunks not embedded before (by text and model) are encoded.
+    book_files (book id -> cleaned text) lets the store keep offsets instead of chunk text.
+    backend and threads select the encoder (see encoders.py).
+    """
+    print(f"Loading chunks from '{input_json_filepath}'...")
+    with open(input_json_filepath, 'r', encoding='utf-8') as f:
+        chunks_data = json.load(f)
+
+    texts_to_embed = [chunk['text'] for chunk in chunks_data]
+    model_key = encoder_model_key(model_name, backend)
+    if cache_db:
+        embeddings, reused, encoded = embed_with_cache(texts_to_embed, model_key, EmbeddingCache(cache_db),
+                                                       lambda texts: embed_texts(texts, model_name, backend, threads))
+        print(f"{reused} chunks reused from the embedding cache, {encoded} encoded.")
+    else:
+        embeddings = embed_texts(texts_to_embed, model_name, backend, threads)
 
-    print(f"Saving chunks with embeddings to '{output_json_filepath}'...")
-    with open(output_json_filepath, 'w', encoding='utf-8') as f:
-        json.dump(chunks_data, f, indent=2, ensure_ascii=False)
+    print(f"Saving embeddings to store '{output_store_prefix}'...")
+    save_embedding_store(output_store_prefix, embeddings, chunks_data, model_key, normalized=True,
+                         book_files=book_files)
     
     print("Embeddings generation complete and saved.")
 
+def iter_chunks(filepath):
+    """
+    Yields the chunks of a JSON array file (or a JSON-lines file) one at a time,
+    without ever holding the whole file in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        if filepath.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        buffer, pos = "", 0
+        while True:
+            # Skip whitespace, the opening '[' and the ',' between items
+            while True:
+                while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in ",["):
+                    pos += 1
+                if pos < len(buffer):
+                    break
+                more = f.read(JSON_READ_BYTES)
+                if not more:
+                    return
+                buffer, pos = more, 0
+            if buffer[pos] == "]":
+                return
+            try:
+                chunk, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(JSON_READ_BYTES)
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield chunk
+            pos = end
+
+
+def encode_length_sorted(model, texts, batch_size, pool=None):
+    """
+    Encodes texts shortest to longest, so every batch pads to a similar length,
+    and returns the unit-length embeddings in the original order.
+    With a multi-process pool the sorted texts are split across the processes.
+    """
+    order = np.argsort([len(text) for text in texts], kind='stable')
+    sorted_texts = [texts[i] for i in order]
+    if pool is not None:
+        encoded = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size,
+                                             normalize_embeddings=True)
+    else:
+        encoded = model.encode(sorted_texts, batch_size=batch_size, convert_to_numpy=True,
+                               normalize_embeddings=True)
+    embeddings = np.empty_like(encoded)
+    embeddings[order] = encoded
+    return embeddings
+
+
+def stream_embeddings_for_chunks(input_json_filepath, output_store_prefix, model_name="all-MiniLM-L6-v2",
+                                 batch_size=64, window_size=4096, processes=0, book_files=None,
+                                 backend="torch", threads=None):
+    """
+    Streaming form of generate_embeddings_for_chunks for corpora too big for memory.
+    Chunks are read window_size at a time, encoded in length-sorted batches of
+    batch_size and appended straight to the store, so peak memory is bounded by
+    one window. processes > 1 encodes on that many CPU worker processes (torch
+    backend only; onnxruntime spreads a batch over `threads` itself).
+    """
+    if processes > 1 and backend != "torch":
+        raise ValueError(f"Multi-process encoding needs the torch backend, not '{backend}'; set threads instead.")
+    model = load_embedding_model(model_name, backend, threads)
+    pool = model.start_multi_process_pool(["cpu"] * processes) if processes > 1 else None
+
+    def windows():
+        window = []
+        for chunk in iter_chunks(input_json_filepath):
+            window.append(chunk)
+            if len(window) == window_size:
+                yield window
+                window = []
+        if window:
+            yield window
+
+    print(f"Streaming chunks from '{input_json_filepath}' into store '{output_store_prefix}'...")
+    start = time.perf_counter()
+    try:
+        with EmbeddingStoreWriter(output_store_prefix, model.get_sentence_embedding_dimension(),
+                                  encoder_model_key(model_name, backend), normalized=True,
+                                  book_files=book_files) as writer:
+            for window in windows():
+                writer.append(encode_length_sorted(model, [chunk['text'] for chunk in window], batch_size, pool),
+                              window)
+                elapsed = time.perf_counter() - start
+                print(f"  {writer.count} chunks embedded ({writer.count / elapsed:.1f} chunks/s)")
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    elapsed = time.perf_counter() - start
+    print(f"Embedded {writer.count} chunks in {elapsed:.1f}s ({writer.count / max(elapsed, 1e-9):.1f} chunks/s).")
+
+
 # --- Configuration ---
 input_chunks_json = "osho_chunks_v4.json" # Output from our chunking step
-output_embeddings_json = "osho_embeddings_v4.json" # Where to save chunks with embeddings
+output_store_prefix = "osho_store_v4" # Where to save the binary vector store
 embedding_model_name = "all-MiniLM-L6-v2" # A good balance of speed and accuracy
+embedding_cache_db = "osho_embedding_cache.sqlite" # Unchanged chunks are never re-encoded
+book_text_files = {"From Sex to Superconsciousness": "cleaned_osho_text_v4.txt"} # The text the chunks were cut from
+STREAMING = False     # True -> bounded-memory streaming mode (no embedding cache)
+BATCH_SIZE = 64       # Chunks per forward pass in streaming mode
+WINDOW_SIZE = 4096    # Chunks read, length-sorted and written at a time in streaming mode
+PROCESSES = 0         # > 1 -> encode on that many CPU processes in streaming mode
+ENCODER_BACKEND = "torch"  # "onnx" / "onnx-int8": the exported model on onnxruntime (export with encoders.py)
+ENCODER_THREADS = None     # Intra-op threads of the encoder (None: one per core)
 
 # --- Run Embedding Generation ---
 if __name__ == "__main__":
     print("Starting Osho text embeddings generation process...")
-    generate_embeddings_for_chunks(input_chunks_json, output_embeddings_json, embedding_model_name)
+    if STREAMING:
+        stream_embeddings_for_chunks(input_chunks_json, output_store_prefix, embedding_model_name,
+                                     BATCH_SIZE, WINDOW_SIZE, PROCESSES, book_text_files,
+                                     ENCODER_BACKEND, ENCODER_THREADS)
+    else:
+        generate_embeddings_for_chunks(input_chunks_json, output_store_prefix, embedding_model_name,
+                                       embedding_cache_db, book_text_files, ENCODER_BACKEND, ENCODER_THREADS)
     print("Osho text embeddings generation process finished.")
\ No newline at end of file
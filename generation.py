@@ -0,0 +1,146 @@
+import os
+import time
+import tomllib
+from types import SimpleNamespace
+from context_packer import pack_context, estimate_tokens, PromptStats, CONTEXT_TOKEN_BUDGET
+
+SECRETS_FILE = ".streamlit/secrets.toml"
+
+# --- Prompt ---
+# Bump PROMPT_VERSION whenever PROMPT_TEMPLATE or the context packing changes, so
+# cached answers built from the old prompt are no longer reused.
+PROMPT_VERSION = 2
+PROMPT_TEMPLATE = """
+    You are an AI assistant who answers questions by drawing insights from Osho's teachings.
+    Based *only* on the context provided below, answer the user's question.
+    If the context is not sufficient to answer the question, clearly state that.
+
+    **Context from Osho's Discourses:**
+    {context}
+
+    **User's Question:**
+    {query}
+
+    **Your Answer:**
+    """
+
+
+def load_gemini_model(model_name):
+    """
+    Configures Gemini outside Streamlit (CLI tools, services). The API key comes
+    from the GEMINI_API_KEY environment variable, else from the Streamlit secrets file.
+    """
+    import google.generativeai as genai  # Only needed when a real LLM is used
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        with open(SECRETS_FILE, 'rb') as f:
+            api_key = tomllib.load(f)["GEMINI_API_KEY"]
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+# Prompt sizes of every request built in this process
+prompt_stats = PromptStats()
+
+
+def build_prompt(query, context_chunks, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Packs the context chunks into token_budget tokens (see context_packer) and
+    combines them with the question into the LLM prompt. The prompt's token count
+    is recorded in prompt_stats.
+    """
+    passages, dropped = pack_context(context_chunks, token_budget)
+    context = "\n\n".join([passage['text'] for passage in passages])
+    prompt = PROMPT_TEMPLATE.format(context=context, query=query)
+    prompt_stats.record(estimate_tokens(prompt), len(context_chunks), len(dropped))
+    return prompt
+
+
+def generate_text(model, query, context_chunks):
+    """Asks the LLM for an answer. Unlike generate_response, errors are raised."""
+    response = model.generate_content(build_prompt(query, context_chunks))
+    return response.text
+
+
+def generate_response(model, query, context_chunks):
+    """Builds a prompt and asks the LLM to generate an answer."""
+    try:
+        return generate_text(model, query, context_chunks)
+    except Exception as e:
+        return f"An error occurred during generation: {e}"
+
+
+def generate_cached_response(answer_cache, model, model_name, query, query_embedding, context_chunks):
+    """
+    Like generate_response, but answers from the cache when the same (or a very
+    similar) question was already answered from the same chunks. Errors are never cached.
+    """
+    chunk_ids = [chunk['source_id'] for chunk in context_chunks]
+    answer = answer_cache.get(query, query_embedding, chunk_ids, model_name)
+    if answer is not None:
+        return answer
+
+    try:
+        answer = generate_text(model, query, context_chunks)
+    except Exception as e:
+        return f"An error occurred during generation: {e}"
+    answer_cache.put(query, query_embedding, chunk_ids, model_name, answer)
+    return answer
+
+
+def stream_cached_response(answer_cache, model, model_name, query, query_embedding, context_chunks):
+    """
+    Streaming counterpart of generate_cached_response. A cached answer is yielded
+    in one piece; otherwise the backend stream is passed through and the complete
+    answer is cached once it has finished without errors.
+    """
+    chunk_ids = [chunk['source_id'] for chunk in context_chunks]
+    answer = answer_cache.get(query, query_embedding, chunk_ids, model_name)
+    if answer is not None:
+        yield answer
+        return
+
+    pieces = []
+    try:
+        for chunk in model.generate_content(build_prompt(query, context_chunks), stream=True):
+            if chunk.text:
+                pieces.append(chunk.text)
+                yield chunk.text
+    except Exception as e:
+        yield f"An error occurred during generation: {e}"
+        return
+    answer_cache.put(query, query_embedding, chunk_ids, model_name, "".join(pieces))
+
+
+class StubGenerativeModel:
+    """
+    Local stand-in for genai.GenerativeModel, for testing without an API key or cost.
+    Waits `latency` seconds to mimic the time to first token, then echoes the question.
+    With stream=True the answer arrives word by word, `token_delay` seconds apart.
+    """
+
+    def __init__(self, latency=1.0, token_delay=0.02):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.calls = 0
+
+    def _answer(self, prompt):
+        self.calls += 1
+        question = prompt.split("**User's Question:**")[-1].split("**Your Answer:**")[0].strip()
+        return f"(stub answer #{self.calls}) You asked: {question}"
+
+    def _stream(self, answer):
+        time.sleep(self.latency)
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield SimpleNamespace(text=word if i == len(words) - 1 else word + " ")
+
+    def generate_content(self, prompt, stream=False):
+        answer = self._answer(prompt)
+        if stream:
+            return self._stream(answer)
+        time.sleep(self.latency + self.token_delay * answer.count(" "))
+        return SimpleNamespace(text=answer)
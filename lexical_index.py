@@ -0,0 +1,178 @@
+import json
+import os
+import re
+from array import array
+from collections import Counter
+import numpy as np
+from embedding_store import load_embedding_store, store_paths, save_npy, save_json
+
+# --- Lexical Index Format ---
+# A BM25 inverted index over the chunk text of a store, in three files sharing the store prefix:
+#   <prefix>_bm25_rows.npy       -> (n_postings,) uint32 chunk rows, grouped by term, ascending within a term
+#   <prefix>_bm25_weights.npy    -> (n_postings,) float32 BM25 weight of the term in that chunk
+#   <prefix>_bm25_manifest.json  -> header, content hash of the store, the vocabulary and the
+#                                   postings offset of every term (term i -> rows[offsets[i]:offsets[i+1]])
+# Weights are computed at build time (idf, term frequency and length normalization in one
+# number), so a query only sums the weights of its terms' postings. The arrays are
+# memory-mapped, and a query reads only the posting lists of its own terms.
+LEXICAL_VERSION = 1
+TOKEN = re.compile(r"\w+")
+BM25_PARAMS = {"k1": 1.2, "b": 0.75}
+DENSE_ACCUMULATE_FRACTION = 1 / 16  # Above this many postings per chunk, scores go into one array over all chunks
+# Query words that carry no topic: alone they would match nearly every chunk ("What is the capital
+# of France?" matching on "what", "is", "the", "of"). They stay in the index, queries skip them.
+STOPWORDS = frozenset(
+    "a about above after again against all am an and any are as at be because been before being below "
+    "between both but by can could did do does doing down during each few for from further had has have "
+    "having he her here hers herself him himself his how i if in into is it its itself just me more most "
+    "my myself no nor not now of off on once only or other our ours ourselves out over own same she "
+    "should so some such than that the their theirs them themselves then there these they this those "
+    "through to too under until up very was we were what when where which while who whom why will with "
+    "would you your yours yourself yourselves".split())
+
+
+def lexical_paths(prefix):
+    """Returns the (rows, weights, manifest) file paths for a store prefix."""
+    return f"{prefix}_bm25_rows.npy", f"{prefix}_bm25_weights.npy", f"{prefix}_bm25_manifest.json"
+
+
+def tokenize(text):
+    """Lower-cased word tokens, so 'Shiva' and 'shiva.' are the same term."""
+    return TOKEN.findall(text.lower())
+
+
+def build_postings(texts, k1=BM25_PARAMS["k1"], b=BM25_PARAMS["b"]):
+    """
+    Counts the terms of every text and returns (vocabulary, offsets, rows, weights):
+    the postings of each term sorted by row, each weighted by its BM25 score.
+    """
+    vocabulary = {}
+    term_ids, rows, tfs = array("I"), array("I"), array("H")
+    lengths = array("I")
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+            rows.append(row)
+            tfs.append(min(tf, 0xFFFF))
+
+    term_ids = np.frombuffer(term_ids, dtype="uint32")
+    order = np.argsort(term_ids, kind="stable")  # Stable, so rows stay ascending within a term
+    df = np.bincount(term_ids, minlength=len(vocabulary))
+    offsets = np.zeros(len(vocabulary) + 1, dtype="int64")
+    np.cumsum(df, out=offsets[1:])
+    del term_ids
+
+    lengths = np.frombuffer(lengths, dtype="uint32").astype("float32")
+    n = lengths.size
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype("float32")
+    length_norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if n else 0.0, 1e-9))
+
+    rows = np.frombuffer(rows, dtype="uint32")[order]
+    weights = np.frombuffer(tfs, dtype="uint16")[order].astype("float32")
+    weights *= (k1 + 1) / (weights + length_norm[rows])
+    weights *= np.repeat(idf, df)
+    return list(vocabulary), offsets, rows, weights
+
+
+def build_lexical_index(store_prefix, params=None):
+    """Builds the BM25 index over the chunk text of a store and writes it next to the store."""
+    params = {**BM25_PARAMS, **(params or {})}
+    _, meta = load_embedding_store(store_prefix)
+    print(f"Building the BM25 index over {meta['count']} chunks of '{store_prefix}'...")
+    vocabulary, offsets, rows, weights = build_postings((chunk['text'] for chunk in meta['chunks']), **params)
+
+    rows_path, weights_path, manifest_path = lexical_paths(store_prefix)
+    save_npy(rows_path, rows)
+    save_npy(weights_path, weights)
+    manifest = {
+        "version": LEXICAL_VERSION,
+        "params": params,
+        "count": meta['count'],
+        "content_hash": meta['content_hash'],
+        "vocabulary": vocabulary,
+        "offsets": offsets.tolist(),
+    }
+    save_json(manifest_path, manifest, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"BM25 index saved to '{manifest_path}': {len(vocabulary)} terms, {rows.size} postings.")
+    return manifest
+
+
+class BM25Index:
+    """Okapi BM25 over a store's chunks. search() returns store rows, like a RowIndex."""
+
+    def __init__(self, rows, weights, offsets, vocabulary, count):
+        self.rows = rows
+        self.weights = weights
+        self.offsets = offsets
+        self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.count = count
+
+    def search(self, query, top_k, rows=None):
+        """
+        Returns (scores, rows) of the top_k chunks, best first, optionally among the
+        given store rows only. Chunks sharing no term (other than stopwords) with the query
+        are never returned.
+        """
+        terms = sorted({self.term_ids[token] for token in tokenize(query)
+                        if token in self.term_ids and token not in STOPWORDS})
+        if not terms:
+            return np.zeros(0, dtype="float32"), np.zeros(0, dtype="int64")
+
+        matched = np.concatenate([self.rows[self.offsets[t]:self.offsets[t + 1]] for t in terms])
+        weights = np.concatenate([self.weights[self.offsets[t]:self.offsets[t + 1]] for t in terms])
+        if matched.size > self.count * DENSE_ACCUMULATE_FRACTION:
+            # Common words: sum into one slot per chunk rather than sorting millions of rows
+            scores = np.bincount(matched, weights, minlength=self.count)
+            if rows is None:
+                candidates = np.arange(self.count)
+            else:
+                candidates = np.asarray(rows, dtype="int64")
+                scores = scores[candidates]
+        else:
+            candidates, slots = np.unique(matched, return_inverse=True)
+            scores = np.bincount(slots, weights)
+            if rows is not None:
+                keep = np.isin(candidates, rows)
+                candidates, scores = candidates[keep], scores[keep]
+
+        if scores.size > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(scores.size)
+        best = best[scores[best] > 0]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return scores[best].astype("float32"), candidates[best].astype("int64")
+
+
+def load_lexical_index(store_prefix, meta, mmap=True):
+    """Loads the BM25 index of a store and refuses it if it is stale (meta is the store metadata)."""
+    rows_path, weights_path, manifest_path = lexical_paths(store_prefix)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != LEXICAL_VERSION:
+        raise ValueError(f"Unsupported lexical index version {manifest.get('version')} in '{manifest_path}'.")
+    for key in ("count", "content_hash"):
+        if manifest.get(key) != meta.get(key):
+            raise ValueError(f"Stale lexical index '{manifest_path}': '{key}' is {manifest.get(key)!r} "
+                             f"but the store has {meta.get(key)!r}. Re-run lexical_index.py.")
+
+    mmap_mode = "r" if mmap else None
+    return BM25Index(np.load(rows_path, mmap_mode=mmap_mode), np.load(weights_path, mmap_mode=mmap_mode),
+                     np.asarray(manifest["offsets"], dtype="int64"), manifest["vocabulary"], manifest["count"])
+
+
+# --- Configuration ---
+stores_to_index = ["osho_store_v4", "osho_master_store"]
+
+# --- Run Index Build ---
+if __name__ == "__main__":
+    print("Starting BM25 index build stage...")
+    for store_prefix in stores_to_index:
+        if not os.path.exists(store_paths(store_prefix)[1]):
+            print(f"Skipping '{store_prefix}' (store not found).")
+            continue
+        build_lexical_index(store_prefix)
+    print("BM25 index build stage finished.")
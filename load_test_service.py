@@ -0,0 +1,50 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+# --- Configuration ---
+SERVICE_URL = "http://127.0.0.1:8000"
+QUESTIONS = [
+    "What is love?",
+    "What is the problem with suppressed sex?",
+    "How does sex become superconsciousness?",
+    "What is meditation?",
+    "Why are people afraid of death?",
+    "What is the role of the ego?",
+]
+
+
+def one_request(url, endpoint, i):
+    """Sends one request (questions are varied so caches do not hide the work) and returns its latency."""
+    query = f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"
+    start = time.perf_counter()
+    response = requests.post(f"{url}{endpoint}", json={"query": query}, timeout=300)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test rag_service.py (run it with OSHO_STUB_LLM=1).")
+    parser.add_argument("--url", default=SERVICE_URL)
+    parser.add_argument("--endpoint", default="/search", choices=["/search", "/answer", "/answer/stream"])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    return parser.parse_args()
+
+
+# --- Run Load Test ---
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Sending {args.requests} requests to {args.url}{args.endpoint} with concurrency {args.concurrency}...")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = np.array(list(pool.map(lambda i: one_request(args.url, args.endpoint, i),
+                                           range(args.requests))))
+    elapsed = time.perf_counter() - start
+
+    print(f"Throughput: {args.requests / elapsed:.1f} req/s")
+    print(f"Latency p50: {np.percentile(latencies, 50) * 1000:.1f} ms | "
+          f"p99: {np.percentile(latencies, 99) * 1000:.1f} ms")
@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from retrieval import search_embeddings
+
+DELAY_SAMPLES = 10000  # Recent queueing delays kept for the percentile metrics
+
+
+class MicroBatcher:
+    """
+    Request-coalescing encoder + searcher.
+
+    Callers submit single queries from any thread. A worker thread collects
+    queries until max_batch have arrived or max_wait_ms has passed since the
+    first one, encodes them in one model.encode call, runs one index.search over
+    the batch (at the largest top_k requested; one per distinct book filter) and
+    hands every caller its own results.
+    """
+
+    def __init__(self, encoder, index, data, max_batch=32, max_wait_ms=5):
+        self.encoder = encoder
+        self.index = index
+        self.data = data
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self._delays = deque(maxlen=DELAY_SAMPLES)
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, query, top_k, min_score=0.0, books=None):
+        """Queues one query (optionally restricted to some books). The Future resolves to (query_embedding, results)."""
+        future = Future()
+        self._queue.put((query, top_k, min_score, tuple(sorted(books or ())), time.perf_counter(), future))
+        return future
+
+    def search(self, query, top_k, min_score=0.0, books=None):
+        """Blocking form of submit()."""
+        return self.submit(query, top_k, min_score, books).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Futures cancelled while queued (a client went away) are dropped; the rest can no longer be cancelled
+            batch = [item for item in self._collect() if item[5].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                embeddings = np.asarray(self.encoder.encode([item[0] for item in batch], convert_to_numpy=True,
+                                                            normalize_embeddings=True), dtype='float32')
+                top_k = max(item[1] for item in batch)
+                all_results = [None] * len(batch)
+                for books in set(item[3] for item in batch):
+                    positions = [i for i, item in enumerate(batch) if item[3] == books]
+                    group_results = search_embeddings(embeddings[positions], self.index, self.data, top_k,
+                                                      books=books)
+                    for i, results in zip(positions, group_results):
+                        all_results[i] = results
+                for (_, k, min_score, _, _, future), embedding, results in zip(batch, embeddings, all_results):
+                    future.set_result((embedding, [r for r in results[:k] if r['score'] >= min_score]))
+            except Exception as e:
+                # A failed batch fails its callers, never the worker
+                for item in batch:
+                    if not item[5].done():
+                        item[5].set_exception(e)
+                continue
+
+            with self._lock:
+                self.batches += 1
+                self.queries += len(batch)
+                self._delays.extend(started - item[4] for item in batch)
+
+    def stats(self):
+        """Batch fill and queueing delay (time from submit to the start of its batch)."""
+        with self._lock:
+            delays = np.array(self._delays) * 1000 if self._delays else np.zeros(1)
+            mean_batch = self.queries / self.batches if self.batches else 0.0
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "mean_batch_size": mean_batch,
+                "mean_batch_fill": mean_batch / self.max_batch,
+                "queue_delay_p50_ms": float(np.percentile(delays, 50)),
+                "queue_delay_p99_ms": float(np.percentile(delays, 99)),
+            }
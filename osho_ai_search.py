@@ -1,86 +1,118 @@
-import json
-import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+import os
+import time
+from background_loader import BackgroundLoader
+from encoders import load_encoder, encoder_model_key
+from faiss_index import load_index_artifact
+from sharded_index import load_sharded_index
+from lexical_index import load_lexical_index
+from query_cache import QueryEmbeddingCache
+from reranker import load_reranker, RERANK_MODEL_NAME, RERANK_CANDIDATES, RERANK_TIME_BUDGET_MS
+from retrieval import search_embeddings, search_lexical, select_results, candidate_count, SCORE_LABELS
 
 # --- Configuration ---
-EMBEDDINGS_FILE = "osho_from_sex_to_superconsciousness_embeddings.json"
+STORE_PREFIX = "osho_store_v4"
 MODEL_NAME = "all-MiniLM-L6-v2"
 TOP_K = 3  # Number of best matching results to retrieve
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_DB = "osho_query_cache.sqlite"  # Same file as app.py, so both reuse each other's work
+MIN_SCORE = 0.25  # Cosine similarity below which a passage counts as irrelevant
+RETRIEVAL_MODE = "hybrid"  # "dense", "lexical" or "hybrid" (see retrieval.py)
+BOOKS = None  # e.g. ["Vigyan Bhairav Tantra"] to search only those books (None searches all)
+RERANK = True  # Re-rank RERANK_CANDIDATES first-stage results with a cross-encoder, keep the best TOP_K
+ENCODER_BACKEND = os.environ.get("OSHO_ENCODER_BACKEND", "torch")  # Or an exported "torchscript"/"onnx"/"onnx-int8" model (encoders.py)
+ENCODER_THREADS = int(os.environ.get("OSHO_ENCODER_THREADS", 0)) or None  # Intra-op threads (None: one per core)
+LAZY_STARTUP = os.environ.get("OSHO_LAZY_STARTUP", "1") == "1"  # Take the first question while the core loads
+SHARDED_INDEX = os.environ.get("OSHO_SHARDED_INDEX") == "1"  # Search the shards of sharded_index.py in parallel
 
-def setup_osho_ai(embeddings_file, model_name):
-    """Loads data, builds the FAISS index, and loads the model."""
+def setup_osho_ai(store_prefix, model_name, mode="dense", rerank=False, encoder_backend="torch"):
+    """
+    Loads the prebuilt FAISS index and its metadata, the BM25 index unless the mode
+    is dense, the model (on the given encoder backend), and with rerank the
+    cross-encoder (else the reranker is None).
+    """
     print("--- Setting Up Osho AI Core ---")
     
-    # Load the chunks data
-    with open(embeddings_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # 1. Load the prebuilt index, or its shards (refused if stale), and the chunk metadata
+    index, meta = (load_sharded_index if SHARDED_INDEX else load_index_artifact)(store_prefix)
+    data = meta['chunks']  # Chunk text is read from the corpus only for the hits
+    print(f"Loaded {len(data)} chunks with {meta['dim']}-dimensional vectors.")
+    print(f"FAISS index loaded with {index.ntotal} vectors.")
+    lexical_index = None
+    if mode != "dense":
+        lexical_index = load_lexical_index(store_prefix, meta)
+        print(f"BM25 index loaded with {len(lexical_index.term_ids)} terms.")
 
-    # 1. Prepare Embeddings and Text
-    embeddings = [item['embedding'] for item in data]
-    texts = [item['text'] for item in data]
-    
-    # Convert list of embeddings to a NumPy array (required by FAISS)
-    embedding_array = np.array(embeddings).astype('float32')
-    
-    # Check dimensions
-    d = embedding_array.shape[1] # Dimension of the vectors (should be 384 for our model)
-    print(f"Loaded {len(data)} chunks with {d}-dimensional vectors.")
-
-    # 2. Build the FAISS Index
-    # We use IndexFlatL2 for simple Euclidean distance (similarity search)
-    index = faiss.IndexFlatL2(d)
-    index.add(embedding_array)
-    print(f"FAISS index built and loaded with {index.ntotal} vectors.")
-
-    # 3. Load the Sentence Transformer model for queries
-    model = SentenceTransformer(model_name)
-    print(f"Sentence Transformer model '{model_name}' loaded for query generation.")
+    # 2. Load the Sentence Transformer model for queries, behind the query embedding cache
+    model = QueryEmbeddingCache(load_encoder(model_name, encoder_backend, threads=ENCODER_THREADS),
+                                encoder_model_key(model_name, encoder_backend),
+                                maxsize=QUERY_CACHE_SIZE, db_path=QUERY_CACHE_DB)
+    print(f"Sentence Transformer model '{model_name}' ({encoder_backend}) loaded for query generation.")
+
+    # 3. Load the cross-encoder for the re-ranking stage
+    reranker = None
+    if rerank:
+        reranker = load_reranker(RERANK_MODEL_NAME, candidates=RERANK_CANDIDATES, time_budget_ms=RERANK_TIME_BUDGET_MS)
+        print(f"Cross-encoder '{RERANK_MODEL_NAME}' loaded for re-ranking.")
     
     print("--- Setup Complete ---")
-    return index, model, texts, data
+    return index, model, data, lexical_index, reranker
 
 # FIX 1: Added 'data' to the function's parameters
-def semantic_search(query, index, model, texts, data, top_k):
-    """Runs the query, finds the top K matches, and returns the source text."""
-    
-    # 1. Convert the user query into an embedding vector
-    query_embedding = model.encode([query], convert_to_numpy=True).astype('float32')
-    
-    # 2. Search the FAISS index
-    # D: Distances, I: Indices of the closest vectors
-    D, I = index.search(query_embedding, top_k)
-    
-    print(f"\nSearching for: '{query}'")
+def semantic_search(query, index, model, data, top_k, min_score=0.0, mode="dense", lexical_index=None,
+                    books=None, reranker=None):
+    """
+    Runs the query in the given retrieval mode, finds the top K matches and returns the source text.
+    Dense matches must score at least min_score; lexical matches must share a non-stopword term
+    with the query. Hybrid results need at least one dense match.
+    books (titles) restricts the search to those books; only their chunks are scanned.
+    With a reranker, reranker.candidates matches are fetched and the cross-encoder picks the top K.
+    """
+    start = time.perf_counter()
+    first_stage_k = reranker.candidates if reranker else top_k
+    candidates = candidate_count(mode, first_stage_k)
+    dense_results, lexical_results = [], []
+
+    if mode != "lexical":
+        # 1. Convert the user query into a unit-length embedding vector
+        query_embedding = model.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype('float32')
+
+        # 2. Search the FAISS index (weak matches are dropped, text is sliced from the corpus for the hits only)
+        dense_results = search_embeddings(query_embedding, index, data, candidates, min_score, books)[0]
+
+    if mode != "dense":
+        # 3. Search the BM25 index for the query's exact words (names, Sanskrit terms)
+        lexical_results = search_lexical(query, lexical_index, data, candidates, books)
+
+    results = select_results(mode, dense_results, lexical_results, first_stage_k)
+    latency = f"retrieve {(time.perf_counter() - start) * 1000:.1f} ms"
+
+    if reranker:
+        # 4. Re-rank the candidates with the cross-encoder (duplicates from chunk overlap dropped first)
+        results, timings = reranker.rerank(query, results, top_k)
+        latency += (f", dedup {timings['dedup_ms']:.1f} ms, rerank {timings['rerank_ms']:.1f} ms "
+                    f"({timings['scored']} scored, {timings['cached']} cached, {timings['unscored']} over budget, "
+                    f"{timings['duplicates']} duplicates dropped)")
+
+    print(f"\nSearching for: '{query}' ({mode}{', in ' + ', '.join(books) if books else ''})")
+    print(f"Latency: {latency}")
     print("-" * 50)
-    
-    # 3. Retrieve and format the results
-    results = []
-    for i in range(top_k):
-        chunk_index = I[0][i]
-        
-        # Guard against index out of bounds if search fails
-        if chunk_index < len(texts):
-            result = {
-                "score": 1 / (1 + D[0][i]), # Convert L2 distance to a "similarity score" (higher is better)
-                "text": texts[chunk_index],
-                "source_id": data[chunk_index]['id'], # This line will now work
-                "book": data[chunk_index]['source']  # This line will now work
-            }
-            results.append(result)
-            
-            # Print result directly to console
-            print(f"Match {i+1} (Score: {result['score']:.4f})")
-            print(f"Source: {result['book']} (ID: {result['source_id']})")
-            print(f"Text: {result['text']}")
-            print("-" * 50)
+    for i, result in enumerate(results):
+        # Print result directly to console
+        rerank_score = f", cross-encoder: {result['rerank_score']:.4f}" if 'rerank_score' in result else ""
+        print(f"Match {i+1} ({SCORE_LABELS[mode]}: {result['score']:.4f}{rerank_score})")
+        print(f"Source: {result['book']} (ID: {result['source_id']})")
+        print(f"Text: {result['text']}")
+        print("-" * 50)
 
     return results
 
 # --- Main Application Loop ---
 if __name__ == "__main__":
-    # Initialize the AI
-    ai_index, ai_model, ai_texts, ai_data = setup_osho_ai(EMBEDDINGS_FILE, MODEL_NAME)
+    # Initialize the AI (in the background with LAZY_STARTUP, so the prompt appears at once)
+    core_loader = BackgroundLoader(lambda: setup_osho_ai(STORE_PREFIX, MODEL_NAME, RETRIEVAL_MODE, RERANK,
+                                                         ENCODER_BACKEND))
+    if not LAZY_STARTUP:
+        core_loader.result()
 
     print("\nOsho AI Ready. Ask a question about 'From Sex to Superconsciousness'.")
     print("Type 'exit' to quit.")
@@ -89,11 +121,20 @@ if __name__ == "__main__":
         user_input = input("\nYour Question: ")
         
         if user_input.lower() == 'exit':
+            if core_loader.ready():
+                print(f"Query cache: {core_loader.result()[1].stats()}")
             print("Thank you for exploring the Osho AI. Farewell!")
             break
             
         if user_input.strip() == "":
             continue
 
+        if not core_loader.ready():
+            print("(Waiting for the search core to finish loading...)")
+        ai_index, ai_model, ai_data, ai_lexical, ai_reranker = core_loader.result()
+
         # FIX 2: Added 'ai_data' to the function call
-        semantic_search(user_input, ai_index, ai_model, ai_texts, ai_data, TOP_K)
\ No newline at end of file
+        results = semantic_search(user_input, ai_index, ai_model, ai_data, TOP_K, MIN_SCORE,
+                                  RETRIEVAL_MODE, ai_lexical, BOOKS, ai_reranker)
+        if not results:
+            print("No sufficiently relevant passages found.")
\ No newline at end of file
@@ -0,0 +1,140 @@
+import json
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from extract_osho_text import extract_text_from_pdf
+from clean_osho_text import clean_osho_text, CLEANING_PROFILES
+from chunk_osho_text import chunk_spans, chunk_length_fn, structure_chunks, CHUNK_BUDGETS
+from embedding_store import save_embedding_store, load_embedding_store, store_paths
+from embedding_cache import EmbeddingCache, embed_with_cache
+from encoders import encoder_model_key
+from faiss_index import update_index_artifact
+from lexical_index import build_lexical_index
+from sharded_index import build_sharded_index
+
+# --- Configuration ---
+BOOKS_MANIFEST = "books.json"      # One entry per book: id, title, pdf, extracted, cleaning_profile
+BUILD_DIR = "pipeline_build"       # Per-book cleaned text and chunks
+OUTPUT_STORE = "osho_master_store" # The combined store (and index) the app serves
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = "torch"        # Or an exported "onnx" / "onnx-int8" model on onnxruntime (encoders.py)
+EMBEDDING_CACHE_DB = "osho_embedding_cache.sqlite"  # (text, model) -> embedding, reused across runs
+CHUNK_UNIT = "chars"               # "tokens" budgets chunks in EMBEDDING_MODEL word-pieces
+INDEX_TYPE = "flat"                # See faiss_index.py / benchmark_indexes.py
+INDEX_SHARDS = 0                   # > 0 also splits the store into this many shards (sharded_index.py)
+NUM_WORKERS = None                 # None -> one process per CPU core
+
+
+def load_books(manifest_path):
+    """Reads and validates the books manifest."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        books = json.load(f)
+
+    seen_ids = set()
+    for book in books:
+        for key in ("id", "title", "pdf", "extracted", "cleaning_profile"):
+            if key not in book:
+                raise ValueError(f"Book {book} in '{manifest_path}' is missing '{key}'.")
+        if book["cleaning_profile"] not in CLEANING_PROFILES:
+            raise ValueError(f"Unknown cleaning profile '{book['cleaning_profile']}' for '{book['id']}'.")
+        if book["id"] in seen_ids:
+            raise ValueError(f"Duplicate book id '{book['id']}' in '{manifest_path}'.")
+        seen_ids.add(book["id"])
+    return books
+
+
+def is_stale(output_path, input_path):
+    """True if output_path is missing or older than input_path (a missing input never forces a rebuild)."""
+    if not os.path.exists(output_path):
+        return True
+    return os.path.exists(input_path) and os.path.getmtime(input_path) > os.path.getmtime(output_path)
+
+
+def extract_stage(book):
+    """Extracts the PDF unless an up-to-date extracted text file already exists."""
+    if is_stale(book["extracted"], book["pdf"]):
+        if not os.path.exists(book["pdf"]):
+            raise FileNotFoundError(f"Neither '{book['pdf']}' nor '{book['extracted']}' exists for '{book['id']}'.")
+        # Extraction parallelizes over pages itself, so books are extracted one after another
+        extract_text_from_pdf(book["pdf"], book["extracted"], workers=NUM_WORKERS)
+    else:
+        print(f"[{book['id']}] Extracted text is up to date, skipping extraction.")
+
+
+def clean_and_chunk_stage(book):
+    """Worker: cleans and chunks one book, saves both to BUILD_DIR and returns the chunk records."""
+    start = time.perf_counter()
+    cleaned_path = os.path.join(BUILD_DIR, f"{book['id']}_cleaned.txt")
+    clean_osho_text(book["extracted"], cleaned_path, book["title"], book["cleaning_profile"])
+    with open(cleaned_path, 'r', encoding='utf-8') as f:
+        cleaned_text = f.read()
+
+    max_size, overlap = CHUNK_BUDGETS[CHUNK_UNIT]
+    spans = chunk_spans(cleaned_text, max_size, overlap, chunk_length_fn(CHUNK_UNIT, EMBEDDING_MODEL))
+    chunks = structure_chunks([cleaned_text[start:end] for start, end in spans], book["title"], book["id"], spans)
+
+    with open(os.path.join(BUILD_DIR, f"{book['id']}_chunks.json"), 'w', encoding='utf-8') as f:
+        json.dump(chunks, f, ensure_ascii=False)
+
+    print(f"[{book['id']}] Cleaned and chunked into {len(chunks)} chunks in {time.perf_counter() - start:.1f}s.")
+    return chunks
+
+
+def embed_stage(chunks):
+    """
+    Embeds every chunk of every book, reusing cached embeddings. Only new or changed
+    chunks are encoded, all with one model instance (it is multi-threaded already).
+    """
+    def encode(texts):
+        from generate_embeddings import embed_texts  # Pulls in torch, only when something must be encoded
+        return embed_texts(texts, EMBEDDING_MODEL, EMBEDDING_BACKEND)
+
+    embeddings, reused, encoded = embed_with_cache([chunk['text'] for chunk in chunks],
+                                                   encoder_model_key(EMBEDDING_MODEL, EMBEDDING_BACKEND),
+                                                   EmbeddingCache(EMBEDDING_CACHE_DB), encode)
+    print(f"Embeddings: {reused} chunks reused from the cache, {encoded} encoded.")
+    return embeddings
+
+
+def load_previous_store(prefix):
+    """Header and ids of the store about to be replaced (copied, the files are rewritten next)."""
+    if not os.path.exists(store_paths(prefix)[1]):
+        return None
+    try:
+        _, meta = load_embedding_store(prefix)
+    except (FileNotFoundError, ValueError):
+        return None  # Older store format, the index is rebuilt
+    return {"content_hash": meta['content_hash'], "index_ids": np.array(meta['index_ids'])}
+
+
+def run_pipeline(manifest_path):
+    """extract -> clean -> chunk -> embed -> index (FAISS and BM25) for every book in the manifest."""
+    books = load_books(manifest_path)
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    print(f"Running the pipeline for {len(books)} books from '{manifest_path}'...")
+
+    for book in books:
+        extract_stage(book)
+
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS) as pool:
+        per_book_chunks = list(pool.map(clean_and_chunk_stage, books))
+    all_chunks = [chunk for chunks in per_book_chunks for chunk in chunks]
+    print(f"Total chunks across all books: {len(all_chunks)}")
+
+    embeddings = embed_stage(all_chunks)
+    previous_meta = load_previous_store(OUTPUT_STORE)
+    # Chunks are stored as offsets into the cleaned texts, which become the store's corpus
+    book_files = {book["id"]: os.path.join(BUILD_DIR, f"{book['id']}_cleaned.txt") for book in books}
+    save_embedding_store(OUTPUT_STORE, embeddings, all_chunks, encoder_model_key(EMBEDDING_MODEL, EMBEDDING_BACKEND),
+                         normalized=True, book_files=book_files)
+    update_index_artifact(OUTPUT_STORE, previous_meta, INDEX_TYPE)
+    if INDEX_SHARDS:
+        build_sharded_index(OUTPUT_STORE, INDEX_SHARDS, index_type=INDEX_TYPE)
+    build_lexical_index(OUTPUT_STORE)
+
+
+# --- Run Pipeline ---
+if __name__ == "__main__":
+    run_pipeline(BOOKS_MANIFEST)
+    print("Pipeline finished. The app will serve the new store on its next start.")
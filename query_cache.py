@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+import numpy as np
+from embedding_cache import SQLITE_MAX_PARAMS
+
+
+def normalize_query(query):
+    """
+    Canonical cache key for a query. all-MiniLM-L6-v2 uses an uncased tokenizer,
+    so lower-casing and collapsing whitespace never changes the embedding.
+    """
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of normalized query -> embedding in front of a SentenceTransformer.
+    With db_path set, entries are also written to a SQLite file, so they survive
+    restarts and are shared by every Streamlit worker pointing at the same file.
+    """
+
+    def __init__(self, model, model_name, maxsize=1024, db_path=None):
+        self.model = model
+        self.model_name = model_name
+        self.maxsize = maxsize
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()  # Streamlit serves sessions from several threads
+
+        if db_path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    " model TEXT NOT NULL, query TEXT NOT NULL, embedding BLOB NOT NULL,"
+                    " PRIMARY KEY (model, query))"
+                )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers in other workers are not blocked by writes
+        return conn
+
+    def _remember(self, key, embedding):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _lookup_disk(self, keys):
+        """Returns {key: embedding} for the keys on disk, over one connection."""
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), SQLITE_MAX_PARAMS - 1):  # One parameter is the model
+                batch = keys[start:start + SQLITE_MAX_PARAMS - 1]
+                rows = conn.execute(
+                    f"SELECT query, embedding FROM query_embeddings"
+                    f" WHERE model = ? AND query IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                found.update((key, np.frombuffer(blob, dtype='float32')) for key, blob in rows)
+        return found
+
+    def _store_disk(self, items):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO query_embeddings (model, query, embedding) VALUES (?, ?, ?)",
+                [(self.model_name, key, embedding.tobytes()) for key, embedding in items],
+            )
+
+    def encode(self, queries, **kwargs):
+        """
+        Returns a (len(queries), dim) float32 array of unit-length embeddings.
+        Only queries missing from both the memory and disk caches reach the model,
+        and those are encoded together in one batch. Accepts (and ignores) the
+        SentenceTransformer.encode keyword arguments, so it is a drop-in for the model.
+        """
+        keys = [normalize_query(query) for query in queries]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.db_path:
+            found.update(self._lookup_disk(missing))
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            embeddings = self.model.encode(missing, convert_to_numpy=True,
+                                           normalize_embeddings=True).astype('float32')
+            new_items = list(zip(missing, embeddings))
+            found.update(new_items)
+            if self.db_path:
+                self._store_disk(new_items)
+
+        missing = set(missing)
+        with self._lock:
+            miss_count = sum(1 for key in keys if key in missing)
+            self.misses += miss_count
+            self.hits += len(keys) - miss_count
+            for key in dict.fromkeys(keys):
+                self._remember(key, found[key])
+
+        return np.stack([found[key] for key in keys])
+
+    def stats(self):
+        """Hit/miss counters and current size, for display or logging."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from encoders import load_encoder, encoder_model_key
+from faiss_index import load_index_artifact
+from sharded_index import load_sharded_index
+from micro_batcher import MicroBatcher
+from query_cache import QueryEmbeddingCache
+from answer_cache import AnswerCache
+from generation import generate_cached_response, stream_cached_response, load_gemini_model, StubGenerativeModel, \
+    prompt_stats
+
+# --- Configuration ---
+STORE_PREFIX = os.environ.get("OSHO_STORE", "osho_master_store")
+MODEL_NAME = "all-MiniLM-L6-v2"
+ENCODER_BACKEND = os.environ.get("OSHO_ENCODER_BACKEND", "torch")  # See encoders.py
+ENCODER_THREADS = int(os.environ.get("OSHO_ENCODER_THREADS", 0)) or None
+SHARDED_INDEX = os.environ.get("OSHO_SHARDED_INDEX") == "1"  # See sharded_index.py
+GENERATIVE_MODEL_NAME = "models/gemini-pro-latest"
+USE_STUB_GENERATOR = os.environ.get("OSHO_STUB_LLM") == "1"
+TOP_K = 3
+MIN_SCORE = 0.25
+MAX_TOP_K = 50
+QUERY_CACHE_SIZE = 4096
+QUERY_CACHE_DB = "osho_query_cache.sqlite"
+BATCH_MAX_SIZE = 32       # Most queries encoded (and searched) together
+BATCH_MAX_WAIT_MS = 5     # How long the first query of a batch waits for company
+GENERATE_THREADS = 32     # Blocking LLM calls in flight
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Loads the retrieval core and the generator once, when the service starts."""
+    print("--- (SERVICE) Loading Retrieval and Generative Cores... ---")
+    index, meta = (load_sharded_index if SHARDED_INDEX else load_index_artifact)(STORE_PREFIX)
+    encoder = QueryEmbeddingCache(load_encoder(MODEL_NAME, ENCODER_BACKEND, threads=ENCODER_THREADS),
+                                  encoder_model_key(MODEL_NAME, ENCODER_BACKEND),
+                                  maxsize=QUERY_CACHE_SIZE, db_path=QUERY_CACHE_DB)
+
+    app.state.batcher = MicroBatcher(encoder, index, meta['chunks'], BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+    app.state.generate_pool = ThreadPoolExecutor(max_workers=GENERATE_THREADS, thread_name_prefix="generate")
+    app.state.generator = StubGenerativeModel() if USE_STUB_GENERATOR else load_gemini_model(GENERATIVE_MODEL_NAME)
+    app.state.answer_cache = AnswerCache()
+    print("--- (SERVICE) Ready. ---")
+
+    yield
+
+    app.state.generate_pool.shutdown(wait=False)
+
+
+async def parse_query(request):
+    """Reads {"query": ..., "top_k": ..., "min_score": ...} from the request body (ValueError if malformed)."""
+    body = await request.json()
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object.")
+    query = body.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("'query' must be a non-empty string.")
+    try:
+        top_k = max(1, min(int(body.get("top_k", TOP_K)), MAX_TOP_K))
+        min_score = float(body.get("min_score", MIN_SCORE))
+    except TypeError:  # null, a list or an object
+        raise ValueError("'top_k' and 'min_score' must be numbers.")
+    return query.strip(), top_k, min_score
+
+
+async def retrieve(request):
+    """Encodes and searches one query in a micro-batch. Returns (query, embedding, results, timings)."""
+    query, top_k, min_score = await parse_query(request)
+    start = time.perf_counter()
+    embedding, results = await asyncio.wrap_future(request.app.state.batcher.submit(query, top_k, min_score))
+    return query, embedding, results, {"retrieve_s": time.perf_counter() - start}
+
+
+def bad_request(error):
+    return JSONResponse({"error": str(error)}, status_code=400)
+
+
+async def search_endpoint(request):
+    try:
+        _, _, results, timings = await retrieve(request)
+    except ValueError as e:
+        return bad_request(e)
+    return JSONResponse({"results": results, "timings": timings})
+
+
+async def answer_endpoint(request):
+    try:
+        query, embedding, results, timings = await retrieve(request)
+    except ValueError as e:
+        return bad_request(e)
+    state = request.app.state
+
+    answer = None
+    if results:  # Nothing relevant retrieved -> no LLM call
+        start = time.perf_counter()
+        answer = await asyncio.get_running_loop().run_in_executor(
+            state.generate_pool, generate_cached_response, state.answer_cache, state.generator,
+            GENERATIVE_MODEL_NAME, query, embedding, results)
+        timings["generate_s"] = time.perf_counter() - start
+    return JSONResponse({"answer": answer, "results": results, "timings": timings})
+
+
+async def answer_stream_endpoint(request):
+    """
+    Streams newline-delimited JSON: first {"results": [...]}, then {"text": ...}
+    pieces as the generator produces them.
+    """
+    try:
+        query, embedding, results, _ = await retrieve(request)
+    except ValueError as e:
+        return bad_request(e)
+    state = request.app.state
+
+    def lines():
+        yield json.dumps({"results": results}, ensure_ascii=False) + "\n"
+        if not results:
+            return
+        for piece in stream_cached_response(state.answer_cache, state.generator, GENERATIVE_MODEL_NAME,
+                                            query, embedding, results):
+            yield json.dumps({"text": piece}, ensure_ascii=False) + "\n"
+
+    # Starlette iterates synchronous generators in its thread pool, off the event loop
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def metrics_endpoint(request):
+    return JSONResponse({
+        "micro_batcher": request.app.state.batcher.stats(),
+        "answer_cache": request.app.state.answer_cache.stats(),
+        "prompts": prompt_stats.stats(),
+    })
+
+
+app = Starlette(
+    routes=[
+        Route("/metrics", metrics_endpoint, methods=["GET"]),
+        Route("/search", search_endpoint, methods=["POST"]),
+        Route("/answer", answer_endpoint, methods=["POST"]),
+        Route("/answer/stream", answer_stream_endpoint, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
+
+# --- Run Service ---
+# uvicorn rag_service:app --port 8000   (OSHO_STUB_LLM=1 for a local fake LLM)
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=8000)
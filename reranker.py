@@ -0,0 +1,140 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from query_cache import normalize_query
+
+# --- Configuration Defaults ---
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # Small, CPU-friendly, uncased like MiniLM
+RERANK_CANDIDATES = 30      # N: results fetched from the index and scored by the cross-encoder
+RERANK_BATCH_SIZE = 16      # (query, chunk) pairs per forward pass
+RERANK_TIME_BUDGET_MS = 300 # Scoring stops after this; unscored candidates keep their retrieval order
+DEDUP_THRESHOLD = 0.5       # Share of a chunk's word 3-grams already in a kept chunk that makes it a duplicate
+SHINGLE_WORDS = 3
+WORD = re.compile(r"\w+")
+
+
+def query_hash(query):
+    """Cache key of a query: normalized (the cross-encoder is uncased), then hashed to a fixed size."""
+    return hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+
+
+def shingles(text):
+    words = WORD.findall(text.lower())
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+
+
+def drop_near_duplicates(results, threshold=DEDUP_THRESHOLD):
+    """
+    Keeps results in order, skipping any whose word 3-grams are mostly (>= threshold)
+    contained in a result already kept: the same passage retrieved twice through the
+    chunker's overlap, or from two stores holding the same book.
+    Returns (kept, dropped_count).
+    """
+    kept, kept_shingles = [], []
+    for result in results:
+        grams = shingles(result['text'])
+        if any(len(grams & other) >= threshold * min(len(grams), len(other)) for other in kept_shingles):
+            continue
+        kept.append(result)
+        kept_shingles.append(grams)
+    return kept, len(results) - len(kept)
+
+
+class Reranker:
+    """
+    Second retrieval stage: the first stage fetches `candidates` results, a
+    cross-encoder scores the (query, chunk) pairs in batches and the best are kept.
+    Scores are cached per (query hash, chunk id) in a bounded LRU, so a repeated
+    question (or a Streamlit rerun) costs no inference. Scoring stops once
+    time_budget_ms is spent; candidates left unscored follow the scored ones in
+    their original order.
+    """
+
+    def __init__(self, model, candidates=RERANK_CANDIDATES, batch_size=RERANK_BATCH_SIZE,
+                 time_budget_ms=RERANK_TIME_BUDGET_MS, dedup_threshold=DEDUP_THRESHOLD, maxsize=8192):
+        self.model = model
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.time_budget = time_budget_ms / 1000
+        self.dedup_threshold = dedup_threshold
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()  # (query hash, chunk id) -> cross-encoder score
+        self._lock = threading.Lock()
+
+    def _cached(self, keys):
+        with self._lock:
+            found = {}
+            for key in keys:
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[key] = self._scores[key]
+            return found
+
+    def _remember(self, items):
+        with self._lock:
+            for key, score in items:
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.maxsize:
+                self._scores.popitem(last=False)
+
+    def rerank(self, query, results, top_k):
+        """
+        Returns (the best top_k results by cross-encoder score, each with a 'rerank_score',
+        timings) where timings holds the per-stage milliseconds and counts.
+        """
+        start = time.perf_counter()
+        results, duplicates = drop_near_duplicates(results, self.dedup_threshold)
+        dedup_done = time.perf_counter()
+
+        qhash = query_hash(query)
+        keys = [(qhash, result['source_id']) for result in results]
+        scores = self._cached(keys)
+        cached = len(scores)
+        pending = [i for i, key in enumerate(keys) if key not in scores]
+        scored = 0
+        for batch_start in range(0, len(pending), self.batch_size):
+            if time.perf_counter() - dedup_done > self.time_budget:
+                break
+            batch = pending[batch_start:batch_start + self.batch_size]
+            batch_scores = self.model.predict([(query, results[i]['text']) for i in batch],
+                                              batch_size=self.batch_size, show_progress_bar=False)
+            new_items = [(keys[i], float(score)) for i, score in zip(batch, batch_scores)]
+            self._remember(new_items)
+            scores.update(new_items)
+            scored += len(batch)
+        with self._lock:
+            self.hits += cached
+            self.misses += scored
+        score_done = time.perf_counter()
+
+        # Scored candidates by score, then the rest in first-stage order (a stable sort keeps it)
+        order = sorted(range(len(results)), key=lambda i: (keys[i] not in scores, -scores.get(keys[i], 0.0)))
+        reranked = [{**results[i], "rerank_score": scores[keys[i]]} if keys[i] in scores else dict(results[i])
+                    for i in order[:top_k]]
+        timings = {
+            "dedup_ms": (dedup_done - start) * 1000,
+            "rerank_ms": (score_done - dedup_done) * 1000,
+            "candidates": len(results),
+            "duplicates": duplicates,
+            "cached": cached,
+            "scored": scored,
+            "unscored": len(results) - cached - scored,
+        }
+        return reranked, timings
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                    "size": len(self._scores)}
+
+
+def load_reranker(model_name=RERANK_MODEL_NAME, **kwargs):
+    """Loads the cross-encoder on the CPU (sentence-transformers) behind a Reranker."""
+    from sentence_transformers import CrossEncoder  # Pulls in torch, only when re-ranking is enabled
+    return Reranker(CrossEncoder(model_name, device="cpu"), **kwargs)
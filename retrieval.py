@@ -0,0 +1,80 @@
+# --- Retrieval Modes ---
+# "dense"   -> FAISS search over the query embedding (cosine similarity)
+# "lexical" -> BM25 over the chunk tokens, catches exact names and Sanskrit terms MiniLM misses
+# "hybrid"  -> both, merged by reciprocal rank fusion
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+SCORE_LABELS = {"dense": "Cosine", "lexical": "BM25", "hybrid": "RRF"}
+RRF_K = 60                # Damps the weight of the top ranks (the constant from the RRF paper)
+HYBRID_CANDIDATES = 50    # Results fetched from each retriever before fusion
+
+
+def search_embeddings(query_embeddings, index, data, top_k, min_score=0.0, books=None):
+    """
+    Runs one FAISS search over a (n_queries, dim) matrix of unit-length query
+    embeddings and returns a list of results per query, each scoring at least min_score.
+    With books (titles), only the chunks of those books are searched.
+    """
+    from faiss_index import cosine_scores  # Not at module level: the UI imports this module before faiss is needed
+    if books:
+        D, I = index.search(query_embeddings, top_k, rows=data.book_rows(books))
+    else:
+        D, I = index.search(query_embeddings, top_k)
+    scores = cosine_scores(index, D)
+
+    all_results = []
+    for row in range(I.shape[0]):
+        results = []
+        for i in range(top_k):
+            chunk_index = I[row][i]
+            # FAISS pads with -1 when an approximate index finds fewer than top_k hits
+            if 0 <= chunk_index < len(data) and scores[row][i] >= min_score:
+                # A ChunkTable builds the record (and reads the text) per access
+                results.append(chunk_result(data[chunk_index], scores[row][i]))
+        all_results.append(results)
+    return all_results
+
+
+def chunk_result(chunk, score):
+    return {"score": float(score), "text": chunk['text'], "source_id": chunk['id'], "book": chunk['source']}
+
+
+def search_lexical(query, lexical_index, data, top_k, books=None):
+    """Runs a BM25 search and returns its results, shaped like search_embeddings results."""
+    scores, rows = lexical_index.search(query, top_k, data.book_rows(books) if books else None)
+    return [chunk_result(data[row], score) for score, row in zip(scores, rows)]
+
+
+def fuse_results(result_lists, top_k, k=RRF_K):
+    """
+    Reciprocal rank fusion: every chunk scores sum(1 / (k + rank)) over the lists
+    it appears in, so chunks both retrievers agree on rise to the top.
+    """
+    fused, chunks = {}, {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            fused[result['source_id']] = fused.get(result['source_id'], 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(result['source_id'], result)
+    best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**chunks[source_id], "score": fused[source_id]} for source_id in best]
+
+
+def candidate_count(mode, top_k):
+    """How many results each retriever should return for a top_k search in this mode."""
+    return top_k if mode == "dense" else max(top_k, HYBRID_CANDIDATES)
+
+
+def select_results(mode, dense_results, lexical_results, top_k):
+    """
+    The results of a mode from the candidates of both retrievers. dense_results hold
+    only matches above the caller's min_score; BM25 scores have no such floor, so a
+    hybrid search with no dense match returns nothing (and the LLM is not called).
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}'. Choose one of {RETRIEVAL_MODES}.")
+    if mode == "dense":
+        return dense_results[:top_k]
+    if mode == "lexical":
+        return lexical_results[:top_k]
+    if not dense_results:
+        return []
+    return fuse_results([dense_results, lexical_results], top_k)
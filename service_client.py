@@ -0,0 +1,42 @@
+import json
+import requests
+
+REQUEST_TIMEOUT = 120  # Seconds, generation can be slow
+
+
+def search(service_url, query, top_k, min_score):
+    """Calls the service's /search endpoint and returns the result list."""
+    response = requests.post(f"{service_url}/search",
+                             json={"query": query, "top_k": top_k, "min_score": min_score},
+                             timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["results"]
+
+
+def stream_answer(service_url, query, top_k, min_score):
+    """
+    Calls /answer/stream. Returns (results, text_pieces) where text_pieces is a
+    generator yielding the answer as the service streams it (empty if nothing relevant was found).
+    """
+    response = requests.post(f"{service_url}/answer/stream",
+                             json={"query": query, "top_k": top_k, "min_score": min_score},
+                             stream=True, timeout=REQUEST_TIMEOUT)
+    try:
+        response.raise_for_status()
+        lines = response.iter_lines(decode_unicode=True)
+        results = json.loads(next(lines))["results"]
+    except Exception:
+        response.close()
+        raise
+    if not results:
+        # Nothing follows, and the caller will not iterate the pieces: release the connection now
+        response.close()
+        return results, iter(())
+
+    def text_pieces():
+        with response:
+            for line in lines:
+                if line:
+                    yield json.loads(line)["text"]
+
+    return results, text_pieces()
@@ -0,0 +1,231 @@
+import heapq
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import faiss
+import numpy as np
+from embedding_store import load_embedding_store, save_npy, save_json
+from faiss_index import (build_index, write_index_file, read_index, apply_search_params, RowIndex, RescoringIndex,
+                         METRICS, QUANTIZED_INDEX_TYPES)
+
+# --- Sharded Index Format ---
+# The store's vectors split into N shards, each with its own files next to the store:
+#   <prefix>_shard_NN_rows.npy     -> (n,) int64 store rows held by the shard, ascending
+#   <prefix>_shard_NN_vectors.npy  -> (n, dim) the vectors of those rows
+#   <prefix>_shard_NN_index.faiss  -> a FAISS index over them, under the store's chunk ids
+#   <prefix>_shards.json           -> the shard list (size, books, index params), content hash of the store
+# Search results are store rows, so the chunk text still comes from the store's corpus.
+# "book" sharding keeps each book in one shard (a search in a few books touches a few
+# shards); "hash" spreads every book evenly by chunk id (every shard takes every query).
+SHARDS_VERSION = 1
+SHARD_STRATEGIES = ("book", "hash")
+
+
+def shard_paths(prefix, shard):
+    """Returns the (rows, vectors, index) file paths of one shard of a store."""
+    base = f"{prefix}_shard_{shard:02d}"
+    return f"{base}_rows.npy", f"{base}_vectors.npy", f"{base}_index.faiss"
+
+
+def shards_manifest_path(prefix):
+    return f"{prefix}_shards.json"
+
+
+def assign_shards(meta, n_shards, strategy="book"):
+    """The shard of every store row: whole books balanced by chunk count, or chunk id modulo n_shards."""
+    if strategy not in SHARD_STRATEGIES:
+        raise ValueError(f"Unknown shard strategy '{strategy}'. Choose one of {SHARD_STRATEGIES}.")
+    if strategy == "hash":
+        # Chunk ids are sha256-derived, so they spread evenly
+        return (np.asarray(meta['index_ids']) % n_shards).astype('int64')
+
+    books = np.asarray(meta['chunks'].rows["book"])
+    sizes = np.bincount(books, minlength=len(meta['books']))
+    # Largest book first into the emptiest shard
+    loads = [(0, shard) for shard in range(n_shards)]
+    book_shards = np.zeros(len(meta['books']), dtype='int64')
+    for book in np.argsort(-sizes, kind='stable'):
+        load, shard = heapq.heappop(loads)
+        book_shards[book] = shard
+        heapq.heappush(loads, (load + int(sizes[book]), shard))
+    return book_shards[books]
+
+
+def build_sharded_index(store_prefix, n_shards, strategy="book", index_type="flat", params=None, metric="ip"):
+    """Splits a store into n_shards shards, builds an index per shard and writes the shard manifest."""
+    print(f"Loading vector store '{store_prefix}'...")
+    vectors, meta = load_embedding_store(store_prefix)
+    if metric == "ip" and not meta['normalized']:
+        raise ValueError(f"Store '{store_prefix}' is not normalized, inner product would not be cosine. "
+                         "Re-embed it or build with metric='l2'.")
+
+    assignment = assign_shards(meta, n_shards, strategy)
+    books = np.asarray(meta['chunks'].rows["book"])
+    shards = []
+    print(f"Building {n_shards} '{index_type}' shards ({strategy}) over {meta['count']} vectors...")
+    for shard in range(n_shards):
+        rows = np.flatnonzero(assignment == shard)
+        if rows.size == 0:
+            raise ValueError(f"Shard {shard} would be empty: {n_shards} shards for {len(meta['books'])} books "
+                             f"is too many with '{strategy}' sharding.")
+        rows_path, vectors_path, index_path = shard_paths(store_prefix, shard)
+        shard_vectors = np.asarray(vectors[rows])
+        save_npy(rows_path, rows)
+        save_npy(vectors_path, shard_vectors)
+        index, shard_params = build_index(shard_vectors, index_type, params, metric,
+                                          ids=np.asarray(meta['index_ids'])[rows])
+        write_index_file(index, index_path)
+        shards.append({
+            "count": int(rows.size),
+            "index_params": shard_params,
+            "books": [meta['books'][book]["title"] for book in np.unique(books[rows])],
+        })
+        print(f"  Shard {shard}: {rows.size} vectors, {len(shards[-1]['books'])} books.")
+
+    manifest = {
+        "version": SHARDS_VERSION,
+        "strategy": strategy,
+        "index_type": index_type,
+        "metric": metric,
+        "model": meta['model'],
+        "dim": meta['dim'],
+        "count": meta['count'],
+        "content_hash": meta['content_hash'],
+        "shards": shards,
+    }
+    save_json(shards_manifest_path(store_prefix), manifest, indent=2)
+    print(f"Sharded index saved to '{shards_manifest_path(store_prefix)}'.")
+    return manifest
+
+
+class ShardedIndex:
+    """
+    The shards of a store searched as one index: search() fans a query batch out to
+    the shards on a thread pool (FAISS releases the GIL while it searches) and merges
+    their top-k with a heap. Results are store rows, as from a RowIndex. A shard's
+    index and vectors are mapped on its first search, and a search restricted to
+    some rows only reaches the shards holding them.
+    """
+
+    def __init__(self, store_prefix, manifest, index_ids, max_workers=None, lazy=True):
+        self.store_prefix = store_prefix
+        self.manifest = manifest
+        self.metric_type = METRICS[manifest["metric"]]
+        self.ntotal = manifest["count"]
+        self.index_ids = index_ids
+        n_shards = len(manifest["shards"])
+        self.shard_rows = [np.load(shard_paths(store_prefix, shard)[0], mmap_mode="r") for shard in range(n_shards)]
+        self._shards = [None] * n_shards
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or min(n_shards, os.cpu_count() or 1),
+                                        thread_name_prefix="shard-search")
+        if not lazy:
+            for shard in range(n_shards):
+                self.shard(shard)
+
+    def loaded_shards(self):
+        return sum(shard is not None for shard in self._shards)
+
+    def close(self):
+        """Stops the search threads; the index cannot search afterwards."""
+        self._pool.shutdown()
+
+    def shard(self, shard):
+        """The index of one shard (returning shard-local rows), loaded on first use."""
+        index = self._shards[shard]
+        if index is None:
+            with self._lock:
+                index = self._shards[shard]
+                if index is None:
+                    index = self._load_shard(shard)
+                    self._shards[shard] = index
+        return index
+
+    def _load_shard(self, shard):
+        _, vectors_path, index_path = shard_paths(self.store_prefix, shard)
+        index_type, params = self.manifest["index_type"], self.manifest["shards"][shard]["index_params"]
+        rows = self.shard_rows[shard]
+        vectors = np.load(vectors_path, mmap_mode="r")
+        index = read_index(index_path, binary=index_type == "binary")
+        apply_search_params(index, index_type, params)
+        if index.ntotal != rows.size or vectors.shape[0] != rows.size:
+            raise ValueError(f"Shard {shard} of '{self.store_prefix}' is inconsistent: {index.ntotal} vectors "
+                             f"indexed, {vectors.shape[0]} stored, {rows.size} rows.")
+        index = RowIndex(index, np.asarray(self.index_ids)[rows], vectors)
+        if index_type in QUANTIZED_INDEX_TYPES:
+            index = RescoringIndex(index, vectors, index_type, params["rescore"], self.manifest["metric"])
+        return index
+
+    def _search_shard(self, shard, x, k, local_rows):
+        D, I = self.shard(shard).search(x, k, rows=local_rows)
+        rows = self.shard_rows[shard]
+        return D, np.where(I >= 0, rows[np.maximum(I, 0)], -1)
+
+    def search(self, x, k, rows=None):
+        """Searches every shard, or only the given store rows (and only the shards holding them)."""
+        x = np.ascontiguousarray(x, dtype='float32')
+        if rows is None:
+            targets = [(shard, None) for shard in range(len(self._shards))]
+        else:
+            rows = np.asarray(rows, dtype='int64')
+            targets = []
+            for shard, shard_rows in enumerate(self.shard_rows):
+                positions = np.searchsorted(shard_rows, rows)
+                inside = positions < shard_rows.size
+                inside[inside] = shard_rows[positions[inside]] == rows[inside]
+                if inside.any():
+                    targets.append((shard, positions[inside]))
+
+        if len(targets) == 1:
+            results = [self._search_shard(targets[0][0], x, k, targets[0][1])]
+        else:
+            results = list(self._pool.map(lambda target: self._search_shard(target[0], x, k, target[1]), targets))
+
+        # Every shard's hits are sorted best first, so a k-way heap merge yields the global top-k
+        ip = self.metric_type == faiss.METRIC_INNER_PRODUCT
+        worst = np.finfo('float32').max
+        D = np.full((x.shape[0], k), -worst if ip else worst, dtype='float32')
+        I = np.full((x.shape[0], k), -1, dtype='int64')
+        for q in range(x.shape[0]):
+            hits = [zip(shard_D[q], shard_I[q]) for shard_D, shard_I in results]
+            merged = heapq.merge(*hits, key=lambda hit: hit[0], reverse=ip)
+            for i, (score, row) in enumerate(islice((hit for hit in merged if hit[1] >= 0), k)):
+                D[q, i], I[q, i] = score, row
+        return D, I
+
+
+def load_sharded_index(store_prefix, max_workers=None, lazy=True):
+    """
+    Loads the sharded index of a store and refuses it if it is stale.
+    Returns (index, meta) like load_index_artifact; shards are mapped lazily unless lazy=False.
+    """
+    _, meta = load_embedding_store(store_prefix)
+    manifest_path = shards_manifest_path(store_prefix)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SHARDS_VERSION:
+        raise ValueError(f"Unsupported shard manifest version {manifest.get('version')} in '{manifest_path}'.")
+    for key in ("model", "dim", "count", "content_hash"):
+        if manifest.get(key) != meta.get(key):
+            raise ValueError(f"Stale sharded index '{manifest_path}': '{key}' is {manifest.get(key)!r} "
+                             f"but the store has {meta.get(key)!r}. Re-run sharded_index.py.")
+    return ShardedIndex(store_prefix, manifest, meta['index_ids'], max_workers, lazy), meta
+
+
+# --- Configuration ---
+stores_to_shard = ["osho_master_store"]
+n_shards = int(os.environ.get("OSHO_INDEX_SHARDS", 4))
+shard_strategy = "book"  # "book" or "hash" (see above)
+index_type = os.environ.get("OSHO_INDEX_TYPE", "flat")
+
+# --- Run Shard Build ---
+if __name__ == "__main__":
+    print("Starting sharded index build stage...")
+    for store_prefix in stores_to_shard:
+        if not os.path.exists(f"{store_prefix}_meta.json"):
+            print(f"Skipping '{store_prefix}' (store not found).")
+            continue
+        build_sharded_index(store_prefix, n_shards, shard_strategy, index_type)
+    print("Sharded index build stage finished.")
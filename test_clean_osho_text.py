@@ -0,0 +1,38 @@
+import json
+import os
+import pytest
+from clean_osho_text import clean_osho_text, clean_text
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Cleaned texts checked in before the streaming engine; its output must match them byte for byte
+GOLDEN_OUTPUTS = {
+    "from_sex_to_superconsciousness": "cleaned_osho_text_v4.txt",
+    "vigyan_bhairav_tantra": "cleaned_book_2.txt",
+}
+
+
+def load_books():
+    with open(os.path.join(ROOT, "books.json"), 'r', encoding='utf-8') as f:
+        return {book["id"]: book for book in json.load(f)}
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("book_id", sorted(GOLDEN_OUTPUTS))
+def test_streamed_output_matches_golden(book_id, tmp_path):
+    book = load_books()[book_id]
+    output_path = tmp_path / "cleaned.txt"
+    clean_osho_text(os.path.join(ROOT, book["extracted"]), str(output_path), book["title"],
+                    book["cleaning_profile"])
+    assert read_bytes(output_path) == read_bytes(os.path.join(ROOT, GOLDEN_OUTPUTS[book_id]))
+
+
+@pytest.mark.parametrize("book_id", sorted(GOLDEN_OUTPUTS))
+def test_string_output_matches_golden(book_id):
+    book = load_books()[book_id]
+    with open(os.path.join(ROOT, book["extracted"]), 'r', encoding='utf-8') as f:
+        cleaned = clean_text(f.read(), book["title"], book["cleaning_profile"])
+    assert cleaned.encode('utf-8') == read_bytes(os.path.join(ROOT, GOLDEN_OUTPUTS[book_id]))
@@ -0,0 +1,46 @@
+import os
+import pytest
+from embedding_store import load_embedding_store
+from lexical_index import load_lexical_index
+from retrieval import search_lexical
+from context_packer import pack_context, merge_passages, CONTEXT_TOKEN_BUDGET
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+QUERIES = [
+    "What is the problem with suppressed sex?", "What is love?", "tantra meditation techniques",
+    "the mind is not poison", "why do saints condemn sex", "how does energy transform",
+]
+
+
+@pytest.fixture(scope="module")
+def store():
+    prefix = os.path.join(ROOT, "osho_store_v4")
+    _, meta = load_embedding_store(prefix)
+    return meta['chunks'], load_lexical_index(prefix, meta)  # Lexical retrieval: no embedding model needed
+
+
+@pytest.mark.parametrize("top_k", [3, 10, 20, 50])
+@pytest.mark.parametrize("query", QUERIES)
+def test_packed_context_fits_budget(store, query, top_k):
+    data, lexical_index = store
+    results = search_lexical(query, lexical_index, data, top_k)
+    passages, dropped = pack_context(results)
+
+    assert sum(passage['tokens'] for passage in passages) <= CONTEXT_TOKEN_BUDGET
+    scores = [passage['score'] for passage in passages]
+    assert scores == sorted(scores, reverse=True)
+    # Every retrieved chunk is either packed (once) or reported dropped
+    packed_ids = [source_id for passage in passages for source_id in passage['source_ids']]
+    assert sorted(packed_ids + dropped) == sorted({result['source_id'] for result in results})
+
+
+def test_neighbours_merge_with_overlap_written_once():
+    chunks = [
+        {"source_id": "book_0002", "book": "Book", "score": 0.5, "text": "the middle of it, and then the end"},
+        {"source_id": "book_0001", "book": "Book", "score": 0.9, "text": "The start, then the middle of it,"},
+        {"source_id": "other_0001", "book": "Other", "score": 0.7, "text": "Another book."},
+    ]
+    passages = merge_passages(chunks)
+    assert [passage['source_ids'] for passage in passages] == [["book_0001", "book_0002"], ["other_0001"]]
+    assert passages[0]['text'] == "The start, then the middle of it, and then the end"
+    assert passages[0]['score'] == 0.9
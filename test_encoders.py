@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")  # The PyTorch reference every backend is compared with
+import torch
+from embedding_store import load_embedding_store
+from encoders import load_encoder, export_encoder
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODEL_NAME = "all-MiniLM-L6-v2"
+N_CHUNKS = 64
+TOP_K = 10
+QUERIES = [
+    "What is the problem with suppressed sex?", "What is love?", "Vigyan Bhairav Tantra",
+    "how does meditation transform sexual energy", "why do saints condemn sex", "Shiva",
+]
+# The lowest cosine similarity of any text to its PyTorch embedding, and the overlap
+# of each query's top-10 chunks with the PyTorch top-10
+PARITY_MIN_COSINE = {"torchscript": 0.9999, "onnx": 0.9999, "onnx-int8": 0.98}
+PARITY_MIN_TOP_K_OVERLAP = {"torchscript": 1.0, "onnx": 1.0, "onnx-int8": 0.8}
+
+
+def embed(encoder, texts):
+    return np.asarray(encoder.encode(texts, convert_to_numpy=True, normalize_embeddings=True), dtype='float32')
+
+
+def top_k_rows(query_embeddings, chunk_embeddings):
+    return np.argsort(-(query_embeddings @ chunk_embeddings.T), axis=1)[:, :TOP_K]
+
+
+@pytest.fixture(scope="module")
+def texts():
+    _, meta = load_embedding_store(os.path.join(ROOT, "osho_store_v4"))
+    return [chunk['text'] for chunk in meta['chunks'][:N_CHUNKS]]
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    encoder = load_encoder(MODEL_NAME, "torch")
+    return embed(encoder, texts), embed(encoder, QUERIES)
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "onnx", "onnx-int8"])
+def test_exported_encoder_matches_torch(backend, texts, reference, tmp_path):
+    if backend != "torchscript":
+        pytest.importorskip("onnx")  # torch.onnx.export
+        pytest.importorskip("onnxruntime")
+    artifact_dir = export_encoder(MODEL_NAME, backend, str(tmp_path / backend))
+    encoder = load_encoder(MODEL_NAME, backend, artifact_dir)
+    chunk_embeddings, query_embeddings = embed(encoder, texts), embed(encoder, QUERIES)
+
+    # Both sides are unit length, so the dot product is the cosine
+    min_cosine = min(np.min(np.sum(chunk_embeddings * reference[0], axis=1)),
+                     np.min(np.sum(query_embeddings * reference[1], axis=1)))
+    assert min_cosine >= PARITY_MIN_COSINE[backend]
+    found = top_k_rows(query_embeddings, chunk_embeddings)
+    expected = top_k_rows(reference[1], reference[0])
+    overlap = np.mean([np.isin(f, e).mean() for f, e in zip(found, expected)])
+    assert overlap >= PARITY_MIN_TOP_K_OVERLAP[backend]
+
+
+def test_thread_limit_does_not_leak():
+    threads = torch.get_num_threads()
+    encoder = load_encoder(MODEL_NAME, "torch", threads=1)
+    embed(encoder, QUERIES[:1])
+    assert torch.get_num_threads() == threads
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from embedding_store import save_embedding_store, normalize_rows
+from faiss_index import build_index_artifact, load_index_artifact
+from sharded_index import build_sharded_index, load_sharded_index
+
+N_BOOKS = 12
+CHUNKS_PER_BOOK = 200
+DIM = 32
+TOP_K = 10
+SUBSET_BOOKS = 3
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    """A small store of books with clustered vectors, its flat index and some queries."""
+    prefix = str(tmp_path_factory.mktemp("store") / "store")
+    rng = np.random.default_rng(0)
+    topics = rng.standard_normal((N_BOOKS, DIM)).astype('float32')
+    vectors = np.repeat(topics, CHUNKS_PER_BOOK, axis=0) + 2 * rng.standard_normal((N_BOOKS * CHUNKS_PER_BOOK, DIM))
+    chunks = [{"id": f"book_{b:03d}_{i:04d}", "text": f"chunk {i}", "source": f"Book {b:03d}"}
+              for b in range(N_BOOKS) for i in range(CHUNKS_PER_BOOK)]
+    save_embedding_store(prefix, normalize_rows(vectors), chunks, "synthetic", normalized=True)
+    build_index_artifact(prefix, "flat")
+    queries = normalize_rows(rng.standard_normal((20, DIM)) + topics[rng.integers(0, N_BOOKS, 20)])
+    return prefix, np.ascontiguousarray(queries, dtype='float32')
+
+
+@pytest.mark.parametrize("n_shards", [1, 3, 4])
+@pytest.mark.parametrize("strategy", ["book", "hash"])
+def test_sharded_search_equals_unsharded(store, strategy, n_shards):
+    prefix, queries = store
+    reference, meta = load_index_artifact(prefix)
+    subset = meta['chunks'].book_rows(meta['chunks'].titles()[:SUBSET_BOOKS])
+    build_sharded_index(prefix, n_shards, strategy)
+    index, _ = load_sharded_index(prefix)
+    try:
+        # Flat shards are exact, so the merged top-k is the unsharded top-k
+        for rows in (None, subset):
+            expected_D, expected_I = reference.search(queries, TOP_K, rows=rows)
+            D, I = index.search(queries, TOP_K, rows=rows)
+            np.testing.assert_array_equal(I, expected_I)
+            np.testing.assert_allclose(D, expected_D, rtol=1e-5, atol=1e-6)
+    finally:
+        index.close()
+
+
+def test_book_search_loads_only_its_shards(store):
+    prefix, queries = store
+    build_sharded_index(prefix, 4, "book")
+    index, meta = load_sharded_index(prefix)
+    try:
+        assert index.loaded_shards() == 0
+        index.search(queries, TOP_K, rows=meta['chunks'].book_rows(meta['chunks'].titles()[:1]))
+        assert index.loaded_shards() == 1
+    finally:
+        index.close()
+
+
+def test_stale_shards_are_refused(tmp_path):
+    prefix = str(tmp_path / "store")
+    rng = np.random.default_rng(1)
+    chunks = [{"id": f"book_{b:03d}_{i:04d}", "text": f"chunk {i}", "source": f"Book {b:03d}"}
+              for b in range(2) for i in range(50)]
+    save_embedding_store(prefix, normalize_rows(rng.standard_normal((100, DIM))), chunks, "synthetic",
+                         normalized=True)
+    build_sharded_index(prefix, 2, "book")
+    save_embedding_store(prefix, normalize_rows(rng.standard_normal((100, DIM))), chunks, "synthetic",
+                         normalized=True)
+    with pytest.raises(ValueError, match="Stale sharded index"):
+        load_sharded_index(prefix)
@@ -0,0 +1,28 @@
+import os
+import pytest
+
+pytest.importorskip("sentence_transformers")  # setup_osho_ai loads the query encoder
+import osho_ai_search
+from background_loader import BackgroundLoader
+from osho_ai_search import setup_osho_ai, semantic_search, MODEL_NAME
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TOP_K = 10
+QUERIES = ["What is the problem with suppressed sex?", "What is love?", "Vigyan Bhairav Tantra"]
+
+
+@pytest.fixture(autouse=True)
+def no_query_cache_file(monkeypatch):
+    monkeypatch.setattr(osho_ai_search, "QUERY_CACHE_DB", None)  # Keep each core's embeddings its own
+
+
+@pytest.mark.parametrize("mode", ["dense", "hybrid"])
+def test_lazy_startup_returns_eager_results(mode):
+    store_prefix = os.path.join(ROOT, "osho_store_v4")
+    eager = setup_osho_ai(store_prefix, MODEL_NAME, mode)
+    lazy = BackgroundLoader(lambda: setup_osho_ai(store_prefix, MODEL_NAME, mode)).result()
+    for query in QUERIES:
+        expected = semantic_search(query, *eager[:3], TOP_K, mode=mode, lexical_index=eager[3])
+        results = semantic_search(query, *lazy[:3], TOP_K, mode=mode, lexical_index=lazy[3])
+        assert [r['source_id'] for r in results] == [r['source_id'] for r in expected]
+        assert [r['score'] for r in results] == pytest.approx([r['score'] for r in expected])